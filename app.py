@@ -2,20 +2,35 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 import os
 import threading
-import webbrowser
-
-from youtube_api import search_videos
-from downloader import download_many
-from utils import load_environment, get_download_dir, get_max_concurrency, truncate_title, load_config, save_config
+import time
+from collections import deque
+
+# youtube_api and downloader pull in googleapiclient and yt_dlp, which take
+# seconds to import on slow machines; they are loaded in the background
+# after the window appears (see _load_backend).
+from bandwidth import get_governor, parse_rate, parse_schedule
+from events import ProgressBus, format_progress
+from dedup import duration_seconds
+from results import ResultsModel
+from scheduler import POLICIES, POLICY_LABELS, describe_plan, plan_downloads
+from metrics import configure_from_env, metrics
+from utils import load_environment, get_download_dir, get_max_concurrency, get_adaptive_concurrency, get_download_order, get_expected_throughput, truncate_title, format_duration, format_views, load_config, save_config, is_collection_url, parse_date, get_bandwidth_limit
 
 class YouTubeDownloaderApp:
     """A classe principal para o aplicativo YouTube Music Downloader."""
+    UI_REFRESH_MS = 100 # Interval between flushes of the progress bus (10 frames/s)
+    MAX_LOG_LINES = 1000 # The log area keeps only the most recent lines
+    RENDER_SLICE_MS = 15 # Main-thread time budget per frame for inserting/redrawing result rows
+    SEARCH_BATCH_SIZE = 50 # Search results are handed to the UI in batches of up to this many rows
+    ICON_FILE = "icon_64.png" # Downscaled copy of icon.png; decoding the full 1024x1024 image delays startup
+    RESORT_DELAY_MS = 300 # While a column sort is active, rows arriving from a search are re-sorted at most this often
+    SORT_HEADINGS = {"title": "Título", "channel": "Canal", "duration": "Duração", "views": "Views"}
     def __init__(self, master):
         """Inicializa o aplicativo."""
         self.master = master
         master.title("YouTube Music Downloader")
         master.geometry("900x750")
-        master.iconphoto(False, tk.PhotoImage(file="icon.png"))
+        master.iconphoto(False, tk.PhotoImage(file=self.ICON_FILE))
 
         # Apply a modern theme
         style = ttk.Style()
@@ -25,6 +40,13 @@ class YouTubeDownloaderApp:
         self.download_dir = get_download_dir()
         self.max_concurrency = get_max_concurrency()
         self.config = load_config()
+        self.results = ResultsModel()
+        self._dirty_rows = deque() # Row ids waiting to be inserted or redrawn by _render_rows
+        self._rendered = set()
+        self._render_scheduled = False
+        self._placing = deque() # Visible rows to re-attach in view order, before any other pending row (see refresh_results_view)
+        self._resort_scheduled = False
+        self.events = ProgressBus(max_log_lines=self.MAX_LOG_LINES)
 
         # Create downloads directory if it doesn\\\\\\'t exist
         if not os.path.exists(self.download_dir):
@@ -32,7 +54,10 @@ class YouTubeDownloaderApp:
 
         self.create_widgets()
         self.load_user_settings()
+        self.master.after(self.UI_REFRESH_MS, self._flush_events)
         self.log_message("Aplicativo iniciado. Insira um artista para buscar.")
+        configure_from_env(log_cb=self.log_message)
+        self.master.after_idle(lambda: threading.Thread(target=self._load_backend, name="backend-loader", daemon=True).start())
 
         # Bind close event to save settings
         self.master.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -57,11 +82,26 @@ class YouTubeDownloaderApp:
         self.limit_entry = ttk.Entry(search_frame, width=10)
         self.limit_entry.insert(0, "20")
         self.limit_entry.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+        # "Prioridade" downloads the rows in the order they were checked ("Selecionar Todos": table order).
+        ttk.Label(search_frame, text="Ordem dos downloads:").grid(row=1, column=1, padx=100, sticky="w")
+        default_order = get_download_order()
+        self.order_var = tk.StringVar(value=POLICY_LABELS.get(default_order, POLICY_LABELS["fifo"]))
+        ttk.Combobox(search_frame, textvariable=self.order_var, values=[POLICY_LABELS[policy] for policy in POLICIES],
+                     state="readonly", width=22).grid(row=1, column=1, padx=240, sticky="w")
 
         ttk.Label(search_frame, text="Concorrência:").grid(row=2, column=0, padx=5, pady=5, sticky="w")
         self.concurrency_entry = ttk.Entry(search_frame, width=10)
         self.concurrency_entry.insert(0, str(self.max_concurrency))
         self.concurrency_entry.grid(row=2, column=1, padx=5, pady=5, sticky="w")
+        self.adaptive_var = tk.BooleanVar(value=get_adaptive_concurrency())
+        ttk.Checkbutton(search_frame, text="Adaptativa", variable=self.adaptive_var).grid(row=2, column=1, padx=100, sticky="w")
+        ttk.Label(search_frame, text="Banda máx. (ex.: 2M; 0 = livre):").grid(row=2, column=1, padx=200, sticky="w")
+        self.bandwidth_entry = ttk.Entry(search_frame, width=8)
+        self.bandwidth_entry.insert(0, get_bandwidth_limit())
+        self.bandwidth_entry.grid(row=2, column=1, padx=400, sticky="w")
+        # The limit is process-wide, so a new value also applies to downloads already running.
+        self.bandwidth_entry.bind("<Return>", lambda event: self.apply_bandwidth_limit())
+        self.bandwidth_entry.bind("<FocusOut>", lambda event: self.apply_bandwidth_limit())
 
         ttk.Label(search_frame, text="Formato:").grid(row=3, column=0, padx=5, pady=5, sticky="w")
         self.format_var = tk.StringVar(value="mp3")
@@ -72,14 +112,29 @@ class YouTubeDownloaderApp:
         ttk.Radiobutton(search_frame, text="360p", variable=self.quality_var, value="360").grid(row=3, column=1, padx=120, sticky="w")
         ttk.Radiobutton(search_frame, text="720p", variable=self.quality_var, value="720").grid(row=3, column=1, padx=180, sticky="w")
         ttk.Radiobutton(search_frame, text="1080p", variable=self.quality_var, value="1080").grid(row=3, column=1, padx=240, sticky="w")
+        # Keeps YouTube's own AAC/Opus stream (m4a/opus file): no ffmpeg encoding, much faster than MP3.
+        ttk.Radiobutton(search_frame, text="Áudio original (sem conversão)", variable=self.format_var, value="audio").grid(row=3, column=1, padx=320, sticky="w")
 
         ttk.Label(search_frame, text="Views Mínimas:").grid(row=4, column=0, padx=5, pady=5, sticky="w")
         self.min_views_entry = ttk.Entry(search_frame, width=10)
         self.min_views_entry.insert(0, "0")
         self.min_views_entry.grid(row=4, column=1, padx=5, pady=5, sticky="w")
+        # Raising the minimum re-filters the current results locally; the search itself uses the value it was started with.
+        self.min_views_entry.bind("<Return>", lambda event: self.apply_result_filters())
+        self.min_views_entry.bind("<FocusOut>", lambda event: self.apply_result_filters(quiet=True))
+
+        self.use_cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(search_frame, text="Usar cache de buscas", variable=self.use_cache_var).grid(row=5, column=1, padx=5, pady=5, sticky="w")
+        self.dedupe_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(search_frame, text="Agrupar duplicatas (mesma música em outros canais)", variable=self.dedupe_var).grid(row=5, column=1, padx=200, pady=5, sticky="w")
+
+        ttk.Label(search_frame, text="Publicados desde:").grid(row=6, column=0, padx=5, pady=5, sticky="w")
+        self.date_after_entry = ttk.Entry(search_frame, width=12)
+        self.date_after_entry.grid(row=6, column=1, padx=5, pady=5, sticky="w")
+        ttk.Label(search_frame, text="AAAA-MM-DD; vale para URLs de playlists e canais no campo Artista").grid(row=6, column=1, padx=110, sticky="w")
 
         self.search_button = ttk.Button(search_frame, text="Buscar", command=self.perform_search)
-        self.search_button.grid(row=0, column=2, rowspan=5, padx=10, pady=5, sticky="ns")
+        self.search_button.grid(row=0, column=2, rowspan=7, padx=10, pady=5, sticky="ns")
 
         search_frame.columnconfigure(1, weight=1)
 
@@ -87,17 +142,41 @@ class YouTubeDownloaderApp:
         results_frame = ttk.LabelFrame(main_frame, text="Resultados da Busca", padding="10 10 10 10")
         results_frame.pack(padx=5, pady=5, fill="both", expand=True)
 
-        self.results_tree = ttk.Treeview(results_frame, columns=("checkbox", "title", "channel", "duration", "views"), show="headings")
+        # Local filters: applied to the results already found, without searching again.
+        filter_frame = ttk.Frame(results_frame)
+        filter_frame.pack(fill="x", pady=(0, 5))
+        ttk.Label(filter_frame, text="Duração de:").pack(side="left")
+        self.min_duration_entry = ttk.Entry(filter_frame, width=7)
+        self.min_duration_entry.pack(side="left", padx=2)
+        ttk.Label(filter_frame, text="até:").pack(side="left")
+        self.max_duration_entry = ttk.Entry(filter_frame, width=7)
+        self.max_duration_entry.pack(side="left", padx=2)
+        ttk.Label(filter_frame, text="(min ou M:SS)").pack(side="left", padx=(0, 10))
+        ttk.Label(filter_frame, text="Canal:").pack(side="left")
+        self.channel_filter_entry = ttk.Entry(filter_frame, width=20)
+        self.channel_filter_entry.pack(side="left", padx=2)
+        ttk.Button(filter_frame, text="Limpar Filtros", command=self.clear_result_filters).pack(side="left", padx=5)
+        self.view_count_label = ttk.Label(filter_frame, text="")
+        self.view_count_label.pack(side="right")
+        for entry in (self.min_duration_entry, self.max_duration_entry):
+            entry.bind("<Return>", lambda event: self.apply_result_filters())
+            entry.bind("<FocusOut>", lambda event: self.apply_result_filters(quiet=True))
+        self.channel_filter_entry.bind("<KeyRelease>", lambda event: self.apply_result_filters(quiet=True))
+
+        self.results_tree = ttk.Treeview(results_frame, columns=("checkbox", "title", "channel", "duration", "views", "progress"), show="tree headings")
+        # The tree column holds the expand arrow of rows with collapsed duplicates and their count.
+        self.results_tree.heading("#0", text="Dup.")
+        self.results_tree.column("#0", width=60, stretch=False)
         self.results_tree.heading("checkbox", text="✅")
-        self.results_tree.heading("title", text="Título")
-        self.results_tree.heading("channel", text="Canal")
-        self.results_tree.heading("duration", text="Duração")
-        self.results_tree.heading("views", text="Views")
+        for column, text in self.SORT_HEADINGS.items():
+            self.results_tree.heading(column, text=text, command=lambda column=column: self.sort_results(column))
+        self.results_tree.heading("progress", text="Progresso")
         self.results_tree.column("checkbox", width=30, anchor="center")
-        self.results_tree.column("title", width=300)
+        self.results_tree.column("title", width=260)
         self.results_tree.column("channel", width=150)
         self.results_tree.column("duration", width=80, anchor="center")
         self.results_tree.column("views", width=100, anchor="center")
+        self.results_tree.column("progress", width=120, anchor="center")
         self.results_tree.pack(fill="both", expand=True)
 
         self.results_tree.bind("<Button-1>", self.on_tree_click)
@@ -116,11 +195,17 @@ class YouTubeDownloaderApp:
         self.download_button = ttk.Button(downloads_frame, text="Baixar Selecionados", command=self.perform_download)
         self.download_button.pack(side="left", padx=5)
 
+        self.playlist_button = ttk.Button(downloads_frame, text="Baixar Playlist/Canal", command=self.perform_playlist_download)
+        self.playlist_button.pack(side="left", padx=5)
+
         self.open_folder_button = ttk.Button(downloads_frame, text="Abrir Pasta de Downloads", command=self.open_download_folder)
         self.open_folder_button.pack(side="left", padx=5)
 
         self.about_button = ttk.Button(downloads_frame, text="Sobre", command=self.show_about_dialog)
         self.about_button.pack(side="left", padx=5)
+
+        self.metrics_button = ttk.Button(downloads_frame, text="Métricas", command=self.show_metrics_dialog)
+        self.metrics_button.pack(side="left", padx=5)
         # Global Progress Bar
         ttk.Label(downloads_frame, text="Progresso Global:").pack(side="left", padx=5)
         self.progress_bar = ttk.Progressbar(downloads_frame, orient="horizontal", length=300, mode="determinate")
@@ -137,12 +222,47 @@ class YouTubeDownloaderApp:
         copyright_notice = "Aviso: Baixar conteúdo do YouTube pode violar os Termos de Serviço e direitos autorais. Este aplicativo é para uso pessoal e educacional."
         ttk.Label(main_frame, text=copyright_notice, foreground="red", wraplength=880, justify="center").pack(pady=5)
 
+    def _load_backend(self):
+        """Importa os módulos de busca e download em segundo plano e então retoma os downloads pendentes.
+
+        Buscas e downloads iniciados antes disso também funcionam: a
+        importação feita na thread deles apenas espera esta terminar.
+        """
+        try:
+            import youtube_api  # noqa: F401
+            import downloader  # noqa: F401
+        except Exception as e:
+            self.log_message(f"Erro ao carregar os módulos de download: {e}")
+            return
+        self.master.after(0, self.resume_pending_downloads)
+
     def log_message(self, message):
-        """Exibe uma mensagem na área de log."""
-        self.log_text.config(state="normal")
-        self.log_text.insert(tk.END, message + "\n")
-        self.log_text.see(tk.END)
-        self.log_text.config(state="disabled")
+        """Exibe uma mensagem na área de log. Pode ser chamado de qualquer thread."""
+        self.events.log(message)
+
+    def _flush_events(self):
+        """Aplica na interface os eventos publicados desde o último quadro."""
+        batch = self.events.drain()
+        if batch["logs"]:
+            lines = batch["logs"]
+            if batch["dropped_logs"]:
+                lines.insert(0, f"... {batch['dropped_logs']} mensagem(ns) omitida(s) ...")
+            self.log_text.config(state="normal")
+            self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+            line_count = int(self.log_text.index("end-1c").split(".")[0])
+            if line_count > self.MAX_LOG_LINES:
+                self.log_text.delete("1.0", f"{line_count - self.MAX_LOG_LINES + 1}.0")
+            self.log_text.see(tk.END)
+            self.log_text.config(state="disabled")
+        for url, fields in batch["progress"].items():
+            text = format_progress(fields)
+            item_id = self.results.set_progress(url, text)
+            if item_id in self._rendered:
+                self.results_tree.set(item_id, "progress", text)
+        if batch["counter"]:
+            done, total = batch["counter"]
+            self.progress_bar.config(maximum=max(total, 1), value=done)
+        self.master.after(self.UI_REFRESH_MS, self._flush_events)
 
     def load_user_settings(self):
         """Carrega as configurações do usuário do arquivo config.json."""
@@ -159,6 +279,18 @@ class YouTubeDownloaderApp:
         if "last_min_views" in self.config:
             self.min_views_entry.delete(0, tk.END)
             self.min_views_entry.insert(0, self.config["last_min_views"])
+        if "last_date_after" in self.config:
+            self.date_after_entry.insert(0, self.config["last_date_after"])
+        if "last_adaptive" in self.config:
+            self.adaptive_var.set(self.config["last_adaptive"])
+        if "last_dedupe" in self.config:
+            self.dedupe_var.set(self.config["last_dedupe"])
+        if self.config.get("last_order") in POLICY_LABELS:
+            self.order_var.set(POLICY_LABELS[self.config["last_order"]])
+        if "last_bandwidth_limit" in self.config:
+            self.bandwidth_entry.delete(0, tk.END)
+            self.bandwidth_entry.insert(0, self.config["last_bandwidth_limit"])
+        self.apply_bandwidth_limit(quiet=True)
 
     def save_user_settings(self):
         """Salva as configurações do usuário no arquivo config.json."""
@@ -167,8 +299,30 @@ class YouTubeDownloaderApp:
         self.config["last_quality"] = self.quality_var.get()
         self.config["last_concurrency"] = self.concurrency_entry.get()
         self.config["last_min_views"] = self.min_views_entry.get()
+        self.config["last_date_after"] = self.date_after_entry.get()
+        self.config["last_adaptive"] = self.adaptive_var.get()
+        self.config["last_dedupe"] = self.dedupe_var.get()
+        self.config["last_order"] = self.download_policy()
+        self.config["last_bandwidth_limit"] = self.bandwidth_entry.get()
         save_config(self.config)
 
+    def apply_bandwidth_limit(self, quiet=False):
+        """Aplica o limite de banda do campo (e a rajada/horários do config.json) a todos os downloads."""
+        governor = get_governor()
+        try:
+            rate = parse_rate(self.bandwidth_entry.get())
+            burst = parse_rate(self.config["bandwidth_burst"]) if "bandwidth_burst" in self.config else governor.burst_size
+            schedule = parse_schedule(self.config["bandwidth_schedule"]) if "bandwidth_schedule" in self.config else governor.schedule
+        except ValueError as e:
+            if not quiet:
+                messagebox.showwarning("Entrada Inválida", f"Limite de banda inválido: {e}")
+            return False
+        if (rate, burst, schedule) != (governor.base_rate, governor.burst_size, governor.schedule):
+            governor.configure(rate, burst, schedule)
+            self.log_message(f"Limite de banda: {f'{rate / 1e6:g} MB/s' if rate else 'sem limite'}"
+                             + (f", com {len(schedule)} janela(s) de horário" if schedule else ""))
+        return True
+
     def on_closing(self):
         """Salva as configurações e fecha o aplicativo."""
         self.save_user_settings()
@@ -186,6 +340,30 @@ class YouTubeDownloaderApp:
         )
         messagebox.showinfo("Sobre", about_text)
 
+    def show_metrics_dialog(self):
+        """Exibe o resumo de tempo por etapa e os contadores desde o início do aplicativo."""
+        window = tk.Toplevel(self.master)
+        window.title("Métricas")
+        window.geometry("620x420")
+        text = scrolledtext.ScrolledText(window, state="disabled", font=("Courier", 10))
+        text.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+
+        def refresh():
+            lines = [f"{'Etapa':<20}{'Qtd':>7}{'Total (s)':>12}{'Média (s)':>12}{'p95 (s)':>10}"]
+            for stage, s in metrics.summary().items():
+                lines.append(f"{stage:<20}{s['count']:>7}{s['total']:>12.2f}{s['mean']:>12.3f}{s['p95']:>10}")
+            lines.append("")
+            for counter in metrics.snapshot()["counters"]:
+                labels = ", ".join(f"{k}={v}" for k, v in counter["labels"].items())
+                lines.append(f"{counter['name']}{' (' + labels + ')' if labels else ''}: {counter['value']:,}")
+            text.config(state="normal")
+            text.delete("1.0", tk.END)
+            text.insert(tk.END, "\n".join(lines))
+            text.config(state="disabled")
+
+        ttk.Button(window, text="Atualizar", command=refresh).pack(pady=(0, 10))
+        refresh()
+
     def perform_search(self):
         """Inicia a busca de vídeos com base nos critérios inseridos."""
         artist = self.artist_entry.get()
@@ -196,67 +374,232 @@ class YouTubeDownloaderApp:
         try:
             limit = int(self.limit_entry.get())
             min_views = int(self.min_views_entry.get())
+            date_after = parse_date(self.date_after_entry.get())
         except ValueError:
-            messagebox.showwarning("Entrada Inválida", "O limite de resultados e as visualizações mínimas devem ser números.")
+            messagebox.showwarning("Entrada Inválida", "O limite de resultados e as visualizações mínimas devem ser números, e a data deve estar no formato AAAA-MM-DD.")
             return
 
         self.log_message(f"Buscando vídeos para \\\\\' {artist}\\\\\\'...")
         self.search_button.config(state="disabled")
-        self.results_tree.delete(*self.results_tree.get_children())
+        self.results.dedupe = self.dedupe_var.get()
+        self._clear_results(None if ";" in artist or is_collection_url(artist) else artist)
         
-        threading.Thread(target=self._search_thread, args=(artist, limit, min_views)).start()
+        threading.Thread(target=self._search_thread, args=(artist, limit, min_views, self.use_cache_var.get(), date_after)).start()
+
+    def _stream_results(self, videos):
+        """Repassa os vídeos à árvore conforme chegam e os devolve um a um.
 
-    def _search_thread(self, artist, limit, min_views):
-        """Executa a busca em uma thread separada para não bloquear a UI."""
+        O primeiro vai para a interface na hora; os seguintes são agrupados
+        em lotes para não gerar um evento da interface por vídeo.
+        """
+        batch = []
+        last_post = time.monotonic()
         try:
-            videos = search_videos(artist, limit, min_views)
-            self.master.after(0, self._update_results_tree, videos)
-            self.master.after(0, lambda: self.log_message(f"Busca concluída. Encontrados {len(videos)} vídeos."))
+            for video in videos:
+                batch.append(video)
+                if len(batch) >= self.SEARCH_BATCH_SIZE or time.monotonic() - last_post >= 0.1:
+                    self.master.after(0, self._append_results, batch)
+                    batch = []
+                    last_post = time.monotonic()
+                yield video
+        finally:
+            if batch:
+                self.master.after(0, self._append_results, batch)
+
+    def _search_thread(self, artist, limit, min_views, use_cache=True, date_after=None):
+        """Executa a busca em uma thread separada para não bloquear a UI.
+
+        Os resultados são enviados para a árvore conforme chegam, sem esperar o fim da busca.
+        Uma URL de playlist ou canal no lugar do artista lista os vídeos dela.
+        Vários artistas separados por ";" são buscados em paralelo.
+        """
+        try:
+            if is_collection_url(artist):
+                from playlist import iter_playlist_videos
+                videos = iter_playlist_videos(artist, limit, min_views, date_after=date_after, log_cb=self.log_message)
+            elif ";" in artist:
+                videos = self._iter_batch_search(artist.split(";"), limit, min_views, use_cache)
+            else:
+                from youtube_api import iter_search_videos
+                videos = iter_search_videos(artist, limit, min_views, use_cache=use_cache)
+            found = sum(1 for _ in self._stream_results(videos))
+            self.master.after(0, lambda: self.log_message(f"Busca concluída. Encontrados {found} vídeos"
+                                                          + (f" ({len(self.results.parent)} duplicata(s) agrupada(s))." if self.results.parent else ".")))
         except Exception as e:
-            self.master.after(0, lambda: messagebox.showerror("Erro de Busca", f"Ocorreu um erro durante a busca: {e}"))
+            # Bind the text now: "e" is deleted when the except block ends, before the callback runs.
+            message = f"Ocorreu um erro durante a busca: {e}"
+            self.master.after(0, lambda message=message: messagebox.showerror("Erro de Busca", message))
         finally:
             self.master.after(0, lambda: self.search_button.config(state="normal"))
 
-    def _update_results_tree(self, videos):
-        """Atualiza a árvore de resultados com os vídeos encontrados."""
-        self.video_data = {}
-        for i, video in enumerate(videos):
-            item_id = self.results_tree.insert("", "end", iid=i, values=("", truncate_title(video["title"]), video["channelTitle"], video["duration"], video["views"]))
-            self.results_tree.item(item_id, tags=("unchecked",))
-            self.video_data[item_id] = video
+    def _iter_batch_search(self, artists, limit, min_views, use_cache):
+        """Busca vários artistas em paralelo e entrega os vídeos de cada um assim que a busca dele termina."""
+        from youtube_api import iter_search_many, quota
+        for artist, videos in iter_search_many(artists, limit, min_views, use_cache=use_cache):
+            self.log_message(f"{artist}: {len(videos)} vídeo(s).")
+            for video in videos:
+                video["artist"] = artist # Lets the duplicate grouping ignore the artist's name in titles
+                yield video
+        if quota.daily_budget:
+            self.log_message(f"Cota da API usada hoje: {quota.spent()}/{quota.daily_budget} unidades.")
+
+    def _append_results(self, videos):
+        """Acrescenta vídeos ao modelo de resultados; as linhas entram na árvore aos poucos."""
+        item_ids = [item_id for video in videos for item_id in self.results.add(video, video.get("artist"))]
+        if self.results.sort_column is None:
+            self._schedule_render(item_ids) # Arrival order is the display order: new rows just go at the end
+        elif not self._resort_scheduled:
+            self._resort_scheduled = True
+            self.master.after(self.RESORT_DELAY_MS, self._resort_results)
+
+    def _resort_results(self):
+        self._resort_scheduled = False
+        self.refresh_results_view()
+
+    def _clear_results(self, artist=None):
+        """Esvazia o modelo e a árvore de resultados, descartando linhas ainda não desenhadas."""
+        self.results_tree.delete(*(item_id for item_id in self._rendered if not self.results.parent_of(item_id)))
+        self.results.clear(artist)
+        self._rendered.clear()
+        self._dirty_rows.clear()
+        self._placing.clear()
+        self.view_count_label.config(text="")
+
+    def _row_values(self, item_id):
+        video = self.results.videos[item_id]
+        return (self._checkbox(item_id), truncate_title(video.title), video.channel,
+                format_duration(video.duration), format_views(video.views), self.results.progress.get(item_id, ""))
+
+    def _row_text(self, item_id):
+        count = self.results.duplicate_count(item_id)
+        return f"+{count}" if count else ""
+
+    def _checkbox(self, item_id):
+        return "✅" if self.results.is_selected(item_id) else ""
+
+    def _schedule_render(self, item_ids):
+        """Enfileira linhas para inserção/redesenho e agenda o desenho, se ainda não estiver agendado."""
+        self._dirty_rows.extend(item_ids)
+        if not self._render_scheduled:
+            self._render_scheduled = True
+            self.master.after(0, self._render_rows)
+
+    def _render_rows(self):
+        """Insere ou atualiza as linhas pendentes em fatias de tempo, devolvendo o controle à interface entre elas."""
+        deadline = time.perf_counter() + self.RENDER_SLICE_MS / 1000
+        while (self._placing or self._dirty_rows) and time.perf_counter() < deadline:
+            placing = bool(self._placing)
+            item_id = self._placing.popleft() if placing else self._dirty_rows.popleft()
+            if item_id not in self.results.videos or not self.results.is_visible(item_id):
+                continue # Cleared by a new search, or hidden by the filters
+            if item_id in self._rendered:
+                # Grouping duplicates can swap the video shown in a row, so redraw all of it.
+                self.results_tree.item(item_id, text=self._row_text(item_id), values=self._row_values(item_id))
+                if placing:
+                    self.results_tree.move(item_id, "", "end")
+            else:
+                self.results_tree.insert(self.results.parent_of(item_id), "end", iid=item_id,
+                                         text=self._row_text(item_id), values=self._row_values(item_id))
+                self._rendered.add(item_id)
+            if placing:
+                # Duplicates not drawn yet (the row was hidden when they arrived) go in after their main row.
+                self._dirty_rows.extend(child for child in self.results.children.get(item_id, ())
+                                        if child not in self._rendered)
+        if self._placing or self._dirty_rows:
+            self.master.after(1, self._render_rows)
+        else:
+            self._render_scheduled = False
+
+    def refresh_results_view(self):
+        """Reaplica os filtros e a ordenação do modelo na árvore, sem nova busca.
+
+        Todas as linhas principais são desanexadas da árvore (``detach``) e as
+        visíveis são reanexadas na ordem da visão pelo ``_render_rows``, em
+        fatias de tempo como na busca.
+        """
+        rendered = [item_id for item_id in self._rendered if not self.results.parent_of(item_id)]
+        if rendered:
+            self.results_tree.detach(*rendered)
+        view = self.results.view()
+        self._placing = deque(view)
+        self._schedule_render(())
+        total = self.results.main_count()
+        self.view_count_label.config(text=f"Mostrando {len(view)} de {total}" if len(view) != total else "")
+
+    def _parse_duration_filter(self, entry):
+        """Duração de um campo de filtro: minutos ("4", "3.5") ou M:SS/H:MM:SS; None se vazio."""
+        text = entry.get().strip().replace(",", ".")
+        if not text:
+            return None
+        seconds = duration_seconds(text) if ":" in text else int(float(text) * 60)
+        if seconds is None:
+            raise ValueError(text)
+        return seconds
+
+    def apply_result_filters(self, quiet=False):
+        """Filtra os resultados já encontrados por views mínimas, duração e canal.
+
+        Com ``quiet``, valores inválidos nos campos são ignorados em silêncio
+        (usado enquanto o usuário digita).
+        """
+        try:
+            min_views = int(self.min_views_entry.get() or 0)
+            min_duration = self._parse_duration_filter(self.min_duration_entry)
+            max_duration = self._parse_duration_filter(self.max_duration_entry)
+        except ValueError:
+            if not quiet:
+                messagebox.showwarning("Entrada Inválida", "As visualizações mínimas devem ser um número, e a duração deve estar em minutos ou no formato M:SS.")
+            return
+        channel = self.channel_filter_entry.get()
+        current = (self.results.min_views, self.results.min_duration, self.results.max_duration, self.results.channel)
+        self.results.set_filter(min_views, min_duration, max_duration, channel)
+        if current != (self.results.min_views, self.results.min_duration, self.results.max_duration, self.results.channel):
+            self.refresh_results_view()
+
+    def clear_result_filters(self):
+        for entry in (self.min_duration_entry, self.max_duration_entry, self.channel_filter_entry):
+            entry.delete(0, tk.END)
+        self.apply_result_filters(quiet=True)
+
+    def sort_results(self, column):
+        """Ordena pela coluna clicada; clicar de novo inverte a ordem, e uma terceira vez volta à ordem da busca."""
+        if self.results.sort_column != column:
+            # Numbers read best from the largest down; text from A to Z.
+            self.results.set_sort(column, descending=column in ("duration", "views"))
+        elif self.results.descending == (column in ("duration", "views")):
+            self.results.set_sort(column, not self.results.descending)
+        else:
+            self.results.set_sort(None)
+        for name, text in self.SORT_HEADINGS.items():
+            if name == self.results.sort_column:
+                text += " ▼" if self.results.descending else " ▲"
+            self.results_tree.heading(name, text=text)
+        self.refresh_results_view()
 
     def on_tree_click(self, event):
         """Alterna a seleção de um item na árvore de resultados."""
         item_id = self.results_tree.identify_row(event.y)
+        if "indicator" in self.results_tree.identify_element(event.x, event.y):
+            return # Expanding/collapsing a group of duplicates
         if item_id:
-            current_tags = self.results_tree.item(item_id, "tags")
-            if "checked" in current_tags:
-                self.results_tree.item(item_id, tags=("unchecked",))
-                self.results_tree.set(item_id, "checkbox", "")
-            else:
-                self.results_tree.item(item_id, tags=("checked",))
-                self.results_tree.set(item_id, "checkbox", "✅")
+            self.results.toggle(item_id)
+            self.results_tree.set(item_id, "checkbox", self._checkbox(item_id))
 
     def select_all_results(self):
-        """Seleciona todos os itens na árvore de resultados."""
-        for item_id in self.results_tree.get_children():
-            self.results_tree.item(item_id, tags=("checked",))
-            self.results_tree.set(item_id, "checkbox", "✅")
+        """Seleciona todos os itens visíveis; só as linhas já desenhadas que mudaram são redesenhadas."""
+        self._schedule_render([item_id for item_id in self.results.select_all() if item_id in self._rendered])
 
     def clear_selection(self):
-        """Limpa a seleção de todos os itens na árvore de resultados."""
-        for item_id in self.results_tree.get_children():
-            self.results_tree.item(item_id, tags=("unchecked",))
-            self.results_tree.set(item_id, "checkbox", "")
+        """Limpa a seleção de todos os itens; só as linhas já desenhadas que mudaram são redesenhadas."""
+        self._schedule_render([item_id for item_id in self.results.select_none() if item_id in self._rendered])
 
     def perform_download(self):
         """Inicia o download dos vídeos selecionados."""
-        selected_items = [item_id for item_id in self.results_tree.get_children() if "checked" in self.results_tree.item(item_id, "tags")]
-        if not selected_items:
+        selected_videos = self.results.selected_videos()
+        if not selected_videos:
             messagebox.showwarning("Nenhuma Seleção", "Por favor, selecione pelo menos um vídeo para baixar.")
             return
 
-        urls_to_download = [self.video_data[item_id]["url"] for item_id in selected_items]
         download_format = self.format_var.get()
         
         try:
@@ -264,38 +607,146 @@ class YouTubeDownloaderApp:
         except ValueError:
             messagebox.showwarning("Entrada Inválida", "A concorrência deve ser um número.")
             return
+        if not self.apply_bandwidth_limit():
+            return
 
+        policy = self.download_policy()
+        throughput = self.expected_throughput()
+        ordered, projection = plan_downloads(selected_videos, concurrency, download_format, self.quality_var.get(),
+                                             policy, throughput, self.results.priorities())
+        urls_to_download = [video["url"] for video in ordered]
+        projected = {item["url"]: item["finish"] for item in projection["items"]}
         self.log_message(f"Iniciando download de {len(urls_to_download)} vídeos em formato {download_format}...")
+        self.log_message(describe_plan(projection, policy, throughput))
         self.download_button.config(state="disabled")
         self.progress_bar["value"] = 0
         self.progress_bar["maximum"] = len(urls_to_download)
 
-        threading.Thread(target=self._download_thread, args=(urls_to_download, concurrency, download_format, self.quality_var.get())).start()
+        threading.Thread(target=self._download_thread, args=(urls_to_download, concurrency, download_format, self.quality_var.get(), self.adaptive_var.get(), projected)).start()
+
+    def download_policy(self):
+        """Política de ordem dos downloads escolhida na interface (ver ``scheduler``)."""
+        return next((policy for policy, label in POLICY_LABELS.items() if label == self.order_var.get()), "fifo")
+
+    def expected_throughput(self):
+        """Banda total esperada (bytes/s) para as projeções: a medida no último lote, ou EXPECTED_THROUGHPUT.
+
+        Com limite de banda ativo, a projeção não passa do limite.
+        """
+        throughput = self.config.get("last_throughput")
+        if not throughput:
+            try:
+                throughput = parse_rate(get_expected_throughput())
+            except ValueError:
+                throughput = 0
+        throughput = throughput or 5_000_000
+        rate = get_governor().rate
+        return min(throughput, rate) if rate else throughput
 
-    def _download_thread(self, urls, concurrency, download_format, quality):
+    def _download_thread(self, urls, concurrency, download_format, quality, adaptive=False, projected=None):
         """Executa o download em uma thread separada para não bloquear a UI."""
         try:
-            download_many(
+            from downloader import download_many
+            started = time.monotonic()
+            result = download_many(
                 urls,
                 concurrency,
                 download_format,
                 self.download_dir,
-                progress_cb=self._update_progress,
                 log_cb=self.log_message,
-                quality=quality
+                events=self.events,
+                quality=quality,
+                adaptive=adaptive,
+                projected=projected
             )
-            self.master.after(0, lambda: self.log_message("Todos os downloads concluídos!"))
+            elapsed = time.monotonic() - started
+            if result["bytes"] >= 10_000_000 and elapsed > 0:
+                # Feeds the projections of the next batches; tiny batches say little about the link.
+                self.config["last_throughput"] = int(result["bytes"] / elapsed)
+            self.master.after(0, lambda: self.log_message(f"Todos os downloads concluídos em {elapsed:.0f}s!"))
         except Exception as e:
-            self.master.after(0, lambda: messagebox.showerror("Erro de Download", f"Ocorreu um erro durante o download: {e}"))
+            # Bind the text now: "e" is deleted when the except block ends, before the callback runs.
+            message = f"Ocorreu um erro durante o download: {e}"
+            self.master.after(0, lambda message=message: messagebox.showerror("Erro de Download", message))
         finally:
             self.master.after(0, lambda: self.download_button.config(state="normal"))
 
-    def _update_progress(self, current, total):
-        """Atualiza a barra de progresso global."""
-        self.master.after(0, lambda: self.progress_bar.config(value=current))
+    def perform_playlist_download(self):
+        """Baixa todos os vídeos da playlist ou canal do campo Artista, começando assim que cada um é listado."""
+        url = self.artist_entry.get().strip()
+        if not is_collection_url(url):
+            messagebox.showwarning("Entrada Inválida", "Informe no campo Artista a URL de uma playlist ou canal do YouTube.")
+            return
+        try:
+            concurrency = int(self.concurrency_entry.get())
+            min_views = int(self.min_views_entry.get())
+            date_after = parse_date(self.date_after_entry.get())
+        except ValueError:
+            messagebox.showwarning("Entrada Inválida", "A concorrência e as visualizações mínimas devem ser números, e a data deve estar no formato AAAA-MM-DD.")
+            return
+        if not self.apply_bandwidth_limit():
+            return
+
+        self.log_message(f"Baixando a playlist/canal {url}...")
+        self.download_button.config(state="disabled")
+        self.playlist_button.config(state="disabled")
+        self.progress_bar["value"] = 0
+        self.results.dedupe = False # Every entry of the playlist is downloaded, duplicates included
+        self._clear_results()
+        threading.Thread(target=self._playlist_download_thread, args=(url, concurrency, self.format_var.get(), self.quality_var.get(), self.adaptive_var.get(), min_views, date_after)).start()
+
+    def _playlist_download_thread(self, url, concurrency, download_format, quality, adaptive, min_views, date_after):
+        """Lista a playlist/canal e envia cada vídeo ao download assim que é encontrado."""
+        try:
+            from downloader import download_many
+            from playlist import iter_playlist_videos
+            videos = iter_playlist_videos(url, min_views=min_views, date_after=date_after, log_cb=self.log_message)
+            result = download_many(
+                (video["url"] for video in self._stream_results(videos)),
+                concurrency,
+                download_format,
+                self.download_dir,
+                log_cb=self.log_message,
+                events=self.events,
+                quality=quality,
+                adaptive=adaptive
+            )
+            self.master.after(0, lambda: self.log_message(f"Playlist/canal concluído: {result['total']} vídeo(s), {result['failed']} falha(s)."))
+        except Exception as e:
+            # Bind the text now: "e" is deleted when the except block ends, before the callback runs.
+            message = f"Ocorreu um erro durante o download da playlist: {e}"
+            self.master.after(0, lambda message=message: messagebox.showerror("Erro de Download", message))
+        finally:
+            self.master.after(0, lambda: (self.download_button.config(state="normal"), self.playlist_button.config(state="normal")))
+
+    def resume_pending_downloads(self):
+        """Retoma, em segundo plano, os downloads que ficaram pendentes da última execução."""
+        from downloader import pending_jobs
+        pending = pending_jobs()
+        if not pending:
+            return
+        self.log_message(f"Encontrados {len(pending)} download(s) pendente(s) da última execução. Retomando...")
+        self.download_button.config(state="disabled")
+        self.progress_bar["value"] = 0
+        self.progress_bar["maximum"] = len(pending)
+        threading.Thread(target=self._resume_thread, args=(self.max_concurrency,)).start()
+
+    def _resume_thread(self, concurrency):
+        """Executa a retomada dos downloads pendentes em uma thread separada."""
+        try:
+            from downloader import resume_pending
+            resume_pending(concurrency, log_cb=self.log_message, events=self.events)
+            self.master.after(0, lambda: self.log_message("Downloads pendentes concluídos!"))
+        except Exception as e:
+            # Bind the text now: "e" is deleted when the except block ends, before the callback runs.
+            message = f"Ocorreu um erro ao retomar os downloads: {e}"
+            self.master.after(0, lambda message=message: messagebox.showerror("Erro de Download", message))
+        finally:
+            self.master.after(0, lambda: self.download_button.config(state="normal"))
 
     def open_download_folder(self):
         """Abre a pasta de downloads no gerenciador de arquivos do sistema."""
+        import webbrowser
         try:
             path = os.path.abspath(self.download_dir)
             if os.path.exists(path):
@@ -0,0 +1,87 @@
+import os
+import re
+import threading
+
+from yt_dlp.utils import sanitize_filename
+
+from history import get_history_store
+
+# Files saved with an "[<videoId>]" suffix (yt-dlp's default template) can be
+# matched straight from the directory listing.
+_ID_IN_NAME_RE = re.compile(r"\[([0-9A-Za-z_-]{11})\]\.(\w+)$")
+
+# Extension -> format family, used when a file is only known by its name.
+_EXT_FAMILY = {"mp3": "mp3", "mp4": "mp4", "m4a": "audio", "opus": "audio", "ogg": "audio"}
+
+# Format family -> extensions its files may have.
+_FAMILY_EXTS = {"mp3": ("mp3",), "mp4": ("mp4",), "audio": ("m4a", "opus", "ogg", "mp3", "flac", "wav")}
+
+
+def format_key(format, quality=None):
+    """Retorna a chave de formato usada no histórico (ex.: "mp3", "audio", "mp4 (720p)")."""
+    if format in ("mp3", "audio"):
+        return format
+    return f"mp4 ({quality}p)" if quality else "mp4"
+
+
+def _family(key):
+    return key.split(" ", 1)[0] if key else key
+
+
+class DownloadArchive:
+    """Índice dos itens já baixados, por ID de vídeo e formato de saída."""
+
+    def __init__(self, outdir, history_store=None):
+        self.outdir = outdir
+        self.history_store = history_store or get_history_store()
+        self._keys = set()
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Reconstrói o índice a partir do histórico e do conteúdo da pasta de saída."""
+        names = set()
+        keys = set()
+        if os.path.isdir(self.outdir):
+            with os.scandir(self.outdir) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+                    names.add(entry.name)
+                    match = _ID_IN_NAME_RE.search(entry.name)
+                    if match and match.group(2) in _EXT_FAMILY:
+                        keys.add((match.group(1), _EXT_FAMILY[match.group(2)]))
+
+        for video_id, fmt, title, filepath in self.history_store.iter_index():
+            if not video_id or not fmt:
+                continue
+            if filepath:
+                exists = os.path.exists(filepath)
+            else:
+                # Older history entries have no path; fall back to the "<title>.<ext>"
+                # name the downloader has always used.
+                name = sanitize_filename(title or '')
+                exists = any(f"{name}.{ext}" in names for ext in _FAMILY_EXTS.get(_family(fmt), ("mp4",)))
+            if exists:
+                keys.add((video_id, fmt))
+
+        with self._lock:
+            self._keys = keys
+
+    def contains(self, video_id, key):
+        """Indica se o vídeo já foi baixado no formato indicado."""
+        if not video_id:
+            return False
+        with self._lock:
+            # A file matched only by extension counts for every quality of that format.
+            return (video_id, key) in self._keys or (video_id, _family(key)) in self._keys
+
+    def add(self, video_id, key):
+        """Marca um vídeo como baixado no formato indicado."""
+        if video_id:
+            with self._lock:
+                self._keys.add((video_id, key))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._keys)
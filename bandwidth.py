@@ -0,0 +1,179 @@
+import datetime
+import re
+import threading
+import time
+
+from metrics import metrics
+from utils import get_bandwidth_burst, get_bandwidth_limit, get_bandwidth_schedule
+
+_UNITS = {"": 1, "K": 1_000, "M": 1_000_000, "G": 1_000_000_000}
+_RATE_RE = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s*([KMG]?)(?:B|B/S|/S)?\s*$", re.IGNORECASE)
+_WINDOW_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*=\s*(.+?)\s*$")
+
+# Schedules are re-evaluated at most this often (seconds).
+SCHEDULE_CHECK_INTERVAL = 30.0
+
+
+def parse_rate(text):
+    """Converte uma taxa como "500K", "2.5M" ou "1000000" em bytes/s (0 ou vazio = sem limite)."""
+    if text is None or str(text).strip() == "":
+        return 0
+    match = _RATE_RE.match(str(text))
+    if not match:
+        raise ValueError(f"taxa inválida: {text!r} (use, por exemplo, 500K, 2M ou 1.5M)")
+    return int(float(match.group(1).replace(",", ".")) * _UNITS[match.group(2).upper()])
+
+
+def parse_schedule(text):
+    """Converte "08:00-18:00=2M; 18:00-08:00=10M" em uma lista de (início, fim, bytes/s), em minutos do dia.
+
+    Janelas que passam da meia-noite são aceitas; a primeira janela que
+    contém o horário atual vale.
+    """
+    windows = []
+    for part in re.split(r"[;,]", text or ""):
+        if not part.strip():
+            continue
+        match = _WINDOW_RE.match(part)
+        if not match:
+            raise ValueError(f"janela de horário inválida: {part.strip()!r} (use HH:MM-HH:MM=TAXA)")
+        h1, m1, h2, m2, rate = match.groups()
+        if int(h1) > 23 or int(h2) > 24 or int(m1) > 59 or int(m2) > 59:
+            raise ValueError(f"horário inválido: {part.strip()!r}")
+        windows.append((int(h1) * 60 + int(m1), int(h2) * 60 + int(m2), parse_rate(rate)))
+    return windows
+
+
+class TokenBucket:
+    """Balde de fichas em bytes: enche a ``rate`` bytes/s até ``burst`` bytes.
+
+    ``consume`` retira os bytes já transferidos e retorna quanto tempo o
+    chamador deve esperar; o saldo pode ficar negativo (dívida), então
+    blocos grandes de uma vez não furam o limite médio.
+    """
+
+    def __init__(self, rate, burst=None):
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._last = time.monotonic()
+        self.rate = 0
+        self.burst = 0
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate, burst=None):
+        with self._lock:
+            self._refill()
+            self.rate = max(0, int(rate or 0))
+            self.burst = max(1, int(burst or self.rate or 1))  # Default burst: one second of traffic
+            self._tokens = min(self._tokens, self.burst) if self._tokens else float(self.burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def consume(self, amount):
+        """Retira ``amount`` bytes e retorna a espera necessária (s) para respeitar a taxa."""
+        with self._lock:
+            if not self.rate:
+                return 0.0
+            self._refill()
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class BandwidthGovernor:
+    """Limite de banda total do processo, compartilhado por todos os downloads.
+
+    Cada worker informa os bytes recebidos pelo progress hook do yt-dlp e
+    dorme o necessário para que a soma de todos fique abaixo da taxa. Como
+    o balde é um só, um download sozinho pode usar a taxa inteira, e a
+    banda de um download que termina passa automaticamente aos demais.
+    Com ``schedule`` (ver ``parse_schedule``), a taxa muda conforme o
+    horário; fora das janelas vale ``rate``. Taxa 0 desliga o limite.
+    """
+
+    def __init__(self, rate=0, burst=None, schedule=None):
+        self._lock = threading.Lock()
+        self._last_seen = {}
+        self._bucket = TokenBucket(0)
+        self._next_check = 0.0
+        self.configure(rate, burst, schedule)
+
+    def configure(self, rate=0, burst=None, schedule=None):
+        """Altera a taxa base (bytes/s), a rajada (bytes) e as janelas de horário."""
+        with self._lock:
+            self.base_rate = max(0, int(rate or 0))
+            self.burst_size = burst
+            self.schedule = list(schedule or [])
+            self._next_check = 0.0
+        self._apply_schedule(force=True)
+
+    def rate_at(self, when=None):
+        """Taxa (bytes/s) em vigor no horário indicado (padrão: agora)."""
+        when = when or datetime.datetime.now()
+        minute = when.hour * 60 + when.minute
+        for start, end, rate in self.schedule:
+            inside = start <= minute < end if start < end else (minute >= start or minute < end)
+            if inside:
+                return rate
+        return self.base_rate
+
+    @property
+    def rate(self):
+        return self._bucket.rate
+
+    @property
+    def enabled(self):
+        return bool(self.base_rate or self.schedule)
+
+    def _apply_schedule(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now < self._next_check:
+                return
+            self._next_check = now + SCHEDULE_CHECK_INTERVAL
+        rate = self.rate_at()
+        if force or rate != self._bucket.rate:
+            self._bucket.set_rate(rate, self.burst_size)
+
+    def throttle(self, nbytes):
+        """Desconta ``nbytes`` do orçamento e bloqueia a thread atual pelo tempo necessário."""
+        if nbytes <= 0 or not self.enabled:
+            return
+        if self.schedule:
+            self._apply_schedule()
+        wait = self._bucket.consume(nbytes)
+        if wait > 0:
+            metrics.inc("bandwidth_wait_seconds_total", wait)
+            time.sleep(wait)
+
+    def on_progress(self, d):
+        """Progress hook do yt-dlp: limita a thread que está baixando conforme os bytes recebidos."""
+        if d.get('status') not in ('downloading', 'finished') or d.get('chunked'):
+            return  # Chunked downloads throttle each of their connections themselves
+        key = d.get('tmpfilename') or d.get('filename')
+        downloaded = d.get('downloaded_bytes') or 0
+        with self._lock:
+            previous = self._last_seen.get(key, 0)
+            if d['status'] == 'finished':
+                self._last_seen.pop(key, None)
+            else:
+                self._last_seen[key] = downloaded
+        if d['status'] == 'downloading':
+            self.throttle(downloaded - previous)
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor():
+    """Retorna o limitador de banda do processo, configurado pelo .env no primeiro uso."""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = BandwidthGovernor(parse_rate(get_bandwidth_limit()), parse_rate(get_bandwidth_burst()) or None,
+                                          parse_schedule(get_bandwidth_schedule()))
+        return _governor
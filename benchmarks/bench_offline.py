@@ -0,0 +1,257 @@
+"""Benchmark offline de busca, download e histórico, com substitutos locais do YouTube.
+
+Sobe um servidor HTTP local com áudios/vídeos gerados pelo ffmpeg (lidos
+pelo extrator genérico do yt-dlp) e uma YouTube Data API falsa, e mede
+``search_videos``, ``download_many`` e ``save_history``. Cada cenário roda
+em um processo próprio, com DOWNLOAD_DIR e CACHE_DIR temporários, para que
+o pico de memória e os bancos de dados não se misturem entre medições.
+
+Para cada cenário são informados itens/s, MB/s, latência p50/p95 por item
+e o pico de memória (RSS) do processo e dos processos filhos (ffmpeg).
+
+Uso:
+  python benchmarks/bench_offline.py
+  python benchmarks/bench_offline.py --concurrency 1 4 8 --formats mp3 --items 16
+  python benchmarks/bench_offline.py --history-sizes 0 100000 --json resultados.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentile(values, fraction):
+    """Percentil pelo método do posto mais próximo (None para listas vazias)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def _peak_rss_mb():
+    """Pico de memória (MB) deste processo e do maior processo filho já encerrado."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None, None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return round(own / 1_000_000, 1), round(children / 1_000_000, 1)
+
+
+def _summary(name, items, elapsed, latencies, nbytes=0, **extra):
+    rss, children_rss = _peak_rss_mb()
+    p50, p95 = _percentile(latencies, 0.50), _percentile(latencies, 0.95)
+    return {
+        "scenario": name,
+        "items": items,
+        "elapsed": round(elapsed, 3),
+        "items_per_second": round(items / elapsed, 2) if elapsed else 0.0,
+        "mb_per_second": round(nbytes / 1_000_000 / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+        "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+        "peak_rss_mb": rss,
+        "children_peak_rss_mb": children_rss,
+        **extra,
+    }
+
+
+def _fill_history(size):
+    """Preenche o histórico com ``size`` entradas fictícias e retorna o tempo gasto (s)."""
+    from history import get_history_store
+
+    store = get_history_store()
+    start = time.perf_counter()
+    for i in range(size):
+        store.add({
+            "videoId": f"h{i:010d}",
+            "title": f"Histórico {i}",
+            "url": f"https://www.youtube.com/watch?v=h{i:010d}",
+            "format": "mp3" if i % 2 else "mp4 (720p)",
+            "filepath": os.path.join("removido", f"Histórico {i}.mp3"),
+            "download_date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    store.flush()
+    return time.perf_counter() - start
+
+
+class _LatencyRecorder:
+    """Recebe os eventos de ``download_many`` (mesma interface do ``ProgressBus``) e mede cada item."""
+
+    def __init__(self):
+        self.started = {}
+        self.latencies = []
+
+    def progress(self, url, status=None, **fields):
+        if status == "downloading":
+            self.started.setdefault(url, time.perf_counter())
+        elif status in ("done", "failed") and url in self.started:
+            self.latencies.append(time.perf_counter() - self.started.pop(url))
+
+    def counter(self, done, total):
+        pass
+
+
+def run_download(scenario):
+    """Baixa ``items`` arquivos do servidor local com o pipeline completo."""
+    from downloader import download_many
+    from history import get_history_store
+
+    _fill_history(scenario["history"])
+    outdir = os.path.join(os.environ["DOWNLOAD_DIR"], "out")
+    urls = [scenario["media_url"] + name for name in scenario["files"]]
+    recorder = _LatencyRecorder()
+    start = time.perf_counter()
+    result = download_many(urls, scenario["concurrency"], scenario["format"], outdir,
+                           quality="360" if scenario["format"] == "mp4" else None,
+                           adaptive=False, events=recorder)
+    elapsed = time.perf_counter() - start
+    get_history_store().flush()
+    name = f"download {scenario['format']} c={scenario['concurrency']} hist={scenario['history']}"
+    return _summary(name, result["submitted"] - result["failed"], elapsed, recorder.latencies, result["bytes"],
+                    failed=result["failed"], stages=result["stages"])
+
+
+def run_history(scenario):
+    """Mede a gravação do histórico, a busca por ID e a carga do arquivo de downloads."""
+    import random
+
+    from archive import DownloadArchive
+    from history import get_history_store
+
+    size = scenario["history"]
+    elapsed = _fill_history(size)
+    store = get_history_store()
+    rng = random.Random(0)
+    lookups = []
+    for _ in range(500):
+        video_id = f"h{rng.randrange(max(1, size)):010d}"
+        start = time.perf_counter()
+        store.find_by_video_id(video_id)
+        lookups.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    DownloadArchive(os.environ["DOWNLOAD_DIR"], store)
+    archive_load = time.perf_counter() - start
+    return _summary(f"save_history n={size}", size, elapsed, lookups,
+                    archive_load_ms=round(archive_load * 1000, 2))
+
+
+def run_search(scenario):
+    """Faz ``searches`` buscas pela API falsa; a latência é a de cada chamada a ``search_videos``."""
+    from googleapiclient.discovery import build
+
+    import youtube_api
+
+    youtube_api.YOUTUBE_API_KEY = "benchmark"
+    youtube_api._client = build("youtube", "v3", developerKey="benchmark", static_discovery=True,
+                                cache_discovery=False, client_options={"api_endpoint": scenario["api_url"]})
+    latencies = []
+    results = 0
+    start = time.perf_counter()
+    # With the cache on, the same artists are searched twice: the second round measures cache hits.
+    for _ in range(2 if scenario["cache"] else 1):
+        for i in range(scenario["searches"]):
+            search_start = time.perf_counter()
+            results += len(youtube_api.search_videos(f"Artista {i}", scenario["limit"], use_cache=scenario["cache"]))
+            latencies.append(time.perf_counter() - search_start)
+    elapsed = time.perf_counter() - start
+    name = f"search limit={scenario['limit']} {'com cache' if scenario['cache'] else 'sem cache'}"
+    return _summary(name, results, elapsed, latencies, cache=youtube_api.cache_stats())
+
+
+RUNNERS = {"download": run_download, "history": run_history, "search": run_search}
+
+
+def run_isolated(scenario):
+    """Executa um cenário em um processo novo, com pastas de dados temporárias."""
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ,
+                   DOWNLOAD_DIR=os.path.join(workdir, "downloads"),
+                   CACHE_DIR=os.path.join(workdir, "cache"),
+                   MAX_ATTEMPTS="1")
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), "--run", json.dumps(scenario)],
+                                 cwd=workdir, env=env, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"cenário {scenario['kind']} falhou:\n{process.stderr}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def print_table(results):
+    header = f"{'cenário':<36}{'itens':>7}{'itens/s':>10}{'MB/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'RSS MB':>9}{'filhos MB':>11}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        cells = [r["p50_ms"], r["p95_ms"], r["peak_rss_mb"], r["children_peak_rss_mb"]]
+        p50, p95, rss, children = ("-" if value is None else value for value in cells)
+        print(f"{r['scenario']:<36}{r['items']:>7}{r['items_per_second']:>10}{r['mb_per_second']:>8}"
+              f"{p50:>10}{p95:>10}{rss:>9}{children:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=8, help="arquivos por cenário de download (padrão: 8)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8], help="downloads simultâneos a testar")
+    parser.add_argument("--formats", nargs="+", choices=("mp3", "audio", "mp4"), default=["mp3", "mp4"])
+    parser.add_argument("--history-sizes", type=int, nargs="+", default=[0, 10_000, 100_000],
+                        help="tamanhos de histórico pré-existente a testar")
+    parser.add_argument("--seconds", type=int, default=20, help="duração das mídias geradas (padrão: 20)")
+    parser.add_argument("--rate", type=float, default=4.0, help="banda por conexão do servidor local em MB/s (0 = sem limite)")
+    parser.add_argument("--searches", type=int, default=20, help="buscas por cenário de busca (padrão: 20)")
+    parser.add_argument("--search-limit", type=int, default=50, help="resultados por busca (padrão: 50)")
+    parser.add_argument("--api-latency", type=float, default=20.0, help="latência simulada da API em ms (padrão: 20)")
+    parser.add_argument("--media-dir", default=None, help="pasta para reaproveitar as mídias geradas entre execuções")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        scenario = json.loads(args.run)
+        result = RUNNERS[scenario["kind"]](scenario)
+        print(json.dumps(result, default=str))
+        return
+
+    from fakes import FakeYouTubeAPI, MediaServer, fake_catalog, generate_media
+
+    with tempfile.TemporaryDirectory() as tmp:
+        media_dir = args.media_dir or os.path.join(tmp, "media")
+        files = generate_media(media_dir, args.items, args.seconds)
+        files["audio"] = files["mp3"]  # The native-audio mode reads the same m4a sources, without converting them
+        scenarios = [{"kind": "search", "searches": args.searches, "limit": args.search_limit, "cache": cache}
+                     for cache in (False, True)]
+        scenarios += [{"kind": "history", "history": size} for size in args.history_sizes if size]
+        scenarios += [{"kind": "download", "format": format, "concurrency": concurrency, "history": 0,
+                       "files": files[format]}
+                      for format in args.formats for concurrency in args.concurrency]
+        scenarios += [{"kind": "download", "format": args.formats[0], "concurrency": max(args.concurrency),
+                       "history": size, "files": files[args.formats[0]]}
+                      for size in args.history_sizes if size]
+
+        results = []
+        with MediaServer(media_dir, rate=args.rate * 1_000_000) as media, \
+                FakeYouTubeAPI(fake_catalog(500), latency=args.api_latency / 1000) as api:
+            for scenario in scenarios:
+                scenario.update(media_url=media.url, api_url=api.url)
+                results.append(run_isolated(scenario))
+                print(f"  {results[-1]['scenario']}: {results[-1]['items_per_second']} itens/s", file=sys.stderr)
+            api_requests = dict(api.requests)
+
+    print_table(results)
+    print(f"\nRequisições à API falsa: {api_requests}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results, "api_requests": api_requests}, f, indent=2, default=str)
+        print(f"Resultados gravados em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
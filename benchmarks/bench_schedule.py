@@ -0,0 +1,94 @@
+"""Compara as políticas de ordem dos downloads (``scheduler``) em um lote misto.
+
+Sobe um servidor HTTP local com várias faixas curtas e um vídeo longo
+(áudio gerado pelo ffmpeg, banda limitada por conexão) e baixa o lote com
+cada política, na ordem em que os resultados chegariam da busca (o longo
+por último). Para cada política são informados o tempo até a primeira
+faixa pronta, o tempo total do lote e a projeção do ``scheduler``.
+
+Uso:
+  python benchmarks/bench_schedule.py
+  python benchmarks/bench_schedule.py --short 8 --short-seconds 8 --long-seconds 120 --rate 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import MediaServer, generate_media
+
+
+class _Recorder:
+    """Recebe os eventos de ``download_many`` e guarda quando cada item terminou."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.finished = {}
+
+    def progress(self, url, **fields):
+        if fields.get("status") == "done":
+            self.finished[url] = time.monotonic() - self.started
+
+    def counter(self, done, total):
+        pass
+
+    def log(self, message):
+        pass
+
+
+def run(policy, videos, concurrency, rate, workdir):
+    from downloader import download_many
+    from jobqueue import JobQueue
+    from scheduler import plan_downloads
+
+    ordered, projection = plan_downloads(videos, concurrency, "audio", policy=policy, throughput=rate * concurrency)
+    outdir = os.path.join(workdir, policy)
+    jobs = JobQueue(os.path.join(workdir, f"{policy}.db"))
+    recorder = _Recorder()
+    download_many([video["url"] for video in ordered], concurrency, "audio", outdir, events=recorder, job_queue=jobs)
+    jobs.close()
+    times = sorted(recorder.finished.values())
+    return {
+        "first": times[0] if times else None,
+        "makespan": times[-1] if times else None,
+        "projected_first": projection["first"],
+        "projected_makespan": projection["makespan"],
+        "done": len(times),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--short", type=int, default=6, help="faixas curtas no lote (padrão: 6)")
+    parser.add_argument("--short-seconds", type=int, default=8, help="duração das faixas curtas (padrão: 8)")
+    parser.add_argument("--long-seconds", type=int, default=96, help="duração do vídeo longo (padrão: 96)")
+    parser.add_argument("--rate", type=int, default=100_000, help="bytes/s por conexão no servidor (padrão: 100000)")
+    parser.add_argument("--concurrency", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["DOWNLOAD_DIR"] = workdir  # History and archive files stay out of the real downloads folder
+        os.environ["CACHE_DIR"] = workdir
+        media = os.path.join(workdir, "media")
+        short = generate_media(os.path.join(media, "short"), args.short, args.short_seconds)["mp3"]
+        generate_media(os.path.join(media, "long"), 1, args.long_seconds)
+        # Output files are named after the title (the file name), so the long one needs a name of its own.
+        os.rename(os.path.join(media, "long", "a1.m4a"), os.path.join(media, "long", "longo.m4a"))
+        with MediaServer(media, rate=args.rate) as server:
+            videos = [{"url": f"{server.url}short/{name}", "duration": args.short_seconds} for name in short]
+            videos.append({"url": f"{server.url}long/longo.m4a", "duration": args.long_seconds})
+            print(f"{len(videos)} itens, {args.concurrency} simultâneos, {args.rate / 1000:.0f} KB/s por conexão")
+            print(f"{'política':<10} {'1ª pronta':>10} {'lote':>8} {'proj. 1ª':>9} {'proj. lote':>11}")
+            for policy in ("fifo", "longest", "shortest"):
+                r = run(policy, videos, args.concurrency, args.rate, workdir)
+                print(f"{policy:<10} {r['first']:>9.1f}s {r['makespan']:>7.1f}s "
+                      f"{r['projected_first']:>8.1f}s {r['projected_makespan']:>10.1f}s  ({r['done']}/{len(videos)})")
+
+
+if __name__ == "__main__":
+    main()
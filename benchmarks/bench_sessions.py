@@ -0,0 +1,76 @@
+"""Mede o custo de preparação por item antes e depois da reutilização de sessões.
+
+Compara, sem acessar a rede:
+  * criar um ``yt_dlp.YoutubeDL`` novo para cada item vs. reutilizar o da
+    sessão da thread (``sessions.SessionPool``);
+  * chamar ``googleapiclient.discovery.build`` a cada busca vs. o cliente
+    em cache (``youtube_api.get_youtube_client``).
+
+Uso: python benchmarks/bench_sessions.py [--items 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp
+from googleapiclient.discovery import build
+
+import youtube_api
+from sessions import SessionPool, profile_options
+
+
+def _timeit(fn, items):
+    start = time.perf_counter()
+    for _ in range(items):
+        fn()
+    return (time.perf_counter() - start) / items
+
+
+def bench_ydl(items, outdir):
+    """Custo médio (s) por item de cada perfil, com instância nova e com sessão reutilizada."""
+    results = {}
+    for format, quality in (("mp3", None), ("mp4", "360"), ("mp4", "720"), ("mp4", "1080")):
+        def fresh():
+            with yt_dlp.YoutubeDL(profile_options(format, outdir, quality)):
+                pass
+
+        pool = SessionPool()
+        reused = _timeit(lambda: pool.get(format, outdir, quality), items)
+        pool.close()
+        name = format if format == "mp3" else f"{format}-{quality}p"
+        results[name] = (_timeit(fresh, items), reused)
+    return results
+
+
+def bench_api_client(items):
+    """Custo médio (s) por busca de construir o cliente da API vs. usar o cliente em cache."""
+    key = youtube_api.YOUTUBE_API_KEY or "benchmark"
+
+    def fresh():
+        build("youtube", "v3", developerKey=key, static_discovery=True, cache_discovery=False)
+
+    youtube_api.get_youtube_client()
+    return _timeit(fresh, items), _timeit(youtube_api.get_youtube_client, items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=200, help="itens simulados por medição")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as outdir:
+        ydl_results = bench_ydl(args.items, outdir)
+    api_fresh, api_cached = bench_api_client(max(1, args.items // 10))
+
+    print(f"{'etapa':<22}{'antes (ms/item)':>18}{'depois (ms/item)':>18}{'ganho':>10}")
+    for name, (before, after) in ydl_results.items():
+        print(f"{'YoutubeDL ' + name:<22}{before * 1000:>18.3f}{after * 1000:>18.3f}{before / max(after, 1e-9):>9.0f}x")
+    print(f"{'cliente da API':<22}{api_fresh * 1000:>18.3f}{api_cached * 1000:>18.3f}{api_fresh / max(api_cached, 1e-9):>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Mede o tempo de inicialização do aplicativo a partir dos dados de ``-X importtime``.
+
+Para cada módulo medido, roda ``python -X importtime -c "import <módulo>"``
+em um processo novo algumas vezes e informa a mediana do tempo acumulado
+de importação, além das dependências diretas mais caras. ``app`` é o que
+precisa carregar antes de a janela aparecer; ``youtube_api`` e
+``downloader`` são carregados em segundo plano depois disso.
+
+Se houver uma tela disponível, também mede o tempo até a janela principal
+ser desenhada (``--window``).
+
+Uso: python benchmarks/bench_startup.py [--runs 5] [--top 10] [--window]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ("app", "youtube_api", "downloader")
+
+_WINDOW_SCRIPT = """
+import time
+start = time.perf_counter()
+import tkinter as tk
+import app
+root = tk.Tk()
+app.YouTubeDownloaderApp(root)
+root.update()
+print(time.perf_counter() - start)
+root.destroy()
+"""
+
+
+def parse_importtime(stderr):
+    """Converte a saída de ``-X importtime`` em uma lista de (profundidade, módulo, própria µs, acumulada µs)."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        entries.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def measure_import(module):
+    """Importa ``module`` em um processo novo e retorna as entradas do importtime."""
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             cwd=ROOT, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"falha ao importar {module}:\n{process.stderr[-2000:]}")
+    return parse_importtime(process.stderr)
+
+
+def bench_module(module, runs, top):
+    """Mediana do tempo acumulado (ms) e as dependências diretas mais caras do módulo."""
+    totals = []
+    children = {}
+    for _ in range(runs):
+        entries = measure_import(module)
+        target = next(i for i in range(len(entries) - 1, -1, -1) if entries[i][1] == module)
+        totals.append(entries[target][3])
+        # Children of the target are listed right before it, one level deeper.
+        depth = entries[target][0]
+        i = target - 1
+        while i >= 0 and entries[i][0] > depth:
+            if entries[i][0] == depth + 1:
+                children.setdefault(entries[i][1], []).append(entries[i][3])
+            i -= 1
+    heaviest = sorted(((statistics.median(v), name) for name, v in children.items()), reverse=True)[:top]
+    return statistics.median(totals) / 1000, [(name, us / 1000) for us, name in heaviest]
+
+
+def bench_window(runs):
+    """Mediana do tempo (s) até a janela principal ser desenhada, ou None se não houver tela."""
+    times = []
+    for _ in range(runs):
+        process = subprocess.run([sys.executable, "-c", _WINDOW_SCRIPT], cwd=ROOT, capture_output=True, text=True)
+        if process.returncode != 0:
+            return None
+        times.append(float(process.stdout.strip().splitlines()[-1]))
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="execuções por módulo (padrão: 5)")
+    parser.add_argument("--top", type=int, default=8, help="dependências diretas listadas por módulo (padrão: 8)")
+    parser.add_argument("--window", action="store_true", help="mede também o tempo até a janela aparecer")
+    args = parser.parse_args()
+
+    for module in MODULES:
+        total, heaviest = bench_module(module, args.runs, args.top)
+        print(f"import {module}: {total:.1f} ms (mediana de {args.runs})")
+        for name, ms in heaviest:
+            print(f"    {name:<40}{ms:>9.1f} ms")
+    if args.window:
+        elapsed = bench_window(args.runs)
+        if elapsed is None:
+            print("janela: sem tela disponível (defina DISPLAY para medir)")
+        else:
+            print(f"janela desenhada em {elapsed * 1000:.0f} ms (mediana de {args.runs})")
+
+
+if __name__ == "__main__":
+    main()
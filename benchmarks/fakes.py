@@ -0,0 +1,237 @@
+"""Substitutos locais do YouTube para os benchmarks (sem acesso à rede).
+
+* ``MediaServer``: servidor HTTP que entrega arquivos de áudio/vídeo gerados
+  com o ffmpeg ao extrator genérico do yt-dlp, com suporte a ``Range`` e
+  limite opcional de banda por conexão.
+* ``FakeYouTubeAPI``: responde a ``search().list`` e ``videos().list`` da
+  YouTube Data API com JSON fixo, gerado a partir de uma semente.
+"""
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _ffmpeg():
+    return shutil.which("ffmpeg") or "ffmpeg"
+
+
+def generate_media(directory, count, seconds=10):
+    """Gera ``count`` cópias de um áudio (``a<n>.m4a``) e de um vídeo (``v<n>.mp4``) de teste.
+
+    Cada cópia tem um nome próprio, então o yt-dlp a trata como um item
+    diferente. Retorna os nomes dos arquivos de áudio e de vídeo.
+    """
+    os.makedirs(directory, exist_ok=True)
+    audio = os.path.join(directory, "base.m4a")
+    video = os.path.join(directory, "base.mp4")
+    if not os.path.exists(audio):
+        subprocess.run([_ffmpeg(), "-y", "-hide_banner", "-loglevel", "error",
+                        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+                        "-c:a", "aac", "-b:a", "128k", audio], check=True)
+    if not os.path.exists(video):
+        subprocess.run([_ffmpeg(), "-y", "-hide_banner", "-loglevel", "error",
+                        "-f", "lavfi", "-i", f"testsrc=size=640x360:rate=25:duration={seconds}",
+                        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+                        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+                        "-c:a", "aac", "-b:a", "128k", "-shortest", video], check=True)
+    names = {"mp3": [], "mp4": []}
+    for i in range(1, count + 1):
+        for format, source, name in (("mp3", audio, f"a{i}.m4a"), ("mp4", video, f"v{i}.mp4")):
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                shutil.copyfile(source, path)
+            names[format].append(name)
+    return names
+
+
+class _ServerThread:
+    """Roda um ``ThreadingHTTPServer`` em segundo plano; use como gerenciador de contexto."""
+
+    def __init__(self, handler):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class MediaServer(_ServerThread):
+    """Servidor HTTP de arquivos de mídia; ``rate`` limita os bytes/s de cada conexão (0 = sem limite)."""
+
+    def __init__(self, directory, rate=0):
+        server = self
+
+        class Handler(SimpleHTTPRequestHandler):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, directory=directory, **kwargs)
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                path = self.translate_path(self.path)
+                if not os.path.isfile(path):
+                    self.send_error(404)
+                    return
+                size = os.path.getsize(path)
+                start, end = 0, size - 1
+                match = re.match(r"bytes=(\d*)-(\d*)$", self.headers.get("Range", ""))
+                if match and (match.group(1) or match.group(2)):
+                    if match.group(1):
+                        start = int(match.group(1))
+                        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+                    else:
+                        start = max(0, size - int(match.group(2)))
+                    if start > end:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{size}")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", self.guess_type(path))
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("Accept-Ranges", "bytes")
+                self.end_headers()
+                server._send_file(self.wfile, path, start, end - start + 1)
+
+        super().__init__(Handler)
+        self.rate = rate
+
+    def _send_file(self, wfile, path, offset, length):
+        started = time.monotonic()
+        sent = 0
+        try:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                while sent < length:
+                    chunk = f.read(min(CHUNK_SIZE, length - sent))
+                    if not chunk:
+                        break
+                    wfile.write(chunk)
+                    sent += len(chunk)
+                    if self.rate:
+                        delay = sent / self.rate - (time.monotonic() - started)
+                        if delay > 0:
+                            time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def fake_catalog(count, seed=0):
+    """Lista determinística de vídeos falsos com título, canal, duração e visualizações."""
+    rng = random.Random(seed)
+    channels = ["Artista VEVO", "Artista Official", "Canal de Covers", "Fã Clube", "Ao Vivo TV"]
+    catalog = []
+    for i in range(count):
+        seconds = rng.randint(90, 600)
+        catalog.append({
+            "id": f"vid{i:08d}"[-11:],
+            "title": f"Música de teste {i}",
+            "channelTitle": rng.choice(channels),
+            "channelId": f"UC{rng.randrange(10**10):022d}",
+            "duration": f"PT{seconds // 60}M{seconds % 60}S",
+            "viewCount": str(rng.randint(1_000, 50_000_000)),
+        })
+    return catalog
+
+
+class FakeYouTubeAPI(_ServerThread):
+    """Simula os endpoints ``/youtube/v3/search`` e ``/youtube/v3/videos`` com respostas fixas.
+
+    A busca pagina o catálogo com ``maxResults``/``pageToken`` como a API
+    real; ``latency`` (segundos) é somado a cada resposta para simular a
+    ida e volta pela rede. ``requests`` conta as chamadas por endpoint.
+    """
+
+    def __init__(self, catalog, latency=0.0):
+        self.catalog = catalog
+        self.latency = latency
+        self.requests = {"search": 0, "videos": 0}
+        self._by_id = {video["id"]: video for video in catalog}
+        self._lock = threading.Lock()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                endpoint = url.path.rstrip("/").rsplit("/", 1)[-1]
+                if endpoint == "search":
+                    body = api._search(params)
+                elif endpoint == "videos":
+                    body = api._videos(params)
+                else:
+                    self.send_error(404)
+                    return
+                with api._lock:
+                    api.requests[endpoint] += 1
+                if api.latency:
+                    time.sleep(api.latency)
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        super().__init__(Handler)
+
+    def _search(self, params):
+        size = min(50, int(params.get("maxResults", 5)))
+        offset = int(params.get("pageToken") or 0)
+        page = self.catalog[offset:offset + size]
+        body = {
+            "kind": "youtube#searchListResponse",
+            "items": [{
+                "kind": "youtube#searchResult",
+                "id": {"kind": "youtube#video", "videoId": video["id"]},
+                "snippet": {"title": video["title"], "channelTitle": video["channelTitle"], "channelId": video["channelId"]},
+            } for video in page],
+        }
+        if offset + size < len(self.catalog):
+            body["nextPageToken"] = str(offset + size)
+        return body
+
+    def _videos(self, params):
+        ids = [video_id for video_id in params.get("id", "").split(",") if video_id in self._by_id]
+        return {
+            "kind": "youtube#videoListResponse",
+            "items": [{
+                "kind": "youtube#video",
+                "id": video_id,
+                "contentDetails": {"duration": self._by_id[video_id]["duration"]},
+                "statistics": {"viewCount": self._by_id[video_id]["viewCount"]},
+            } for video_id in ids],
+        }
@@ -0,0 +1,120 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache (namespace, expires);
+"""
+
+
+def make_key(*parts):
+    """Gera uma chave de cache estável a partir de valores simples."""
+    return json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+
+
+class TTLCache:
+    """Cache persistente em SQLite com validade (TTL) e uma camada LRU em memória.
+
+    Os valores precisam ser serializáveis em JSON. Várias instâncias podem
+    compartilhar o mesmo arquivo usando ``namespace`` diferentes. No disco
+    ficam até ``max_disk_entries`` chaves por namespace (padrão: 4 vezes
+    ``max_entries``); a cada gravação saem as expiradas e, passando do
+    limite, as que vencem primeiro.
+    """
+
+    def __init__(self, path, namespace, ttl, max_entries=1024, max_disk_entries=None):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries or max_entries * 4
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        with self._conn:
+            self._conn.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+            self._prune()
+
+    def _prune(self):
+        """Apaga as chaves expiradas do namespace e, acima de ``max_disk_entries``, as que vencem primeiro."""
+        self._conn.execute("DELETE FROM cache WHERE namespace = ? AND expires < ?", (self.namespace, time.time()))
+        self._conn.execute(
+            "DELETE FROM cache WHERE namespace = ? AND key IN "
+            "(SELECT key FROM cache WHERE namespace = ? ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_disk_entries),
+        )
+
+    def _remember(self, key, expires, value):
+        self._memory[key] = (expires, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key, default=None):
+        """Retorna o valor em cache, ou ``default`` se não existir ou estiver expirado."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] >= now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT value, expires FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+            if row is None or row[1] < now:
+                self.misses += 1
+                return default
+            value = json.loads(row[0])
+            self._remember(key, row[1], value)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Armazena um valor com a validade padrão (ou ``ttl`` segundos)."""
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, expires, value)
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+                    (self.namespace, key, json.dumps(value, ensure_ascii=False), expires),
+                )
+                self._prune()
+
+    def invalidate(self, key=None):
+        """Remove uma chave do cache, ou todas as chaves do namespace se ``key`` for None."""
+        with self._lock:
+            with self._conn:
+                if key is None:
+                    self._memory.clear()
+                    self._conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+                else:
+                    self._memory.pop(key, None)
+                    self._conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def stats(self):
+        """Retorna os contadores de acertos e falhas do cache."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self._memory)}
@@ -0,0 +1,229 @@
+import json
+import os
+import queue
+import threading
+import time
+
+import yt_dlp
+from yt_dlp.downloader import FileDownloader, HttpFD
+from yt_dlp.networking import Request
+
+from bandwidth import get_governor
+from metrics import metrics
+from utils import get_chunk_connections, get_chunked_min_size
+
+# Size of each byte range. YouTube throttles single requests above ~10 MB,
+# which is also why yt-dlp splits its own requests (http_chunk_size).
+PIECE_SIZE = 4 * 1024 * 1024
+BLOCK_SIZE = 64 * 1024
+PROGRESS_INTERVAL = 0.25
+
+
+class RangeDownloader(FileDownloader):
+    """Baixa um arquivo HTTP por várias conexões, cada uma buscando faixas de bytes (Range).
+
+    O arquivo temporário é pré-alocado com o tamanho final e cada faixa é
+    gravada direto na sua posição. As faixas ficam em uma fila: cada
+    conexão pega a próxima livre, então uma conexão lenta não segura as
+    outras. Conexões além da primeira só são abertas quando
+    ``connection_budget`` (o limitador de downloads simultâneos do lote)
+    tem vaga sobrando, e a vaga é devolvida quando a conexão termina; no
+    fim de um lote, os itens grandes ficam com as vagas ociosas.
+
+    As faixas já concluídas são anotadas ao lado do arquivo temporário
+    (``.json``), então um download interrompido continua de onde parou.
+    Servidores sem suporte a Range, arquivos de tamanho desconhecido ou
+    menores que ``chunked_min_size`` são baixados pelo ``HttpFD`` do yt-dlp.
+    """
+
+    FD_NAME = 'chunked'
+
+    def _delegate(self, filename, info_dict):
+        fd = HttpFD(self.ydl, self.params)
+        for hook in self._progress_hooks:
+            fd.add_progress_hook(hook)
+        return fd.real_download(filename, info_dict)
+
+    def _request(self, info_dict, start, end):
+        headers = {**(info_dict.get('http_headers') or {}), 'Accept-Encoding': 'identity', 'Range': f'bytes={start}-{end}'}
+        return self.ydl.urlopen(Request(info_dict['url'], headers=headers))
+
+    def _probe_size(self, info_dict):
+        """Tamanho total informado em Content-Range, ou None se o servidor não aceitar Range."""
+        try:
+            response = self._request(info_dict, 0, 0)
+        except yt_dlp.networking.exceptions.RequestError:
+            return None
+        with response:
+            content_range = response.headers.get('Content-Range') or ''
+            if response.status != 206 or '/' not in content_range:
+                return None
+            total = content_range.rsplit('/', 1)[1]
+            return int(total) if total.isdigit() else None
+
+    def real_download(self, filename, info_dict):
+        min_size = self.params.get('chunked_min_size', get_chunked_min_size())
+        connections = max(1, self.params.get('chunk_connections') or get_chunk_connections())
+        size = info_dict.get('filesize')
+        if size is None or size >= min_size:
+            # A declared size is only a hint; the server has to confirm it and accept ranges.
+            size = self._probe_size(info_dict)
+        if not size or size < min_size or connections < 2:
+            return self._delegate(filename, info_dict)
+
+        tmpfilename = filename + '.chunked.part'
+        state_file = tmpfilename + '.json'
+        pieces = [(start, min(start + PIECE_SIZE, size) - 1) for start in range(0, size, PIECE_SIZE)]
+        done = set()
+        if os.path.isfile(tmpfilename) and os.path.isfile(state_file):
+            try:
+                with open(state_file, encoding='utf-8') as f:
+                    state = json.load(f)
+                if state.get('size') == size and state.get('piece_size') == PIECE_SIZE:
+                    done = set(state['done'])
+            except (OSError, ValueError, KeyError):
+                done = set()
+        if not done:
+            with open(tmpfilename, 'wb') as f:
+                f.truncate(size)
+                if hasattr(os, 'posix_fallocate'):
+                    try:
+                        os.posix_fallocate(f.fileno(), 0, size)
+                    except OSError:
+                        pass  # Filesystems without fallocate keep the sparse file
+
+        todo = queue.Queue()
+        for index in range(len(pieces)):
+            if index not in done:
+                todo.put(index)
+        lock = threading.Condition()
+        progress = {'bytes': sum(pieces[i][1] - pieces[i][0] + 1 for i in done), 'workers': 0, 'error': None}
+        budget = self.params.get('connection_budget')
+        governor = get_governor()
+        retries = self.params.get('retries', 10)
+
+        def fetch(index):
+            start, end = pieces[index]
+            offset = start
+            attempt = 0
+            with open(tmpfilename, 'r+b') as f:
+                while offset <= end:
+                    try:
+                        with self._request(info_dict, offset, end) as response:
+                            if response.status != 206:
+                                raise yt_dlp.utils.DownloadError(f'o servidor ignorou o Range (HTTP {response.status})')
+                            f.seek(offset)
+                            while offset <= end:
+                                block = response.read(min(BLOCK_SIZE, end - offset + 1))
+                                if not block:
+                                    break
+                                f.write(block)
+                                offset += len(block)
+                                with lock:
+                                    progress['bytes'] += len(block)
+                                governor.throttle(len(block))
+                        if offset <= end:
+                            raise yt_dlp.networking.exceptions.TransportError('conexão encerrada antes do fim da faixa')
+                    except (yt_dlp.networking.exceptions.RequestError, OSError) as e:
+                        attempt += 1
+                        if attempt > retries:
+                            raise
+                        self.report_retry(e, attempt, retries)
+                        time.sleep(min(attempt, 5))
+            with lock:
+                done.add(index)
+
+        def worker(extra):
+            try:
+                while progress['error'] is None:
+                    try:
+                        index = todo.get_nowait()
+                    except queue.Empty:
+                        return
+                    fetch(index)
+            except Exception as e:
+                progress['error'] = e
+            finally:
+                if extra:
+                    budget.release()
+                with lock:
+                    progress['workers'] -= 1
+                    lock.notify_all()
+
+        def spawn(extra):
+            with lock:
+                progress['workers'] += 1
+            threading.Thread(target=worker, args=(extra,), name='chunked-download', daemon=True).start()
+
+        started = time.time()
+        initial = progress['bytes']
+        spawn(False)  # The item's own download slot
+        opened = 1
+        while True:
+            with lock:
+                lock.wait(PROGRESS_INTERVAL)
+                finished = progress['workers'] == 0
+                downloaded = progress['bytes']
+                done_now = sorted(done)
+            if not finished and progress['error'] is None and not todo.empty():
+                # Extra connections only use download slots nobody else is waiting for.
+                while (progress['workers'] < connections and todo.qsize() > progress['workers']
+                       and (budget is None or budget.try_acquire())):
+                    spawn(budget is not None)
+                    opened += 1
+            with open(state_file, 'w', encoding='utf-8') as f:
+                json.dump({'size': size, 'piece_size': PIECE_SIZE, 'done': done_now}, f)
+            elapsed = time.time() - started
+            speed = self.calc_speed(started, time.time(), downloaded - initial)
+            self._hook_progress({
+                'status': 'downloading',
+                'downloaded_bytes': downloaded,
+                'total_bytes': size,
+                'filename': filename,
+                'tmpfilename': tmpfilename,
+                'elapsed': elapsed,
+                'speed': speed,
+                'eta': self.calc_eta(speed, size - downloaded),
+                'chunked': True,  # Connections are throttled one by one, see bandwidth.BandwidthGovernor
+            }, info_dict)
+            if finished:
+                break
+
+        if progress['error'] is not None or len(done) != len(pieces):
+            raise progress['error'] or yt_dlp.utils.DownloadError('download em partes incompleto')
+        metrics.inc("chunked_downloads_total")
+        metrics.observe("chunked_connections", opened, buckets=(1, 2, 4, 8, 16, 32))
+        self.try_rename(tmpfilename, filename)
+        os.remove(state_file)
+        if os.path.isfile(self.temp_name(filename)) and self.temp_name(filename) != filename:
+            os.remove(self.temp_name(filename))  # Leftover of an earlier single-connection attempt
+        self._hook_progress({
+            'status': 'finished',
+            'downloaded_bytes': size,
+            'total_bytes': size,
+            'filename': filename,
+            'elapsed': time.time() - started,
+            'chunked': True,
+        }, info_dict)
+        return True
+
+
+class ChunkedYoutubeDL(yt_dlp.YoutubeDL):
+    """YoutubeDL que baixa arquivos HTTP diretos com ``RangeDownloader``.
+
+    DASH/HLS continuam com os downloaders do yt-dlp, que baixam vários
+    fragmentos ao mesmo tempo (``concurrent_fragment_downloads``).
+    """
+
+    def dl(self, name, info, subtitle=False, test=False):
+        protocol = info.get('protocol') or yt_dlp.utils.determine_protocol(info)
+        if test or subtitle or name == '-' or protocol not in ('http', 'https') or info.get('request_data') \
+                or not self.params.get('chunked_min_size', get_chunked_min_size()):
+            return super().dl(name, info, subtitle, test)
+        fd = RangeDownloader(self, self.params)
+        for hook in self._progress_hooks:
+            fd.add_progress_hook(hook)
+        new_info = self._copy_infodict(info)
+        if new_info.get('http_headers') is None:
+            new_info['http_headers'] = self._calc_headers(new_info)
+        return fd.download(name, new_info, subtitle)
@@ -0,0 +1,311 @@
+"""Modo de linha de comando (sem interface gráfica) para buscar e baixar em lote.
+
+Exemplos:
+    python cli.py "Artista 1" "Artista 2" --limit 30 --min-views 100000
+    python cli.py --file artistas.txt --format mp4 --quality 720
+    python cli.py https://www.youtube.com/watch?v=XXXXXXXXXXX
+    python cli.py https://www.youtube.com/@Artista --date-after 2024-01-01
+    python cli.py --enqueue --file artistas.txt   # só enfileira para os workers (worker.py)
+    python cli.py --file artistas.txt --order longest
+
+Cada entrada que começa com http(s):// é baixada diretamente; as demais
+são buscadas como nome de artista. URLs de playlists e canais são
+listadas aos poucos, e cada vídeo começa a ser baixado assim que é
+encontrado. Antes de baixar, os vídeos das buscas e as URLs diretas são
+ordenados conforme ``--order`` (ver ``scheduler``) e a projeção dos
+tempos de término sai como um evento "plan". O progresso é escrito na saída padrão
+como JSON, um evento por linha; mensagens de diagnóstico vão para a saída
+de erro.
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+from utils import load_environment, get_download_dir, get_max_concurrency, get_download_order, get_expected_throughput, is_collection_url, parse_date
+
+load_environment()
+
+from bandwidth import get_governor, parse_rate, parse_schedule
+from dedup import collapse_duplicates
+from downloader import download_many
+from events import ProgressBus
+from jobqueue import DEFAULT_POOL, DOWNLOAD_JOB, JOBS_DB, PLAYLIST_JOB, SEARCH_JOB, JobQueue
+from metrics import configure_from_env, metrics, start_metrics_server
+from playlist import iter_playlist_videos
+from scheduler import POLICIES, describe_plan, plan_downloads
+from youtube_api import iter_search_many, quota
+
+
+class JsonLinesWriter:
+    """Escreve eventos JSON, um por linha, de forma segura entre threads."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        line = json.dumps({"event": event, "time": round(time.time(), 3), **fields}, ensure_ascii=False, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def _pump_events(bus, writer, stop, interval):
+    """Repassa periodicamente os eventos acumulados no barramento para a saída JSON."""
+    while True:
+        stopping = stop.wait(interval)
+        batch = bus.drain()
+        for message in batch["logs"]:
+            writer.emit("log", message=message)
+        for url, fields in batch["progress"].items():
+            writer.emit("progress", url=url, **fields)
+        if batch["counter"]:
+            done, total = batch["counter"]
+            writer.emit("counter", done=done, total=total)
+        if stopping:
+            return
+
+
+VIDEO_FIELDS = ("videoId", "title", "channelTitle", "url", "duration", "views")
+
+
+def _video_fields(video):
+    return {k: v for k, v in video.items() if k in VIDEO_FIELDS}
+
+
+def _playlist_urls(url, args, writer, log_cb):
+    """Gera as URLs dos vídeos de uma playlist/canal, anunciando cada um na saída JSON."""
+    found = 0
+    for video in iter_playlist_videos(url, limit=args.max_items, min_views=args.min_views,
+                                      date_after=args.date_after, date_before=args.date_before,
+                                      start=args.start, log_cb=log_cb):
+        found += 1
+        writer.emit("video", playlist=url, **_video_fields(video))
+        yield video["url"]
+    writer.emit("playlist", url=url, videos=found)
+
+
+def read_inputs(args):
+    """Reúne artistas/URLs dos argumentos e do arquivo (uma entrada por linha, # para comentários)."""
+    entries = list(args.entries)
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            entries.extend(line.strip() for line in f if line.strip() and not line.lstrip().startswith("#"))
+    return entries
+
+
+def _quota_fields():
+    """Unidades da cota da YouTube Data API gastas hoje e o orçamento diário configurado."""
+    return {"spent": quota.spent(), "budget": quota.daily_budget}
+
+
+def enqueue_entries(entries, args, outdir, writer):
+    """Modo coordenador: transforma as entradas em trabalhos da fila compartilhada, sem baixar nada."""
+    jobs = JobQueue(args.jobs_db or JOBS_DB, journal_mode=os.getenv("JOBS_JOURNAL_MODE", "WAL"))
+    quality = args.quality if args.format == "mp4" else None
+    search_options = {"limit": args.limit, "min_views": args.min_views, "dedupe": not args.keep_duplicates}
+    playlist_options = {"max_items": args.max_items, "min_views": args.min_views, "date_after": args.date_after,
+                        "date_before": args.date_before, "start": args.start}
+    groups = {DOWNLOAD_JOB: [], PLAYLIST_JOB: [], SEARCH_JOB: []}
+    for entry in entries:
+        if not entry.startswith(("http://", "https://")):
+            groups[SEARCH_JOB].append(entry)
+        elif args.playlist or is_collection_url(entry):
+            groups[PLAYLIST_JOB].append(entry)
+        else:
+            groups[DOWNLOAD_JOB].append(entry)
+    total = 0
+    for kind, items in groups.items():
+        if not items:
+            continue
+        options = {SEARCH_JOB: search_options, PLAYLIST_JOB: playlist_options}.get(kind)
+        ids = jobs.enqueue(items, args.format, quality, outdir, kind=kind, pool=args.pool, options=options)
+        total += len(ids)
+        writer.emit("enqueued", kind=kind, pool=args.pool, jobs=len(ids))
+    writer.emit("summary", inputs=len(entries), enqueued=total, pool=args.pool, states=jobs.counts(args.pool))
+    jobs.close()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Busca e baixa músicas/vídeos do YouTube sem interface gráfica.")
+    parser.add_argument("entries", nargs="*", help="nomes de artistas ou URLs de vídeos")
+    parser.add_argument("-f", "--file", help="arquivo com um artista ou URL por linha")
+    parser.add_argument("--limit", type=int, default=20, help="resultados por artista (padrão: 20)")
+    parser.add_argument("--min-views", type=int, default=0, help="ignora vídeos com menos views (padrão: 0)")
+    parser.add_argument("--format", choices=("mp3", "audio", "mp4"), default="mp3",
+                        help="formato de saída; audio mantém o codec original (m4a/opus), sem recodificar (padrão: mp3)")
+    parser.add_argument("--quality", choices=("360", "720", "1080"), default="720", help="qualidade do MP4 (padrão: 720)")
+    parser.add_argument("--concurrency", type=int, default=None, help="downloads simultâneos (padrão: MAX_CONCURRENCY)")
+    parser.add_argument("--order", choices=POLICIES, default=None,
+                        help="ordem dos downloads: fifo (ordem das entradas), longest (mais longos primeiro, lote termina antes), "
+                             "shortest (primeiras faixas mais cedo) ou priority (ordem das entradas e, dentro de cada uma, "
+                             "os mais longos primeiro) (padrão: DOWNLOAD_ORDER)")
+    parser.add_argument("--adaptive", action="store_true", default=None, help="ajusta a concorrência automaticamente")
+    parser.add_argument("--limit-rate", default=None, help="banda máxima somando todos os downloads, ex.: 500K, 2M (padrão: BANDWIDTH_LIMIT)")
+    parser.add_argument("--bandwidth-schedule", default=None,
+                        help='limites por horário, ex.: "08:00-18:00=1M;18:00-08:00=0" (padrão: BANDWIDTH_SCHEDULE)')
+    parser.add_argument("--outdir", default=None, help="pasta de saída (padrão: DOWNLOAD_DIR)")
+    parser.add_argument("--no-cache", action="store_true", help="ignora o cache de buscas da API")
+    parser.add_argument("--playlist", action="store_true", help="trata todas as URLs como playlists/canais")
+    parser.add_argument("--max-items", type=int, default=None, help="máximo de entradas lidas por playlist/canal (padrão: todas)")
+    parser.add_argument("--start", type=int, default=1, help="primeira entrada lida de cada playlist/canal (padrão: 1)")
+    parser.add_argument("--date-after", default=None, help="só vídeos de playlists/canais publicados a partir desta data (AAAA-MM-DD)")
+    parser.add_argument("--date-before", default=None, help="só vídeos de playlists/canais publicados até esta data (AAAA-MM-DD)")
+    parser.add_argument("--keep-duplicates", action="store_true",
+                        help="não agrupa a mesma música de canais diferentes (padrão: baixa só a melhor versão)")
+    parser.add_argument("--search-workers", type=int, default=None, help="artistas buscados ao mesmo tempo (padrão: SEARCH_CONCURRENCY)")
+    parser.add_argument("--search-only", action="store_true", help="apenas busca e lista os resultados, sem baixar")
+    parser.add_argument("--enqueue", action="store_true",
+                        help="não baixa: enfileira buscas, playlists e URLs na fila compartilhada para os workers (worker.py)")
+    parser.add_argument("--pool", default=DEFAULT_POOL, help=f"fila de trabalhos usada com --enqueue (padrão: {DEFAULT_POOL})")
+    parser.add_argument("--jobs-db", default=None, help="arquivo da fila compartilhada usado com --enqueue (padrão: JOBS_DB)")
+    parser.add_argument("--progress-interval", type=float, default=1.0, help="segundos entre eventos de progresso (padrão: 1)")
+    parser.add_argument("--metrics-file", default=None, help="grava as métricas (JSON) neste arquivo ao final")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve as métricas no formato do Prometheus nesta porta")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    entries = read_inputs(args)
+    if not entries:
+        parser.error("informe pelo menos um artista ou URL (ou --file)")
+    try:
+        args.date_after, args.date_before = parse_date(args.date_after), parse_date(args.date_before)
+    except ValueError:
+        parser.error("datas devem estar no formato AAAA-MM-DD")
+    args.order = args.order or get_download_order()
+    if args.order not in POLICIES:
+        parser.error(f"DOWNLOAD_ORDER inválido: {args.order!r} (use {', '.join(POLICIES)})")
+    try:
+        throughput = parse_rate(get_expected_throughput()) or 5_000_000
+    except ValueError as e:
+        parser.error(f"EXPECTED_THROUGHPUT: {e}")
+    if args.limit_rate is not None or args.bandwidth_schedule is not None:
+        governor = get_governor()
+        try:
+            rate = parse_rate(args.limit_rate) if args.limit_rate is not None else governor.base_rate
+            schedule = parse_schedule(args.bandwidth_schedule) if args.bandwidth_schedule is not None else governor.schedule
+        except ValueError as e:
+            parser.error(str(e))
+        governor.configure(rate, governor.burst_size, schedule)
+
+    writer = JsonLinesWriter(sys.stdout)
+    configure_from_env(log_cb=lambda message: print(message, file=sys.stderr))
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+    outdir = args.outdir or get_download_dir()
+    concurrency = args.concurrency or get_max_concurrency()
+    started = time.monotonic()
+    if args.enqueue:
+        return enqueue_entries(entries, args, outdir, writer)
+
+    # Library code reports problems with print(); keep stdout for JSON only.
+    with contextlib.redirect_stdout(sys.stderr):
+        bus = ProgressBus()
+        videos_to_download = []
+        priorities = {}  # URL -> priority: earlier entries first
+        playlists = []
+        artists = []
+        for index, entry in enumerate(entries):
+            if entry.startswith(("http://", "https://")):
+                if args.playlist or is_collection_url(entry):
+                    playlists.append(_playlist_urls(entry, args, writer, bus.log))
+                else:
+                    videos_to_download.append({"url": entry})
+                    priorities.setdefault(entry, -index)
+            else:
+                artists.append(entry)
+        # iter_search_many hands the names back stripped; an artist listed twice keeps its first position.
+        entry_index = {}
+        for index, entry in enumerate(entries):
+            entry_index.setdefault(entry.strip(), index)
+        # Artists are searched concurrently; each "search" event is emitted as soon as that artist is done.
+        for artist, videos in iter_search_many(artists, args.limit, args.min_views, use_cache=not args.no_cache,
+                                               workers=args.search_workers):
+            duplicates = 0
+            if not args.keep_duplicates:
+                collapsed = collapse_duplicates(videos, artist)
+                duplicates = len(videos) - len(collapsed)
+                videos = collapsed
+            writer.emit("search", artist=artist, results=len(videos), duplicates=duplicates,
+                        seconds=round(time.monotonic() - started, 3), videos=[_video_fields(video) for video in videos])
+            videos_to_download.extend(videos)
+            for video in videos:
+                priorities.setdefault(video["url"], -entry_index[artist])
+        search_seconds = time.monotonic() - started
+
+        if args.search_only:
+            # Playlists are still listed (one "video" event per entry), just not downloaded.
+            listed = sum(1 for _ in itertools.chain(*playlists))
+            for message in bus.drain()["logs"]:
+                writer.emit("log", message=message)
+            writer.emit("summary", inputs=len(entries), total=len(videos_to_download) + listed,
+                        search_seconds=round(time.monotonic() - started, 3), timings=metrics.summary(), quota=_quota_fields())
+            if args.metrics_file:
+                metrics.write_json(args.metrics_file)
+            return 0
+        if not videos_to_download and not playlists:
+            writer.emit("summary", inputs=len(entries), total=0, search_seconds=round(search_seconds, 3),
+                        timings=metrics.summary(), quota=_quota_fields())
+            if args.metrics_file:
+                metrics.write_json(args.metrics_file)
+            return 0
+
+        if get_governor().rate:
+            throughput = min(throughput, get_governor().rate)
+        ordered, projection = plan_downloads(videos_to_download, concurrency, args.format, args.quality, args.order,
+                                             throughput, priorities)
+        urls = [video["url"] for video in ordered]
+        projected = {item["url"]: item["finish"] for item in projection["items"]}
+        if urls:
+            bus.log(describe_plan(projection, args.order, throughput))
+            writer.emit("plan", policy=args.order, bytes=projection["bytes"], first_seconds=round(projection["first"], 1),
+                        makespan_seconds=round(projection["makespan"], 1),
+                        items=[{"url": item["url"], "bytes": item["bytes"], "finish_seconds": round(item["finish"], 1)}
+                               for item in projection["items"]])
+        # Playlist entries are streamed after the planned items: each one starts downloading as soon as it is listed.
+        source = itertools.chain(urls, *playlists) if playlists else urls
+        stop = threading.Event()
+        pump = threading.Thread(target=_pump_events, args=(bus, writer, stop, args.progress_interval), daemon=True)
+        pump.start()
+        download_started = time.monotonic()
+        try:
+            result = download_many(source, concurrency, args.format, outdir, log_cb=bus.log,
+                                   quality=args.quality, adaptive=args.adaptive, events=bus, projected=projected)
+        finally:
+            stop.set()
+            pump.join()
+
+    download_seconds = time.monotonic() - download_started
+    downloaded = result["submitted"] - result["failed"]
+    writer.emit(
+        "summary",
+        inputs=len(entries),
+        total=result["total"],
+        downloaded=downloaded,
+        skipped=result["skipped"],
+        failed=result["failed"],
+        bytes=result["bytes"],
+        search_seconds=round(search_seconds, 3),
+        download_seconds=round(download_seconds, 3),
+        items_per_second=round(downloaded / download_seconds, 3) if download_seconds else 0.0,
+        mb_per_second=round(result["bytes"] / 1_000_000 / download_seconds, 3) if download_seconds else 0.0,
+        stages=result["stages"],
+        timings=metrics.summary(),
+        quota=_quota_fields(),
+    )
+    if args.metrics_file:
+        metrics.write_json(args.metrics_file)
+    return 1 if result["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
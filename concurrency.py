@@ -0,0 +1,153 @@
+import threading
+import time
+
+
+class ConcurrencyLimiter:
+    """Semáforo cujo limite pode ser alterado enquanto os workers estão rodando."""
+
+    def __init__(self, limit):
+        self._limit = max(1, limit)
+        self._active = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self):
+        return self._limit
+
+    @property
+    def active(self):
+        return self._active
+
+    def acquire(self):
+        with self._cond:
+            self._waiting += 1
+            while self._active >= self._limit:
+                self._cond.wait()
+            self._waiting -= 1
+            self._active += 1
+
+    def try_acquire(self):
+        """Ocupa uma vaga só se houver uma livre que ninguém esteja esperando; não bloqueia."""
+        with self._cond:
+            if self._active >= self._limit or self._waiting:
+                return False
+            self._active += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    def set_limit(self, limit):
+        """Altera o limite; workers acima do novo limite terminam o item atual e aguardam."""
+        with self._cond:
+            self._limit = max(1, limit)
+            self._cond.notify_all()
+
+
+def is_throttle_error(error):
+    """Indica se o erro é um bloqueio/limitação do servidor (HTTP 429 ou 403)."""
+    message = str(error)
+    return "HTTP Error 429" in message or "HTTP Error 403" in message or "Too Many Requests" in message
+
+
+class AdaptiveConcurrency:
+    """Ajusta o número de downloads simultâneos em tempo de execução (AIMD).
+
+    A cada ``interval`` segundos mede a vazão agregada (pelos progress hooks
+    do yt-dlp) e os erros de limitação (HTTP 429/403). Sem limitação e com
+    todos os workers ocupados, soma um worker se a vazão não caiu; com
+    limitação, corta o limite pela metade. Se a vazão cair depois de um
+    aumento, desfaz o aumento.
+    """
+
+    def __init__(self, limiter, min_workers, max_workers, interval=5.0, log_cb=None):
+        self.limiter = limiter
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.interval = interval
+        self.log_cb = log_cb
+        self.decisions = []
+
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._last_seen = {}
+        self._throttled = 0
+        self._last_throughput = None
+        self._last_action = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def on_progress(self, d):
+        """Progress hook do yt-dlp: contabiliza os bytes baixados desde a última chamada."""
+        if d.get('status') not in ('downloading', 'finished'):
+            return
+        key = d.get('tmpfilename') or d.get('filename')
+        downloaded = d.get('downloaded_bytes') or 0
+        with self._lock:
+            previous = self._last_seen.get(key, 0)
+            if downloaded > previous:
+                self._bytes += downloaded - previous
+            if d['status'] == 'finished':
+                self._last_seen.pop(key, None)
+            else:
+                self._last_seen[key] = downloaded
+
+    def on_error(self, error):
+        """Registra a falha de um item; só erros de limitação afetam o controle."""
+        if is_throttle_error(error):
+            with self._lock:
+                self._throttled += 1
+
+    def _log(self, message):
+        self.decisions.append(message)
+        if self.log_cb: self.log_cb(message)
+
+    def _set(self, limit, reason, throughput):
+        current = self.limiter.limit
+        limit = min(self.max_workers, max(self.min_workers, limit))
+        if limit == current:
+            return None
+        self.limiter.set_limit(limit)
+        self._log(f"Concorrência adaptativa: {current} → {limit} ({reason}; vazão {throughput / 1_000_000:.2f} MB/s)")
+        return "up" if limit > current else "down"
+
+    def tick(self, elapsed):
+        """Avalia o último intervalo e ajusta o limite. Retorna a vazão medida (bytes/s)."""
+        with self._lock:
+            transferred, self._bytes = self._bytes, 0
+            throttled, self._throttled = self._throttled, 0
+        throughput = transferred / elapsed if elapsed > 0 else 0.0
+        limit = self.limiter.limit
+
+        if throttled:
+            action = self._set(limit // 2, f"{throttled} erro(s) HTTP 429/403", throughput)
+        elif (self._last_action == "up" and self._last_throughput
+              and throughput < self._last_throughput * 0.8):
+            action = self._set(limit - 1, "a vazão caiu após o aumento", throughput)
+        elif self.limiter.active >= limit and (self._last_throughput is None or throughput >= self._last_throughput * 0.95):
+            action = self._set(limit + 1, "todos os workers ocupados", throughput)
+        else:
+            action = None
+
+        self._last_action = action
+        self._last_throughput = throughput
+        return throughput
+
+    def _loop(self):
+        last = time.monotonic()
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            self.tick(now - last)
+            last = now
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="adaptive-concurrency", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
@@ -0,0 +1,157 @@
+import math
+import re
+import unicodedata
+
+from utils import get_dedup_tolerance
+
+# Words that only describe the upload, not the song: removed before titles are compared.
+# Version markers such as "live", "acoustic", "remix" or "cover" are kept on purpose.
+_NOISE_RE = re.compile(
+    r"\b(?:official|oficial|music|musical|video|videoclipe|clipe|clip|lyrics?|letra|legendad[oa]|traducao|"
+    r"audio|visualizer|hd|hq|4k|1080p|720p|mv|remaster(?:ed)?|vevo|topic|ft|feat|featuring|com|with)\b"
+)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_VIEWS_RE = re.compile(r"\d+")
+
+
+def _fold(text):
+    """Minúsculas e sem acentos."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def title_tokens(title, strip=()):
+    """Palavras do título sem o "ruído" (official video, lyrics...) e sem as palavras de ``strip`` (artista, canal).
+
+    Se não sobrar nada (ex.: o título é só o nome do artista), as palavras
+    de ``strip`` são mantidas.
+    """
+    tokens = _TOKEN_RE.findall(_NOISE_RE.sub(" ", _fold(title)))
+    kept = [token for token in tokens if token not in strip]
+    return frozenset(kept or tokens)
+
+
+def channel_tokens(channel):
+    """Palavras do nome do canal, sem "VEVO", "Topic", "Official"."""
+    return frozenset(_TOKEN_RE.findall(_NOISE_RE.sub(" ", _fold(channel).replace("vevo", " "))))
+
+
+def duration_seconds(duration):
+    """Converte "M:SS", "H:MM:SS" ou segundos em segundos (None se desconhecida)."""
+    if isinstance(duration, (int, float)):
+        return int(duration)
+    parts = str(duration or "").split(":")
+    try:
+        seconds = 0
+        for part in parts:
+            seconds = seconds * 60 + int(float(part))
+        return seconds
+    except ValueError:
+        return None
+
+
+def is_official(video):
+    """Canais que o ranking da busca já prefere (VEVO ou OFFICIAL no nome)."""
+    channel = (video.get("channelTitle") or "").upper()
+    return "VEVO" in channel or "OFFICIAL" in channel
+
+
+def _views(video):
+    views = video.get("views")
+    if isinstance(views, int):
+        return views
+    digits = "".join(_VIEWS_RE.findall(str(views or "")))
+    return int(digits) if digits else 0
+
+
+def _score(video):
+    return (is_official(video), _views(video))
+
+
+class Cluster:
+    """Grupo de vídeos considerados a mesma música; ``best`` é o que será mostrado e baixado."""
+
+    __slots__ = ("tokens", "duration", "best", "duplicates")
+
+    def __init__(self, video, tokens, duration):
+        self.tokens = tokens
+        self.duration = duration
+        self.best = video
+        self.duplicates = []
+
+
+class DuplicateIndex:
+    """Agrupa os resultados de busca que são a mesma música em canais diferentes.
+
+    Dois vídeos caem no mesmo grupo quando os títulos normalizados (sem
+    "official video", "lyrics" etc., sem o nome do artista e do canal) têm
+    similaridade de Jaccard de pelo menos ``threshold`` e as durações
+    diferem em até ``tolerance`` segundos. Para não comparar todos os
+    pares, cada grupo é indexado pelas primeiras palavras do seu título em
+    ordem alfabética (prefix filtering): dois conjuntos com similaridade
+    ``threshold`` sempre têm uma palavra em comum nesses prefixos, então só
+    esses grupos são comparados.
+
+    Em cada grupo fica como principal o vídeo de canal oficial (VEVO/OFFICIAL)
+    com mais visualizações; os demais viram duplicatas dele.
+    """
+
+    def __init__(self, artist=None, tolerance=None, threshold=0.75):
+        self.artist_tokens = title_tokens(artist) if artist else frozenset()
+        self.tolerance = get_dedup_tolerance() if tolerance is None else tolerance
+        self.threshold = threshold
+        self.clusters = []
+        self._by_token = {}
+
+    def _prefix(self, tokens):
+        size = len(tokens) - math.ceil(self.threshold * len(tokens)) + 1
+        return sorted(tokens)[:max(1, size)]
+
+    def _matches(self, cluster, tokens, duration):
+        if cluster.duration is not None and duration is not None and abs(cluster.duration - duration) > self.tolerance:
+            return False
+        union = len(cluster.tokens | tokens)
+        return union == 0 or len(cluster.tokens & tokens) / union >= self.threshold
+
+    def add(self, video, artist=None):
+        """Classifica um vídeo.
+
+        Retorna ``(grupo, anterior)``: ``anterior`` é o vídeo que deixou de
+        ser o principal do grupo porque ``video`` é melhor (senão None).
+        Quando ``grupo.best is video`` e ``anterior`` é None, o vídeo abriu
+        um grupo novo.
+        """
+        strip = (title_tokens(artist) if artist else self.artist_tokens) | channel_tokens(video.get("channelTitle"))
+        tokens = title_tokens(video.get("title"), strip)
+        duration = duration_seconds(video.get("duration"))
+        prefix = self._prefix(tokens)
+        seen = set()
+        for token in prefix:
+            for cluster in self._by_token.get(token, ()):
+                if id(cluster) in seen:
+                    continue
+                seen.add(id(cluster))
+                if self._matches(cluster, tokens, duration):
+                    if _score(video) > _score(cluster.best):
+                        previous, cluster.best = cluster.best, video
+                        cluster.duplicates.append(previous)
+                        return cluster, previous
+                    cluster.duplicates.append(video)
+                    return cluster, None
+        cluster = Cluster(video, tokens, duration)
+        self.clusters.append(cluster)
+        for token in prefix:
+            self._by_token.setdefault(token, []).append(cluster)
+        return cluster, None
+
+
+def collapse_duplicates(videos, artist=None, tolerance=None):
+    """Retorna só o vídeo principal de cada grupo, na ordem dos grupos, com as duplicatas em ``"duplicates"``."""
+    index = DuplicateIndex(artist, tolerance)
+    for video in videos:
+        index.add(video)
+    collapsed = []
+    for cluster in index.clusters:
+        cluster.best["duplicates"] = cluster.duplicates
+        collapsed.append(cluster.best)
+    return collapsed
@@ -1,111 +1,269 @@
 import yt_dlp
-import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
 import time
-import json
 
-from utils import get_download_dir
-
-HISTORY_FILE = os.path.join(get_download_dir(), "history.json")
+from archive import DownloadArchive, format_key
+from bandwidth import get_governor
+from chunked import ChunkedYoutubeDL
+from history import get_history_store
+from infocache import get_info_cache
+from jobqueue import DONE, get_job_queue, process_owner
+from metrics import metrics
+from pipeline import DownloadPipeline, audio_codec
+from sessions import profile_options
+from utils import extract_video_id, get_transcode_workers, get_adaptive_concurrency, get_concurrency_bounds
 
 def save_history(video_info):
-    """Salva as informações do vídeo baixado no histórico."""
-    history = []
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            try:
-                history = json.load(f)
-            except json.JSONDecodeError:
-                history = []
-    history.append(video_info)
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(history, f, indent=4, ensure_ascii=False)
-
-def download_audio(url, outdir, log_cb=None, progress_hook=None):
-    """Baixa o áudio de um vídeo do YouTube."""
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
-        'outtmpl': os.path.join(outdir, '%(title)s.%(ext)s'),
-        'noplaylist': True,
-        'logtostderr': False,
-        'quiet': True,
-        'no_warnings': True,
-        'progress_hooks': [progress_hook] if progress_hook else [],
-    }
+    """Registra as informações do vídeo baixado no histórico."""
+    with metrics.span("save_history", video_info.get("url")):
+        get_history_store().add(video_info)
+
+def _final_filepath(info):
+    """Retorna o caminho final do arquivo baixado, após o pós-processamento."""
+    downloads = info.get("requested_downloads") or []
+    if downloads and downloads[-1].get("filepath"):
+        return downloads[-1]["filepath"]
+    return info.get("filepath")
+
+def _extract(url, format, outdir, quality, progress_hook, sessions):
+    """Baixa um item com o YoutubeDL da sessão da thread, ou com uma instância avulsa.
+
+    Metadados já extraídos do vídeo (ver ``infocache``) são reaproveitados.
+    """
+    governor = get_governor()
+
+    def hook(d):
+        if progress_hook: progress_hook(d)
+        governor.on_progress(d)
+
+    if sessions is not None:
+        sessions.set_progress_hook(hook)
+        return get_info_cache().download(sessions.get(format, outdir, quality), url)
+    ydl_opts = profile_options(format, outdir, quality)
+    ydl_opts['progress_hooks'] = [hook]
+    with ChunkedYoutubeDL(ydl_opts) as ydl:
+        return get_info_cache().download(ydl, url)
+
+def download_audio(url, outdir, log_cb=None, progress_hook=None, sessions=None, native=False):
+    """Baixa o áudio de um vídeo do YouTube em MP3, ou no codec original com ``native=True``."""
+    format = 'audio' if native else 'mp3'
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            save_history({
-                "title": info.get("title", "N/A"),
-                "url": url,
-                "format": "mp3",
-                "download_date": time.strftime("%Y-%m-%d %H:%M:%S")
-            })
+        info = _extract(url, format, outdir, None, progress_hook, sessions)
+        save_history({
+            "videoId": info.get("id"),
+            "title": info.get("title", "N/A"),
+            "url": url,
+            "format": format_key(format),
+            "codec": audio_codec(info) if native else "mp3",
+            "filepath": _final_filepath(info),
+            "download_date": time.strftime("%Y-%m-%d %H:%M:%S")
+        })
         if log_cb: log_cb(f"Download de áudio concluído: {info.get('title', url)}")
     except yt_dlp.utils.DownloadError as e:
         if log_cb: log_cb(f"Erro de download de áudio de {url}: {e}")
     except Exception as e:
         if log_cb: log_cb(f"Erro inesperado ao baixar áudio de {url}: {e}")
 
-def download_video(url, outdir, quality, log_cb=None, progress_hook=None):
+def download_video(url, outdir, quality, log_cb=None, progress_hook=None, sessions=None):
     """Baixa o vídeo de um vídeo do YouTube com a qualidade especificada."""
-    format_string = f"bestvideo[height<={quality}]+bestaudio/best[height<={quality}]" if quality else "bestvideo+bestaudio/best"
-    ydl_opts = {
-        'format': format_string,
-        'outtmpl': os.path.join(outdir, '%(title)s.%(ext)s'),
-        'noplaylist': True,
-        'logtostderr': False,
-        'quiet': True,
-        'no_warnings': True,
-        'merge_output_format': 'mp4',
-        'progress_hooks': [progress_hook] if progress_hook else [],
-    }
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            save_history({
-                "title": info.get("title", "N/A"),
-                "url": url,
-                "format": f"mp4 ({quality}p)",
-                "download_date": time.strftime("%Y-%m-%d %H:%M:%S")
-            })
+        info = _extract(url, 'mp4', outdir, quality, progress_hook, sessions)
+        save_history({
+            "videoId": info.get("id"),
+            "title": info.get("title", "N/A"),
+            "url": url,
+            "format": format_key("mp4", quality),
+            "codec": audio_codec(info),
+            "filepath": _final_filepath(info),
+            "download_date": time.strftime("%Y-%m-%d %H:%M:%S")
+        })
         if log_cb: log_cb(f"Download de vídeo concluído: {info.get('title', url)}")
     except yt_dlp.utils.DownloadError as e:
         if log_cb: log_cb(f"Erro de download de vídeo de {url}: {e}")
     except Exception as e:
         if log_cb: log_cb(f"Erro inesperado ao baixar vídeo de {url}: {e}")
 
-def download_many(urls, concurrency, format, outdir, progress_cb=None, log_cb=None, quality=None):
-    """Gerencia o download de múltiplos vídeos/áudios em paralelo."""
-    download_func = download_audio if format == 'mp3' else (lambda u, o, l, ph: download_video(u, o, quality, l, ph))
-    
-    total_downloads = len(urls)
+def download_many(urls, concurrency, format, outdir, progress_cb=None, log_cb=None, quality=None, skip_existing=True,
+                  cpu_workers=None, adaptive=None, min_concurrency=None, max_concurrency=None, job_queue=None,
+                  events=None, projected=None):
+    """Gerencia o download de múltiplos vídeos/áudios em paralelo.
+
+    Itens já presentes no arquivo de downloads (mesmo vídeo e formato) são
+    ignorados antes de ocupar um worker. Os demais passam pelo pipeline de
+    duas etapas: ``concurrency`` downloads simultâneos na rede e
+    ``cpu_workers`` conversões simultâneas com o ffmpeg. Retorna um resumo
+    com os totais e as estatísticas de cada etapa.
+
+    Com ``adaptive=True`` (padrão: ``ADAPTIVE_CONCURRENCY``), ``concurrency`` é
+    apenas o valor inicial: o limite é ajustado em tempo de execução entre
+    ``min_concurrency`` e ``max_concurrency`` (padrão: ``MIN_CONCURRENCY`` e
+    ``MAX_ADAPTIVE_CONCURRENCY``) conforme a vazão e os erros HTTP 429/403.
+
+    Cada URL é registrada na fila persistente (``jobqueue``); falhas são
+    tentadas de novo com espera exponencial até ``MAX_ATTEMPTS`` tentativas.
+
+    Se ``events`` (um ``ProgressBus``) for informado, o progresso de cada
+    item é publicado nele, identificado pela URL, em vez de ir para o log.
+    ``projected`` (URL -> segundos até o término previsto, ver
+    ``scheduler.project``) acompanha o estado "na fila" de cada item.
+
+    ``urls`` pode ser um gerador (ex.: ``playlist.iter_playlist_videos``):
+    cada URL é filtrada, registrada na fila e enviada ao pipeline assim que
+    é produzida, então os downloads começam antes de a listagem terminar.
+    """
+    key = format_key(format, quality)
+
+    pending = []
+    skipped = 0
+    seen = set()
+    admitted = set()
+    archive = DownloadArchive(outdir) if skip_existing else None
+    total_downloads = 0
     completed_downloads = 0
+    failed_downloads = 0
+    counter_lock = threading.Lock()
+    jobs = job_queue or get_job_queue()
+    job_ids = {}
+    retry = []
+
+    def _admit(url_iter, enqueue=True):
+        """Filtra os itens já baixados ou repetidos e enfileira os demais, um a um."""
+        nonlocal total_downloads, completed_downloads, skipped
+        for url in url_iter:
+            video_id = extract_video_id(url)
+            dedup_key = video_id or url
+            with counter_lock:
+                total_downloads += 1
+                duplicate = dedup_key in seen or (archive and archive.contains(video_id, key))
+                if duplicate:
+                    skipped += 1
+                    completed_downloads += 1
+                else:
+                    seen.add(dedup_key)
+                current, total = completed_downloads, total_downloads
+            if duplicate:
+                metrics.inc("skipped_total", format=key)
+                if url not in admitted:
+                    # A job left from an earlier run (resume) would otherwise stay queued forever.
+                    jobs.settle([url], format, quality, outdir)
+                if events: events.progress(url, status="skipped")
+            else:
+                admitted.add(url)
+                if enqueue: job_ids.update(jobs.enqueue([url], format, quality, outdir))
+                pending.append(url)
+                if events: events.progress(url, status="queued", eta=projected.get(url) if projected else None)
+            if events: events.counter(current, total)
+            if progress_cb: progress_cb(current, total)
+            if not duplicate:
+                yield url
 
-    def _progress_hook(d):
-        nonlocal completed_downloads
-        if d['status'] == 'finished':
+    def _item_done(url, ok, error=None):
+        nonlocal completed_downloads, failed_downloads
+        if ok:
+            jobs.mark(job_ids[url], DONE)
+        elif jobs.fail(job_ids[url], error):
+            metrics.inc("retries_total", format=key)
+            retry.append(url)
+            return
+        with counter_lock:
             completed_downloads += 1
-            if progress_cb: progress_cb(completed_downloads, total_downloads)
-        if d['status'] == 'downloading':
-            if log_cb and '_eta_str' in d:
-                log_cb(f"Progresso: {d['_percent_str']} de {d['total_bytes_str']} ETA: {d['_eta_str']}")
-
-    with ThreadPoolExecutor(max_workers=concurrency) as executor:
-        futures = []
-        for url in urls:
-            futures.append(executor.submit(download_func, url, outdir, log_cb, _progress_hook))
-        
-        for future in as_completed(futures):
-            try:
-                future.result() # Wait for each download to complete
-            except Exception as e:
-                if log_cb: log_cb(f"Erro durante o processamento de um download: {e}")
+            if not ok:
+                failed_downloads += 1
+            current, total = completed_downloads, total_downloads
+        if events:
+            events.progress(url, status="done" if ok else "failed")
+            events.counter(current, total)
+        if progress_cb: progress_cb(current, total)
+
+    def _state(url, state):
+        jobs.mark(job_ids[url], state)
+        if events: events.progress(url, status=state)
+
+    def _progress_hook(url, d):
+        if d['status'] != 'downloading':
+            return
+        if events:
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            events.progress(
+                url,
+                status="downloading",
+                percent=d['downloaded_bytes'] * 100 / total if total else None,
+                speed=d.get('speed'),
+                eta=d.get('eta'),
+            )
+        elif log_cb and '_eta_str' in d:
+            log_cb(f"Progresso: {d['_percent_str']} de {d.get('total_bytes_str', '?')} ETA: {d['_eta_str']}")
+
+    if adaptive is None:
+        adaptive = get_adaptive_concurrency()
+    default_min, default_max = get_concurrency_bounds()
+    passes = []
+    waiting = [] # Failed URLs whose exponential backoff has not run out yet
+    if isinstance(urls, (list, tuple)):
+        # A list is admitted and enqueued up front, in a single transaction.
+        batch = list(_admit(urls, enqueue=False))
+        job_ids.update(jobs.enqueue(batch, format, quality, outdir))
+    else:
+        # A generator is admitted lazily, as the pipeline consumes it.
+        batch = _admit(urls)
+    while batch:
+        retry = []
+        pipeline = DownloadPipeline(
+            format, outdir, quality,
+            io_workers=concurrency,
+            cpu_workers=cpu_workers or get_transcode_workers(),
+            adaptive=adaptive,
+            min_workers=min_concurrency or default_min,
+            max_workers=max_concurrency or default_max,
+            log_cb=log_cb,
+            item_cb=_item_done,
+            progress_hook=_progress_hook,
+            state_cb=_state,
+        )
+        passes.append(pipeline.run(batch))
+        if len(passes) == 1 and skipped:
+            if log_cb: log_cb(f"{skipped} item(ns) já baixado(s) em {key} foram ignorados.")
+        waiting.extend(retry)
+        batch = []
+        while waiting and not batch:
+            # Failed jobs come back with an exponential backoff: wait for the earliest one and retry only those due.
+            next_attempts = {url: jobs.get(job_ids[url])["next_attempt"] for url in waiting}
+            wait = max(0.0, min(next_attempts.values()) - time.time())
+            if log_cb: log_cb(f"{len(waiting)} download(s) falharam e serão tentados novamente; o próximo em {wait:.0f}s.")
+            time.sleep(wait)
+            now = time.time()
+            batch = [url for url in waiting if next_attempts[url] <= now]
+            waiting = [url for url in waiting if next_attempts[url] > now]
+
     if log_cb: log_cb("Todos os downloads foram processados.")
+    return {
+        "total": total_downloads,
+        "skipped": skipped,
+        "submitted": len(pending),
+        "failed": failed_downloads,
+        "bytes": sum(stats["io"]["bytes"] for stats in passes),
+        "stages": passes[0] if passes else {},
+        "retry_passes": passes[1:],
+    }
+
+def pending_jobs(job_queue=None):
+    """Retorna os trabalhos de download que ficaram pendentes de uma execução anterior (já encerrada)."""
+    return (job_queue or get_job_queue()).abandoned()
 
+def resume_pending(concurrency, progress_cb=None, log_cb=None, job_queue=None, events=None):
+    """Retoma os downloads interrompidos de execuções anteriores.
 
+    Os trabalhos são agrupados por formato, qualidade e pasta de saída. Os
+    arquivos .part deixados pelo yt-dlp são continuados de onde pararam.
+    """
+    jobs = job_queue or get_job_queue()
+    jobs.reset_interrupted()
+    groups = {}
+    # Only jobs this process owns (just taken over from finished runs): other live processes keep theirs.
+    for job in jobs.unfinished(owner=process_owner()):
+        groups.setdefault((job["format"], job["quality"], job["outdir"]), []).append(job["url"])
+    results = []
+    for (format, quality, outdir), urls in groups.items():
+        if log_cb: log_cb(f"Retomando {len(urls)} download(s) pendente(s) em {format_key(format, quality)}...")
+        results.append(download_many(urls, concurrency, format, outdir, progress_cb, log_cb, quality, job_queue=jobs, events=events))
+    return results
@@ -0,0 +1,87 @@
+import threading
+from collections import deque
+
+from utils import format_duration
+
+
+class ProgressBus:
+    """Barramento de eventos entre os workers de download e a interface.
+
+    Os workers publicam sem bloquear (apenas um lock curto); eventos de
+    progresso do mesmo download são combinados, de modo que só o estado
+    mais recente de cada item chega à interface. As mensagens de log ficam
+    em um buffer circular limitado. A interface chama ``drain`` em
+    intervalos fixos para aplicar tudo de uma vez.
+    """
+
+    def __init__(self, max_log_lines=500):
+        self._lock = threading.Lock()
+        self._progress = {}
+        self._logs = deque(maxlen=max_log_lines)
+        self._dropped_logs = 0
+        self._counter = None
+
+    def log(self, message):
+        """Publica uma mensagem de log."""
+        with self._lock:
+            if len(self._logs) == self._logs.maxlen:
+                self._dropped_logs += 1
+            self._logs.append(message)
+
+    def progress(self, download_id, **fields):
+        """Publica o progresso de um download; campos repetidos substituem os anteriores.
+
+        Uma mudança de ``status`` descarta os campos do estado anterior.
+        """
+        with self._lock:
+            current = self._progress.get(download_id)
+            if current is None or ("status" in fields and fields["status"] != current.get("status")):
+                self._progress[download_id] = dict(fields)
+            else:
+                current.update(fields)
+
+    def counter(self, done, total):
+        """Publica o total de itens concluídos do lote."""
+        with self._lock:
+            self._counter = (done, total)
+
+    def drain(self):
+        """Retorna e limpa tudo o que foi publicado desde a última chamada."""
+        with self._lock:
+            batch = {
+                "progress": self._progress,
+                "logs": list(self._logs),
+                "dropped_logs": self._dropped_logs,
+                "counter": self._counter,
+            }
+            self._progress = {}
+            self._logs.clear()
+            self._dropped_logs = 0
+            self._counter = None
+        return batch
+
+
+def format_progress(fields):
+    """Texto curto de progresso de um item para exibição."""
+    status = fields.get("status")
+    if status == "done":
+        return "✔"
+    if status == "failed":
+        return "erro"
+    if status == "skipped":
+        return "já baixado"
+    if status == "transcoding":
+        return "convertendo"
+    if status == "queued":
+        eta = fields.get("eta")
+        return f"na fila (~{format_duration(eta)})" if eta is not None else "na fila"
+    if status == "downloading":
+        percent = fields.get("percent")
+        if percent is None:
+            return "baixando"
+        text = f"{percent:.0f}%"
+        speed = fields.get("speed")
+        if speed:
+            text += f" {speed / 1_000_000:.1f} MB/s"
+        return text
+    return ""
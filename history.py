@@ -0,0 +1,231 @@
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+
+from utils import get_download_dir, extract_video_id
+
+HISTORY_DB = os.path.join(get_download_dir(), "history.db")
+LEGACY_HISTORY_FILE = os.path.join(get_download_dir(), "history.json")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_id TEXT,
+    url TEXT,
+    title TEXT,
+    format TEXT,
+    download_date TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_video_id ON history (video_id, format);
+CREATE INDEX IF NOT EXISTS idx_history_url ON history (url);
+CREATE INDEX IF NOT EXISTS idx_history_date ON history (download_date);
+CREATE INDEX IF NOT EXISTS idx_history_format ON history (format);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_BASE_FIELDS = ("videoId", "url", "title", "format", "download_date")
+
+
+def _to_row(video_info):
+    """Converte um registro de histórico em uma linha da tabela."""
+    video_id = video_info.get("videoId") or extract_video_id(video_info.get("url"))
+    extra = {k: v for k, v in video_info.items() if k not in _BASE_FIELDS}
+    return (
+        video_id,
+        video_info.get("url"),
+        video_info.get("title"),
+        video_info.get("format"),
+        video_info.get("download_date"),
+        json.dumps(extra, ensure_ascii=False) if extra else None,
+    )
+
+
+def _from_row(row):
+    """Converte uma linha da tabela de volta para o formato de dicionário do histórico."""
+    entry = {
+        "videoId": row["video_id"],
+        "url": row["url"],
+        "title": row["title"],
+        "format": row["format"],
+        "download_date": row["download_date"],
+    }
+    if row["extra"]:
+        entry.update(json.loads(row["extra"]))
+    return entry
+
+
+class HistoryStore:
+    """Histórico de downloads em SQLite, gravado em lotes por uma única thread."""
+
+    def __init__(self, db_path=HISTORY_DB, legacy_path=LEGACY_HISTORY_FILE, batch_size=200, flush_interval=0.5):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._read_lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._migrate_legacy(legacy_path)
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._writer_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _migrate_legacy(self, legacy_path):
+        """Importa um history.json antigo na primeira execução."""
+        if not legacy_path or not os.path.exists(legacy_path):
+            return
+        done = self._conn.execute("SELECT value FROM meta WHERE key = 'legacy_migrated'").fetchone()
+        if done:
+            return
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Não foi possível migrar o histórico antigo ({legacy_path}): {e}")
+            return
+        rows = [_to_row(entry) for entry in legacy if isinstance(entry, dict)]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO history (video_id, url, title, format, download_date, extra) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_migrated', ?)", (legacy_path,))
+        try:
+            os.replace(legacy_path, legacy_path + ".migrated")
+        except OSError:
+            pass
+        print(f"Histórico antigo migrado: {len(rows)} entradas importadas de {legacy_path}.")
+
+    def _writer_loop(self):
+        """Consome a fila de escrita e grava os registros em lotes."""
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = []
+            waiters = []
+            stop = False
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    with self._read_lock, self._conn:
+                        self._conn.executemany(
+                            "INSERT INTO history (video_id, url, title, format, download_date, extra) VALUES (?, ?, ?, ?, ?, ?)",
+                            batch,
+                        )
+                except sqlite3.Error as e:
+                    print(f"Erro ao gravar o histórico: {e}")
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def add(self, video_info):
+        """Enfileira um registro de download; não bloqueia a thread chamadora."""
+        if self._closed:
+            raise RuntimeError("O histórico já foi fechado.")
+        self._queue.put(_to_row(video_info))
+
+    def flush(self, timeout=None):
+        """Aguarda até que todos os registros enfileirados tenham sido gravados."""
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """Grava os registros pendentes e encerra a thread de escrita."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        self._conn.close()
+
+    def _query(self, sql, params=()):
+        self.flush()
+        with self._read_lock:
+            return [_from_row(row) for row in self._conn.execute(sql, params)]
+
+    def find_by_video_id(self, video_id, format=None):
+        """Retorna os downloads de um vídeo, opcionalmente restritos a um formato."""
+        if format is None:
+            return self._query("SELECT * FROM history WHERE video_id = ? ORDER BY id", (video_id,))
+        return self._query("SELECT * FROM history WHERE video_id = ? AND format = ? ORDER BY id", (video_id, format))
+
+    def find_by_url(self, url):
+        """Retorna os downloads feitos a partir de uma URL."""
+        return self._query("SELECT * FROM history WHERE url = ? ORDER BY id", (url,))
+
+    def find_by_date(self, start, end=None):
+        """Retorna os downloads entre duas datas ("AAAA-MM-DD" ou "AAAA-MM-DD HH:MM:SS")."""
+        if end is None:
+            return self._query("SELECT * FROM history WHERE download_date >= ? ORDER BY download_date", (start,))
+        # Dates are stored as sortable strings; pad a bare end date so the whole day matches.
+        if len(end) == 10:
+            end += " 23:59:59"
+        return self._query(
+            "SELECT * FROM history WHERE download_date BETWEEN ? AND ? ORDER BY download_date", (start, end)
+        )
+
+    def find_by_format(self, format):
+        """Retorna os downloads feitos em um formato (ex.: "mp3", "mp4 (720p)")."""
+        return self._query("SELECT * FROM history WHERE format = ? ORDER BY id", (format,))
+
+    def iter_index(self):
+        """Retorna (videoId, formato, título, caminho do arquivo) de todas as entradas."""
+        self.flush()
+        with self._read_lock:
+            rows = self._conn.execute("SELECT video_id, format, title, extra FROM history").fetchall()
+        for row in rows:
+            filepath = json.loads(row["extra"]).get("filepath") if row["extra"] else None
+            yield row["video_id"], row["format"], row["title"], filepath
+
+    def count(self):
+        """Retorna o número total de registros no histórico."""
+        self.flush()
+        with self._read_lock:
+            return self._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_history_store():
+    """Retorna a instância compartilhada do histórico, criando-a no primeiro uso."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore()
+            atexit.register(_store.close)
+        return _store
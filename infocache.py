@@ -0,0 +1,152 @@
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import yt_dlp
+
+from metrics import metrics
+from utils import extract_video_id, get_info_cache_ttl
+
+# Signed media URLs carry their expiry as "expire=<unix time>" (query) or "/expire/<unix time>/" (manifests).
+_EXPIRE_RE = re.compile(r"[?&/]expire[=/](\d{9,11})")
+
+# A cached info dict is dropped this long before its URLs expire, so a download never starts on a dying URL.
+EXPIRY_MARGIN = 600
+
+
+def info_key(url):
+    """Chave do cache: o ID do vídeo do YouTube, ou a própria URL para outros sites."""
+    return extract_video_id(url) or url
+
+
+def url_expiry(info):
+    """Menor validade (segundos desde a época) entre as URLs de mídia do info dict, ou None se não houver."""
+    urls = [info.get("url"), info.get("manifest_url")]
+    for f in info.get("formats") or ():
+        urls.extend((f.get("url"), f.get("manifest_url"), f.get("fragment_base_url")))
+    expiries = [int(match.group(1)) for url in urls if url for match in [_EXPIRE_RE.search(url)] if match]
+    return min(expiries) if expiries else None
+
+
+class InfoCache:
+    """Cache em memória dos info dicts extraídos pelo yt-dlp, por ID de vídeo.
+
+    A extração (página do vídeo, player JS, assinaturas) é feita com
+    ``process=False`` e guardada com a hora da extração e a validade das
+    URLs assinadas dos formatos (parâmetro ``expire``); o download só faz a
+    seleção de formato e a transferência com ``process_ie_result``. Uma
+    entrada vale até ``ttl`` segundos ou até ``EXPIRY_MARGIN`` antes da
+    validade das URLs, o que vier primeiro. Extrações simultâneas do mesmo
+    vídeo (prefetch e download) são feitas uma vez só.
+    """
+
+    def __init__(self, ttl=None, max_entries=64):
+        self.ttl = get_info_cache_ttl() if ttl is None else ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _valid(self, entry, now):
+        return entry is not None and entry["expires"] > now
+
+    def put(self, key, info):
+        """Guarda um info dict recém-extraído; resultados de playlist e URLs já vencidas não são guardados."""
+        if not self.ttl or info.get("_type", "video") != "video":
+            return
+        now = time.time()
+        expires = now + self.ttl
+        signed = url_expiry(info)
+        if signed is not None:
+            expires = min(expires, signed - EXPIRY_MARGIN)
+        if expires <= now:
+            return
+        with self._lock:
+            self._entries[key] = {"info": info, "extracted": now, "expires": expires}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def extract(self, ydl, url):
+        """Retorna o info dict não processado de ``url``, do cache ou extraído agora com ``ydl``.
+
+        Retorna ``(info, veio_do_cache)``. Se outra thread já está extraindo o
+        mesmo vídeo, espera por ela em vez de extrair de novo.
+        """
+        key = info_key(url)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if self._valid(entry, time.time()):
+                    self._entries.move_to_end(key)
+                    metrics.inc("info_cache_total", result="hit")
+                    return entry["info"], True
+                waiter = self._pending.get(key)
+                if waiter is None:
+                    waiter = self._pending[key] = threading.Event()
+                    break
+            waiter.wait()
+            with self._lock:
+                if not self._valid(self._entries.get(key), time.time()):
+                    # The other extraction failed or was not cacheable; extract here (and report its error).
+                    waiter = self._pending[key] = threading.Event()
+                    break
+        metrics.inc("info_cache_total", result="miss" if entry is None else "expired")
+        try:
+            info = ydl.extract_info(url, download=False, process=False)
+            if info is not None:
+                self.put(key, info)
+            return info, False
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            waiter.set()
+
+    def prefetch(self, ydl, url):
+        """Extrai ``url`` antecipadamente para o cache; erros ficam para o download relatar."""
+        try:
+            self.extract(ydl, url)
+        except Exception:
+            pass
+
+    def download(self, ydl, url):
+        """Baixa ``url`` a partir do info dict em cache (``process_ie_result``), extraindo-o se preciso.
+
+        Se o download a partir do cache falhar (ex.: URL assinada recusada),
+        a entrada é descartada e o item é extraído e baixado de novo.
+        """
+        if not self.ttl:
+            return ydl.extract_info(url, download=True)
+        info, cached = self.extract(ydl, url)
+        if info is None:
+            return ydl.extract_info(url, download=True)
+        try:
+            # process_ie_result fills the dict in (formats chosen, file paths); keep the cached copy pristine.
+            return ydl.process_ie_result(copy.deepcopy(info), download=True)
+        except (yt_dlp.utils.DownloadError, yt_dlp.utils.ExtractorError) as e:
+            self.discard(info_key(url))
+            if cached:
+                metrics.inc("info_cache_total", result="stale")
+                return ydl.extract_info(url, download=True)
+            if isinstance(e, yt_dlp.utils.ExtractorError):
+                raise yt_dlp.utils.DownloadError(str(e)) from e
+            raise
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_info_cache():
+    """Retorna o cache de info dicts do processo, criando-o no primeiro uso."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = InfoCache()
+        return _cache
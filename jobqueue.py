@@ -0,0 +1,370 @@
+import atexit
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from utils import get_download_dir
+
+JOBS_DB = os.getenv("JOBS_DB") or os.path.join(get_download_dir(), "jobs.db")
+
+QUEUED = "queued"
+DOWNLOADING = "downloading"
+TRANSCODING = "transcoding"
+DONE = "done"
+FAILED = "failed"
+
+UNFINISHED_STATES = (QUEUED, DOWNLOADING, TRANSCODING)
+
+# Job kinds. Search and playlist jobs (worker mode) expand into download jobs.
+DOWNLOAD_JOB = "download"
+SEARCH_JOB = "search"
+PLAYLIST_JOB = "playlist"
+
+DEFAULT_POOL = "default"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    format TEXT NOT NULL,
+    quality TEXT,
+    outdir TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+# Columns added for worker mode; older databases get them with ALTER TABLE.
+_WORKER_COLUMNS = {
+    "kind": f"TEXT NOT NULL DEFAULT '{DOWNLOAD_JOB}'",
+    "pool": "TEXT",
+    "options": "TEXT",
+    "lease_owner": "TEXT",
+    "lease_expires": "REAL",
+    "result": "TEXT",
+}
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state);
+CREATE INDEX IF NOT EXISTS idx_jobs_url ON jobs (url, format, quality, outdir);
+CREATE INDEX IF NOT EXISTS idx_jobs_pool ON jobs (pool, state, next_attempt);
+"""
+
+
+def process_owner():
+    """Identifica o processo atual como dono de trabalhos locais: "máquina:pid"."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pid_alive(pid):
+    if os.name == "nt":
+        import ctypes
+        # os.kill would terminate the process on Windows; ask for its exit code instead.
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        ctypes.windll.kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def owner_alive(owner):
+    """Indica se o dono de um trabalho local ainda está rodando.
+
+    Sem dono (bancos antigos) conta como morto; donos de outra máquina
+    contam como vivos, porque não há como verificá-los daqui.
+    """
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    return int(pid) == os.getpid() or _pid_alive(int(pid))
+
+
+class JobQueue:
+    """Fila persistente de downloads em SQLite.
+
+    Cada URL vira um trabalho com estado (queued, downloading, transcoding,
+    done, failed), número de tentativas e último erro. Toda mudança de
+    estado é gravada em uma transação, então um lote interrompido pode ser
+    retomado na próxima execução.
+
+    Trabalhos enfileirados com ``pool`` são do modo worker (ver ``worker.py``):
+    vários processos, inclusive em outras máquinas, os reservam com
+    ``lease`` por ``visibility`` segundos e renovam a reserva com
+    ``heartbeat``. Se um worker morre, a reserva expira e o trabalho volta a
+    ficar disponível. Os trabalhos sem ``pool`` são os dos lotes locais:
+    eles guardam o processo que os enfileirou (``lease_owner``), e só os de
+    processos que já terminaram são retomados, então o aplicativo e a CLI
+    podem usar o mesmo arquivo ao mesmo tempo.
+    Em pastas de rede (NFS/SMB) use ``journal_mode="DELETE"``: o modo WAL
+    só funciona entre processos da mesma máquina.
+    """
+
+    def __init__(self, db_path=JOBS_DB, max_attempts=3, backoff_base=5.0, backoff_max=600.0, journal_mode="WAL"):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        # Several processes share the file in worker mode: wait for their write locks instead of failing.
+        self._conn = sqlite3.connect(db_path, timeout=30.0, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for name, definition in _WORKER_COLUMNS.items():
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+        self._conn.executescript(_INDEXES)
+        self._conn.commit()
+
+    def enqueue(self, urls, format, quality, outdir, kind=DOWNLOAD_JOB, pool=None, options=None):
+        """Enfileira as URLs e retorna {url: id}. URLs com trabalho pendente reaproveitam o existente.
+
+        Em trabalhos de busca (``kind=SEARCH_JOB``), ``urls`` são nomes de
+        artistas; ``options`` guarda os parâmetros da busca ou da listagem.
+        """
+        quality = quality if format not in ('mp3', 'audio') else None
+        options = json.dumps(options) if options else None
+        now = time.time()
+        ids = {}
+        with self._lock, self._conn:
+            for url in urls:
+                row = self._conn.execute(
+                    f"SELECT id FROM jobs WHERE url = ? AND format = ? AND quality IS ? AND outdir = ? "
+                    f"AND kind = ? AND pool IS ? AND state IN ({','.join('?' * len(UNFINISHED_STATES))})",
+                    (url, format, quality, outdir, kind, pool, *UNFINISHED_STATES),
+                ).fetchone()
+                if row:
+                    ids[url] = row["id"]
+                    continue
+                cursor = self._conn.execute(
+                    "INSERT INTO jobs (url, format, quality, outdir, state, kind, pool, options, lease_owner, created, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (url, format, quality, outdir, QUEUED, kind, pool, options,
+                     process_owner() if pool is None else None, now, now),
+                )
+                ids[url] = cursor.lastrowid
+        return ids
+
+    def lease(self, owner, pool=DEFAULT_POOL, visibility=300.0, profile=None):
+        """Reserva para ``owner`` o próximo trabalho disponível de ``pool`` e o retorna (None se não houver).
+
+        Disponíveis são os trabalhos na fila cuja espera já passou e os
+        reservados por um worker que parou de renovar a reserva. A reserva
+        conta uma tentativa; um trabalho que esgota as tentativas só por
+        reservas expiradas (o worker morreu durante ele) é marcado como falho.
+        Com ``profile`` = (formato, qualidade, pasta), só downloads desse
+        perfil são reservados (buscas e playlists, sempre).
+        """
+        now = time.time()
+        sql = ("SELECT * FROM jobs WHERE pool = ? AND ((state = ? AND next_attempt <= ?) "
+               "OR (state IN (?, ?) AND lease_owner IS NOT NULL AND lease_expires < ?))")
+        params = [pool, QUEUED, now, DOWNLOADING, TRANSCODING, now]
+        if profile is not None:
+            format, quality, outdir = profile
+            sql += " AND (kind != ? OR (format = ? AND quality IS ? AND outdir = ?))"
+            params += [DOWNLOAD_JOB, format, quality if format not in ('mp3', 'audio') else None, outdir]
+        with self._lock, self._conn:
+            # Take the write lock before reading, so two workers never lease the same job.
+            self._conn.execute("BEGIN IMMEDIATE")
+            for row in self._conn.execute(sql + " ORDER BY id", params).fetchall():
+                if row["state"] != QUEUED and row["attempts"] >= self.max_attempts:
+                    self._conn.execute(
+                        "UPDATE jobs SET state = ?, last_error = ?, lease_owner = NULL, lease_expires = NULL, updated = ? WHERE id = ?",
+                        (FAILED, f"reserva de {row['lease_owner']} expirou", now, row["id"]),
+                    )
+                    continue
+                self._conn.execute(
+                    "UPDATE jobs SET state = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ?, updated = ? WHERE id = ?",
+                    (DOWNLOADING, owner, now + visibility, now, row["id"]),
+                )
+                job = dict(row)
+                job.update(state=DOWNLOADING, attempts=row["attempts"] + 1, lease_owner=owner, lease_expires=now + visibility)
+                return job
+        return None
+
+    def heartbeat(self, owner, visibility=300.0):
+        """Renova as reservas de ``owner`` por mais ``visibility`` segundos e retorna quantas ele mantém."""
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE lease_owner = ? AND state IN (?, ?)",
+                (now + visibility, owner, DOWNLOADING, TRANSCODING),
+            )
+            return cursor.rowcount
+
+    def release(self, owner):
+        """Devolve à fila os trabalhos reservados por ``owner`` (worker encerrado), sem contar a tentativa."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state = ?, attempts = MAX(0, attempts - 1), lease_owner = NULL, lease_expires = NULL, "
+                "updated = ? WHERE lease_owner = ? AND state IN (?, ?)",
+                (QUEUED, time.time(), owner, DOWNLOADING, TRANSCODING),
+            )
+            return cursor.rowcount
+
+    def complete(self, job_id, result=None):
+        """Marca um trabalho como concluído, guardando ``result`` (ex.: o registro do histórico) em JSON."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, lease_owner = NULL, lease_expires = NULL, updated = ? WHERE id = ?",
+                (DONE, json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                 time.time(), job_id),
+            )
+
+    def mark(self, job_id, state):
+        """Atualiza o estado de um trabalho. Entrar em "downloading" conta uma tentativa."""
+        with self._lock, self._conn:
+            if state == DOWNLOADING:
+                self._conn.execute(
+                    "UPDATE jobs SET state = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                    (state, time.time(), job_id),
+                )
+            else:
+                self._conn.execute("UPDATE jobs SET state = ?, updated = ? WHERE id = ?", (state, time.time(), job_id))
+
+    def settle(self, urls, format, quality, outdir):
+        """Conclui os trabalhos locais pendentes dessas URLs, que não precisam mais ser baixadas (já estão na pasta)."""
+        quality = quality if format not in ('mp3', 'audio') else None
+        with self._lock, self._conn:
+            for url in urls:
+                self._conn.execute(
+                    f"UPDATE jobs SET state = ?, result = ?, lease_owner = NULL, lease_expires = NULL, updated = ? "
+                    f"WHERE url = ? AND format = ? AND quality IS ? AND outdir = ? AND kind = ? AND pool IS NULL "
+                    f"AND state IN ({','.join('?' * len(UNFINISHED_STATES))})",
+                    (DONE, json.dumps({"skipped": True}), time.time(), url, format, quality, outdir, DOWNLOAD_JOB,
+                     *UNFINISHED_STATES),
+                )
+
+    def fail(self, job_id, error):
+        """Registra uma falha. Retorna True se o trabalho voltou para a fila com espera exponencial."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            attempts = row["attempts"] if row else self.max_attempts
+            if attempts < self.max_attempts:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** max(0, attempts - 1))
+                # Local jobs keep their owner while they wait: the process that queued them retries them itself.
+                self._conn.execute(
+                    "UPDATE jobs SET state = ?, last_error = ?, next_attempt = ?, "
+                    "lease_owner = CASE WHEN pool IS NULL THEN lease_owner END, lease_expires = NULL, updated = ? WHERE id = ?",
+                    (QUEUED, str(error), now + delay, now, job_id),
+                )
+                return True
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, last_error = ?, lease_owner = NULL, lease_expires = NULL, updated = ? WHERE id = ?",
+                (FAILED, str(error), now, job_id),
+            )
+            return False
+
+    def reset_interrupted(self):
+        """Assume os trabalhos locais deixados por processos que terminaram e devolve à fila os que estavam em andamento.
+
+        Trabalhos de processos ainda rodando (ex.: a CLI usando o mesmo
+        arquivo que o aplicativo) não são tocados. Retorna quantos foram assumidos.
+        """
+        owner = process_owner()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                f"SELECT id, lease_owner FROM jobs WHERE pool IS NULL AND state IN ({','.join('?' * len(UNFINISHED_STATES))})",
+                UNFINISHED_STATES,
+            ).fetchall()
+            alive = {}
+            orphaned = [row["id"] for row in rows
+                        if row["lease_owner"] != owner
+                        and not alive.setdefault(row["lease_owner"], owner_alive(row["lease_owner"]))]
+            now = time.time()
+            for job_id in orphaned:
+                self._conn.execute(
+                    "UPDATE jobs SET state = ?, lease_owner = ?, updated = ? WHERE id = ?", (QUEUED, owner, now, job_id)
+                )
+            return len(orphaned)
+
+    def unfinished(self, pool=None, owner=None):
+        """Retorna os trabalhos ainda não concluídos (os locais, ou os de ``pool``), em ordem de criação.
+
+        Com ``owner``, só os trabalhos locais desse processo (ver ``process_owner``).
+        """
+        sql = f"SELECT * FROM jobs WHERE pool IS ? AND state IN ({','.join('?' * len(UNFINISHED_STATES))})"
+        params = [pool, *UNFINISHED_STATES]
+        if owner is not None:
+            sql += " AND lease_owner = ?"
+            params.append(owner)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY id", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def abandoned(self):
+        """Trabalhos locais não concluídos cujo processo já terminou (os que ``reset_interrupted`` assumiria)."""
+        return [job for job in self.unfinished() if not owner_alive(job["lease_owner"])]
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def counts(self, pool=None):
+        """Retorna o número de trabalhos em cada estado (de todos, ou só os de ``pool``)."""
+        with self._lock:
+            if pool is None:
+                rows = self._conn.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+            else:
+                rows = self._conn.execute("SELECT state, COUNT(*) AS n FROM jobs WHERE pool = ? GROUP BY state", (pool,)).fetchall()
+        return {row["state"]: row["n"] for row in rows}
+
+    def ready(self, pool=DEFAULT_POOL):
+        """Indica se há trabalhos de ``pool`` na fila prontos para serem reservados."""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM jobs WHERE pool = ? AND state = ? AND next_attempt <= ? LIMIT 1",
+                                     (pool, QUEUED, time.time())).fetchone()
+        return row is not None
+
+    def leases(self, pool=DEFAULT_POOL):
+        """Retorna {worker: (trabalhos reservados, fim da reserva mais longa)} de ``pool``, com o fim em segundos desde a época."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT lease_owner, COUNT(*) AS n, MAX(lease_expires) AS expires FROM jobs "
+                "WHERE pool = ? AND lease_owner IS NOT NULL AND state IN (?, ?) GROUP BY lease_owner",
+                (pool, DOWNLOADING, TRANSCODING),
+            ).fetchall()
+        return {row["lease_owner"]: (row["n"], row["expires"]) for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Retorna a fila de downloads compartilhada, criando-a no primeiro uso."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(max_attempts=int(os.getenv("MAX_ATTEMPTS", 3)), journal_mode=os.getenv("JOBS_JOURNAL_MODE", "WAL"))
+            atexit.register(_queue.close)
+        return _queue
@@ -0,0 +1,283 @@
+import atexit
+import bisect
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from concurrency import is_throttle_error
+from utils import get_metrics_file, get_metrics_port
+
+PREFIX = "baixarmusicas"
+
+# Histogram bucket upper bounds (the +Inf bucket is implicit).
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = (100e3, 500e3, 1e6, 5e6, 10e6, 50e6, 100e6, 500e6, 1e9)
+
+STAGES = ("api_search", "api_video_details", "ytdlp_search", "playlist_resolve", "extract", "transfer", "transcode", "save_history")
+
+
+def error_type(error):
+    """Classifica um erro para o contador de erros ("throttled" para HTTP 429/403, senão o nome da classe)."""
+    if is_throttle_error(error):
+        return "throttled"
+    return type(error).__name__ if isinstance(error, BaseException) else "error"
+
+
+class Histogram:
+    """Histograma cumulativo com limites fixos, no formato do Prometheus."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimativa do quantil pelo limite superior do bucket (None se vazio)."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "buckets": {str(bound): count for bound, count in zip(self.buckets + ("+Inf",), self._cumulative())},
+        }
+
+    def _cumulative(self):
+        total = 0
+        for count in self.counts:
+            total += count
+            yield total
+
+
+class Metrics:
+    """Registro de métricas do processo: contadores, histogramas e spans por item.
+
+    Cada etapa (busca na API, detalhes dos vídeos, extração do yt-dlp,
+    transferência, conversão com o ffmpeg, gravação do histórico) é medida
+    com ``span``; os tempos vão para o histograma ``stage_duration_seconds``
+    e os últimos ``max_spans`` spans ficam guardados com o item a que
+    pertencem. Tudo pode ser exportado em JSON ou no formato texto do
+    Prometheus.
+    """
+
+    def __init__(self, max_spans=10_000):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._spans = deque(maxlen=max_spans)
+        self.started = time.time()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        """Soma ``value`` ao contador ``name`` com os rótulos informados."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DURATION_BUCKETS, **labels):
+        """Registra um valor no histograma ``name``."""
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def record_span(self, stage, duration, item=None, ok=True, error=None):
+        """Registra um span já medido (útil quando início e fim ocorrem em callbacks diferentes)."""
+        self.observe("stage_duration_seconds", duration, stage=stage)
+        if not ok:
+            self.inc("errors_total", stage=stage, type=error_type(error))
+        with self._lock:
+            self._spans.append({
+                "stage": stage,
+                "item": item,
+                "start": round(time.time() - duration, 3),
+                "duration": round(duration, 6),
+                "ok": ok,
+                "error": str(error) if error is not None and not ok else None,
+            })
+
+    @contextmanager
+    def span(self, stage, item=None):
+        """Mede o bloco como uma etapa; exceções são contadas por tipo e propagadas."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record_span(stage, time.perf_counter() - start, item, ok=False, error=e)
+            raise
+        self.record_span(stage, time.perf_counter() - start, item)
+
+    def spans(self, item=None):
+        """Retorna os spans guardados, opcionalmente só os de um item."""
+        with self._lock:
+            return [span for span in self._spans if item is None or span["item"] == item]
+
+    def summary(self):
+        """Resumo por etapa: quantidade, tempo total, média e p95 estimado (s)."""
+        with self._lock:
+            histograms = {dict(labels)["stage"]: h for (name, labels), h in self._histograms.items()
+                          if name == "stage_duration_seconds"}
+        summary = {}
+        for stage in sorted(histograms, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES)):
+            h = histograms[stage]
+            summary[stage] = {
+                "count": h.count,
+                "total": round(h.sum, 3),
+                "mean": round(h.sum / h.count, 4) if h.count else 0.0,
+                "p95": h.quantile(0.95),
+            }
+        return summary
+
+    def snapshot(self):
+        """Estado completo das métricas em um dicionário serializável em JSON."""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{"name": name, "labels": dict(labels), **h.as_dict()}
+                          for (name, labels), h in sorted(self._histograms.items())]
+            spans = list(self._spans)
+        return {
+            "started": self.started,
+            "uptime": round(time.time() - self.started, 3),
+            "counters": counters,
+            "histograms": histograms,
+            "stages": self.summary(),
+            "spans": spans,
+        }
+
+    def write_json(self, path):
+        """Grava ``snapshot()`` em um arquivo JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2, ensure_ascii=False)
+
+    def prometheus_text(self):
+        """Exporta contadores e histogramas no formato texto do Prometheus."""
+
+        def labels_text(labels, extra=()):
+            pairs = [*labels, *extra]
+            if not pairs:
+                return ""
+            escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+            for name in dict.fromkeys(name for (name, _), _ in counters):
+                lines.append(f"# TYPE {PREFIX}_{name} counter")
+                for (other, labels), value in counters:
+                    if other == name:
+                        lines.append(f"{PREFIX}_{name}{labels_text(labels)} {value}")
+            for name in dict.fromkeys(name for (name, _), _ in histograms):
+                lines.append(f"# TYPE {PREFIX}_{name} histogram")
+                for (other, labels), h in histograms:
+                    if other != name:
+                        continue
+                    for bound, count in zip(h.buckets + ("+Inf",), h._cumulative()):
+                        lines.append(f"{PREFIX}_{name}_bucket{labels_text(labels, (('le', bound),))} {count}")
+                    lines.append(f"{PREFIX}_{name}_sum{labels_text(labels)} {h.sum}")
+                    lines.append(f"{PREFIX}_{name}_count{labels_text(labels)} {h.count}")
+        lines.append(f"# TYPE {PREFIX}_uptime_seconds gauge")
+        lines.append(f"{PREFIX}_uptime_seconds {time.time() - self.started:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._spans.clear()
+            self.started = time.time()
+
+
+metrics = Metrics()
+
+
+class MetricsServer:
+    """Servidor HTTP local com ``/metrics`` (Prometheus) e ``/metrics.json``."""
+
+    def __init__(self, registry, port, host="127.0.0.1"):
+        # Imported here so that loading this module stays cheap at startup.
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/metrics":
+                    body, content_type = registry.prometheus_text(), "text/plain; version=0.0.4; charset=utf-8"
+                elif path == "/metrics.json":
+                    body, content_type = json.dumps(registry.snapshot(), ensure_ascii=False), "application/json; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+_server = None
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Inicia (uma vez por processo) o servidor de métricas e o retorna."""
+    global _server
+    if _server is None:
+        _server = MetricsServer(metrics, port, host).start()
+    return _server
+
+
+def configure_from_env(log_cb=None):
+    """Aplica METRICS_PORT (servidor Prometheus) e METRICS_FILE (JSON gravado ao sair)."""
+    port = get_metrics_port()
+    if port:
+        try:
+            server = start_metrics_server(port)
+            if log_cb: log_cb(f"Métricas disponíveis em http://127.0.0.1:{server.port}/metrics")
+        except OSError as e:
+            if log_cb: log_cb(f"Não foi possível iniciar o servidor de métricas na porta {port}: {e}")
+    path = get_metrics_file()
+    if path:
+        atexit.register(metrics.write_json, path)
@@ -0,0 +1,376 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import yt_dlp
+
+import transcode
+from archive import format_key
+from bandwidth import get_governor
+from concurrency import AdaptiveConcurrency, ConcurrencyLimiter
+from history import get_history_store
+from infocache import get_info_cache
+from jobqueue import DOWNLOADING, TRANSCODING
+from metrics import SIZE_BUCKETS, metrics
+from sessions import SessionPool
+from utils import get_info_prefetch
+
+
+class StageStats:
+    """Contadores de uma etapa do pipeline."""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.completed = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.blocked_time = 0.0
+        self.max_queue = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, ok, busy, blocked=0.0):
+        with self._lock:
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+            self.busy_time += busy
+            self.blocked_time += blocked
+
+    def add_bytes(self, count):
+        with self._lock:
+            self.bytes += count
+
+    def observe_queue(self, size):
+        with self._lock:
+            self.max_queue = max(self.max_queue, size)
+
+    def as_dict(self, elapsed):
+        """Resumo da etapa; ``utilization`` é a fração do tempo em que os workers ficaram ocupados."""
+        with self._lock:
+            capacity = self.workers * elapsed
+            return {
+                "workers": self.workers,
+                "completed": self.completed,
+                "failed": self.failed,
+                "busy_time": round(self.busy_time, 3),
+                "blocked_time": round(self.blocked_time, 3),
+                "max_queue": self.max_queue,
+                "bytes": self.bytes,
+                "utilization": round(self.busy_time / capacity, 3) if capacity else 0.0,
+            }
+
+
+def _final_output(ydl, info, outdir, ext):
+    """Caminho final (``<título>.<ext>``) de um item, no mesmo padrão do download direto."""
+    name = ydl.prepare_filename(info, outtmpl=os.path.join(outdir, '%(title)s.%(ext)s'))
+    return os.path.splitext(name)[0] + "." + ext
+
+
+def audio_codec(info):
+    """Codec do fluxo de áudio baixado (ex.: "opus", "mp4a.40.2"), ou None se desconhecido."""
+    for d in [*(info.get("requested_downloads") or []), info]:
+        if d.get("acodec") not in (None, "none"):
+            return d["acodec"]
+    return None
+
+
+def build_transcode_job(ydl, info, format, outdir):
+    """Monta o trabalho da etapa de CPU a partir dos arquivos baixados pela etapa de rede."""
+    downloads = info.get("requested_downloads") or [info]
+    inputs = [d["filepath"] for d in downloads]
+    if format == 'mp3':
+        return {"kind": "mp3", "inputs": inputs[:1], "output": _final_output(ydl, info, outdir, "mp3"), "quality": "192"}
+    if format == 'audio':
+        # Native codec: the stream is moved as is, or copied into a container that holds it.
+        ext = os.path.splitext(inputs[0])[1].lstrip(".")
+        codec, vcodec = audio_codec(info), downloads[0].get("vcodec")
+        if not codec:
+            # Direct links (generic extractor) come without codec information; read it from the file header.
+            streams = transcode.probe_streams(inputs[0])
+            codec = info["acodec"] = streams.get("audio")
+            vcodec = streams.get("video", "none")
+        container = transcode.audio_container(codec, ext)
+        output = _final_output(ydl, info, outdir, container)
+        has_video = vcodec not in (None, "none")
+        return {"kind": "move" if container == ext and not has_video else "audio", "inputs": inputs[:1], "output": output}
+
+    output = _final_output(ydl, info, outdir, "mp4")
+    if len(downloads) >= 2:
+        # Video stream first, audio stream second.
+        video = next((d for d in downloads if d.get("vcodec") not in (None, "none")), downloads[0])
+        audio = next((d for d in downloads if d is not video), downloads[1])
+        return {"kind": "merge", "inputs": [video["filepath"], audio["filepath"]], "output": output}
+    if inputs[0].endswith(".mp4"):
+        return {"kind": "move", "inputs": inputs, "output": output}
+    return {"kind": "remux", "inputs": inputs, "output": output}
+
+
+class DownloadPipeline:
+    """Pipeline de download em duas etapas.
+
+    A etapa de rede (threads, ``io_workers``) baixa os fluxos originais e os
+    coloca em uma fila limitada; a etapa de CPU (processos, ``cpu_workers``)
+    executa as conversões e junções com o ffmpeg. Quando a etapa de CPU
+    está atrasada, a fila cheia bloqueia a etapa de rede, e vice-versa.
+
+    ``run`` aceita qualquer iterável de URLs, inclusive um gerador que as
+    descobre aos poucos (ex.: a listagem de um canal): cada URL entra na
+    fila de download assim que é produzida.
+
+    Com ``adaptive=True`` o número de downloads simultâneos começa em
+    ``io_workers`` e é ajustado entre ``min_workers`` e ``max_workers``
+    conforme a vazão e os erros de limitação (ver ``AdaptiveConcurrency``).
+
+    Enquanto os primeiros itens baixam, até ``prefetch`` itens seguintes da
+    fila têm os metadados extraídos em segundo plano (ver ``infocache``), e
+    o download deles já começa pela transferência.
+
+    Os downloads concluídos vão para ``history_store`` (padrão: o histórico
+    global, ver ``history.get_history_store``).
+    """
+
+    def __init__(self, format, outdir, quality=None, io_workers=3, cpu_workers=None, queue_size=None,
+                 log_cb=None, item_cb=None, progress_hook=None, state_cb=None, result_cb=None,
+                 adaptive=False, min_workers=1, max_workers=None, adapt_interval=5.0, prefetch=None,
+                 history_store=None):
+        self.format = format
+        self.outdir = outdir
+        self.quality = quality
+        self.key = format_key(format, quality)
+        self.io_workers = max(1, io_workers)
+        self.max_io_workers = max(self.io_workers, max_workers or self.io_workers) if adaptive else self.io_workers
+        self.cpu_workers = max(1, cpu_workers or os.cpu_count() or 1)
+        self.log_cb = log_cb
+        self.item_cb = item_cb
+        self.progress_hook = progress_hook
+        self.state_cb = state_cb
+        self.result_cb = result_cb
+        self.history_store = history_store
+        self.io_stats = StageStats("io", self.max_io_workers)
+        self.cpu_stats = StageStats("cpu", self.cpu_workers)
+
+        self._input = queue.Queue()
+        self._transcode = queue.Queue(maxsize=queue_size or self.cpu_workers * 2)
+        self._cpu_slots = threading.Semaphore(self.cpu_workers)
+        self._limiter = ConcurrencyLimiter(self.io_workers)
+        # Large files take extra connections from the same limiter (see chunked.RangeDownloader).
+        self._sessions = SessionPool(connection_budget=self._limiter)
+        self._governor = get_governor()
+        self._controller = AdaptiveConcurrency(self._limiter, min_workers, self.max_io_workers,
+                                               interval=adapt_interval, log_cb=log_cb) if adaptive else None
+        self._info_cache = get_info_cache()
+        self.prefetch = max(0, get_info_prefetch() if prefetch is None else prefetch) if self._info_cache.ttl else 0
+        self._prefetch_queue = queue.Queue()
+        self._lookahead = threading.Semaphore(self.prefetch)
+        self._started = set()
+        self._prefetching = set()
+        self._transfer_started = {}
+        self._pending = 0
+        self._feeding = True
+        self._pending_lock = threading.Lock()
+        self._all_done = threading.Event()
+
+    def _log(self, message):
+        if self.log_cb: self.log_cb(message)
+
+    def _finish_item(self, url, ok, info=None, filepath=None, error=None):
+        """Encerra um item (sucesso ou falha) e avisa quem acompanha o lote."""
+        metrics.inc("downloads_total", format=self.key, result="ok" if ok else "failed")
+        if ok:
+            entry = {
+                "videoId": info.get("id"),
+                "title": info.get("title", "N/A"),
+                "url": url,
+                "format": self.key,
+                "codec": "mp3" if self.format == 'mp3' else audio_codec(info),
+                "filepath": filepath,
+                "download_date": time.strftime("%Y-%m-%d %H:%M:%S")
+            }
+            with metrics.span("save_history", url):
+                (self.history_store or get_history_store()).add(entry)
+            if self.result_cb: self.result_cb(url, entry)
+            self._log(f"Download concluído: {info.get('title', url)}")
+        else:
+            self._log(f"Erro ao baixar {url}: {error}")
+        if self.item_cb: self.item_cb(url, ok, error)
+        with self._pending_lock:
+            self._pending -= 1
+            if self._pending == 0 and not self._feeding:
+                self._all_done.set()
+
+    def _progress(self, url, d):
+        status = d.get('status')
+        if status == 'downloading':
+            self._transfer_started.setdefault(url, time.monotonic())
+        elif status == 'finished':
+            size = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+            self.io_stats.add_bytes(size)
+            metrics.inc("bytes_downloaded_total", size, format=self.key)
+            metrics.observe("download_size_bytes", size, buckets=SIZE_BUCKETS, format=self.key)
+        if self._controller: self._controller.on_progress(d)
+        if self.progress_hook: self.progress_hook(url, d)
+        self._governor.on_progress(d)
+
+    def _prefetch_worker(self):
+        """Extrai antecipadamente os metadados dos próximos itens da fila, no máximo ``prefetch`` à frente."""
+        while True:
+            url = self._prefetch_queue.get()
+            if url is None:
+                return
+            self._lookahead.acquire()
+            with self._pending_lock:
+                if url in self._started:
+                    self._lookahead.release()
+                    continue
+                self._prefetching.add(url)
+            self._info_cache.prefetch(self._sessions.get(self.format, self.outdir, self.quality, raw=True), url)
+
+    def _io_worker(self):
+        """Etapa de rede: baixa os fluxos originais e os entrega para a etapa de CPU."""
+        while True:
+            url = self._input.get()
+            if url is None:
+                return
+            self._limiter.acquire()
+            try:
+                self._download_one(url)
+            finally:
+                self._limiter.release()
+
+    def _record_io_spans(self, url, start, end, error=None):
+        """Divide o tempo da etapa de rede em extração (metadados) e transferência (bytes do arquivo)."""
+        transfer_start = self._transfer_started.pop(url, None)
+        if transfer_start is None:
+            metrics.record_span("extract", end - start, url, ok=error is None, error=error)
+            return
+        metrics.record_span("extract", transfer_start - start, url)
+        metrics.record_span("transfer", end - transfer_start, url, ok=error is None, error=error)
+
+    def _download_one(self, url):
+        start = time.monotonic()
+        with self._pending_lock:
+            self._started.add(url)
+            if url in self._prefetching:
+                self._prefetching.discard(url)
+                self._lookahead.release()
+        if self.state_cb: self.state_cb(url, DOWNLOADING)
+        try:
+            self._sessions.set_progress_hook(lambda d: self._progress(url, d))
+            ydl = self._sessions.get(self.format, self.outdir, self.quality, raw=True)
+            info = self._info_cache.download(ydl, url)
+            job = build_transcode_job(ydl, info, self.format, self.outdir)
+        except yt_dlp.utils.DownloadError as e:
+            if self._controller: self._controller.on_error(e)
+            self.io_stats.record(False, time.monotonic() - start)
+            self._record_io_spans(url, start, time.monotonic(), error=e)
+            self._finish_item(url, False, error=e)
+            return
+        except Exception as e:
+            self.io_stats.record(False, time.monotonic() - start)
+            self._record_io_spans(url, start, time.monotonic(), error=e)
+            self._finish_item(url, False, error=f"erro inesperado: {e}")
+            return
+        busy = time.monotonic() - start
+        self._record_io_spans(url, start, start + busy)
+
+        if self.state_cb: self.state_cb(url, TRANSCODING)
+        blocked_start = time.monotonic()
+        self._transcode.put((url, info, job))
+        self.cpu_stats.observe_queue(self._transcode.qsize())
+        self.io_stats.record(True, busy, time.monotonic() - blocked_start)
+
+    def _cpu_dispatcher(self, pool):
+        """Etapa de CPU: envia os trabalhos da fila para o pool de processos, respeitando o número de núcleos."""
+        while True:
+            entry = self._transcode.get()
+            if entry is None:
+                return
+            url, info, job = entry
+            self._cpu_slots.acquire()
+            start = time.monotonic()
+            try:
+                future = pool.submit(transcode.run_job, job)
+            except Exception as e:
+                # A broken pool fails every remaining job instead of stalling the batch.
+                self._cpu_slots.release()
+                self.cpu_stats.record(False, 0.0)
+                metrics.record_span("transcode", 0.0, url, ok=False, error=e)
+                self._finish_item(url, False, error=f"falha na conversão: {e}")
+                continue
+            future.add_done_callback(lambda f, url=url, info=info, start=start: self._on_transcoded(f, url, info, start))
+
+    def _on_transcoded(self, future, url, info, start):
+        self._cpu_slots.release()
+        try:
+            filepath = future.result()
+        except Exception as e:
+            self.cpu_stats.record(False, time.monotonic() - start)
+            metrics.record_span("transcode", time.monotonic() - start, url, ok=False, error=e)
+            self._finish_item(url, False, error=f"falha na conversão: {e}")
+            return
+        self.cpu_stats.record(True, time.monotonic() - start)
+        metrics.record_span("transcode", time.monotonic() - start, url)
+        self._finish_item(url, True, info=info, filepath=filepath)
+
+    def _feed(self, urls, io_threads):
+        """Entrega as URLs à etapa de rede conforme o iterável as produz."""
+        try:
+            for url in urls:
+                with self._pending_lock:
+                    self._pending += 1
+                self._input.put(url)
+                if self.prefetch: self._prefetch_queue.put(url)
+        except Exception as e:
+            self._log(f"Erro ao listar os itens a baixar: {e}")
+        finally:
+            for _ in range(io_threads):
+                self._input.put(None)
+            for _ in range(self.prefetch):
+                self._prefetch_queue.put(None)
+            with self._pending_lock:
+                self._feeding = False
+                if self._pending == 0:
+                    self._all_done.set()
+
+    def run(self, urls):
+        """Processa as URLs (lista ou gerador) e retorna as estatísticas de cada etapa."""
+        started = time.monotonic()
+        if isinstance(urls, (list, tuple)):
+            if not urls:
+                return {"io": self.io_stats.as_dict(0), "cpu": self.cpu_stats.as_dict(0), "elapsed": 0.0}
+            io_count = min(self.max_io_workers, len(urls))
+        else:
+            io_count = self.max_io_workers
+        io_threads = [threading.Thread(target=self._io_worker, name=f"download-io-{i}", daemon=True)
+                      for i in range(io_count)]
+        prefetch_threads = [threading.Thread(target=self._prefetch_worker, name=f"download-prefetch-{i}", daemon=True)
+                            for i in range(self.prefetch)]
+
+        # "spawn" avoids forking a process that already runs several threads.
+        with ProcessPoolExecutor(max_workers=self.cpu_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            dispatcher = threading.Thread(target=self._cpu_dispatcher, args=(pool,), name="download-cpu", daemon=True)
+            dispatcher.start()
+            if self._controller: self._controller.start()
+            for thread in io_threads + prefetch_threads:
+                thread.start()
+            self._feed(urls, io_count)
+            for thread in io_threads:
+                thread.join()
+            if self._controller: self._controller.stop()
+            self._transcode.put(None)
+            dispatcher.join()
+            self._all_done.wait()
+        self._sessions.close()
+
+        elapsed = time.monotonic() - started
+        stats = {"io": self.io_stats.as_dict(elapsed), "cpu": self.cpu_stats.as_dict(elapsed), "elapsed": round(elapsed, 3)}
+        if self._controller:
+            stats["io"]["final_concurrency"] = self._limiter.limit
+            stats["io"]["decisions"] = list(self._controller.decisions)
+        return stats
@@ -0,0 +1,105 @@
+import datetime
+import itertools
+
+import yt_dlp
+
+from metrics import metrics
+from utils import extract_video_id, is_channel_url, is_collection_url
+
+_FLAT_OPTIONS = {
+    'extract_flat': 'in_playlist',
+    'skip_download': True,
+    'logtostderr': False,
+    'quiet': True,
+    'no_warnings': True,
+}
+
+
+def _entry_date(data):
+    """Data de publicação (AAAAMMDD) de uma entrada, se o extrator a informou."""
+    if data.get("upload_date"):
+        return data["upload_date"]
+    timestamp = data.get("timestamp") or data.get("release_timestamp")
+    if timestamp:
+        return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime("%Y%m%d")
+    return None
+
+
+def _to_video(data, url):
+    views = data.get("view_count")
+    duration = data.get("duration")
+    return {
+        "title": data.get("title") or "N/A",
+        "url": url,
+        "channelTitle": data.get("channel") or data.get("uploader") or data.get("playlist_uploader") or "N/A",
+        "videoId": extract_video_id(url) or data.get("id"),
+        "duration": int(duration) if duration else None,  # Seconds; formatted only for display
+        "views": views if isinstance(views, int) else None,
+        "uploadDate": _entry_date(data),
+    }
+
+
+def _iter_flat(ydl, url, depth=0):
+    """Percorre as entradas de uma playlist/canal sem baixar nada, expandindo abas e sub-playlists."""
+    result = ydl.extract_info(url, download=False, process=False)
+    if result.get("_type") not in ("playlist", "multi_video"):
+        yield result
+        return
+    # process=False keeps "entries" lazy: each page of the listing is fetched only when reached.
+    for entry in result.get("entries") or []:
+        if not entry:
+            continue
+        if entry.get("_type") == "playlist":
+            yield from (e for e in entry.get("entries") or [] if e)
+            continue
+        entry_url = entry.get("url") or entry.get("webpage_url")
+        nested = entry.get("_type") == "url" and entry.get("ie_key") not in (None, "Youtube") and is_collection_url(entry_url)
+        if nested and depth < 2:
+            # Channel pages list their tabs (Videos, Shorts, Live) as nested playlists.
+            yield from _iter_flat(ydl, entry_url, depth + 1)
+        else:
+            yield entry
+
+
+def iter_playlist_videos(url, limit=None, min_views=0, date_after=None, date_before=None, start=1, log_cb=None):
+    """Lista os vídeos de uma playlist ou canal à medida que são descobertos.
+
+    As entradas são lidas da listagem "plana" do yt-dlp, página por página,
+    e cada vídeo aprovado nos filtros é entregue imediatamente, então quem
+    consome o gerador pode começar a baixar antes de a listagem terminar.
+    ``start`` (1 = primeira entrada) e ``limit`` delimitam o trecho lido;
+    ``min_views``, ``date_after`` e ``date_before`` (AAAAMMDD, inclusivos)
+    filtram os vídeos. Quando a listagem não traz as visualizações ou a
+    data de um vídeo e há filtro por elas, os metadados completos do vídeo
+    são consultados. Em canais (ordenados do mais novo para o mais antigo),
+    a leitura para no primeiro vídeo anterior a ``date_after``.
+    """
+    stop_at_older = bool(date_after) and is_channel_url(url)
+    with yt_dlp.YoutubeDL(_FLAT_OPTIONS) as ydl:
+        entries = _iter_flat(ydl, url)
+        entries = itertools.islice(entries, max(0, start - 1), None if limit is None else max(0, start - 1) + limit)
+        for data in entries:
+            metrics.inc("playlist_entries_total")
+            if data.get("_type") not in (None, "url", "url_transparent", "video") or not (data.get("url") or data.get("webpage_url")):
+                continue
+            video_url = data.get("webpage_url") or data.get("url")
+            needs_views = min_views and not isinstance(data.get("view_count"), int)
+            needs_date = (date_after or date_before) and not _entry_date(data)
+            if needs_views or needs_date:
+                try:
+                    with metrics.span("playlist_resolve", item=video_url):
+                        data = {**data, **ydl.extract_info(video_url, download=False)}
+                except (yt_dlp.utils.DownloadError, yt_dlp.utils.ExtractorError) as e:
+                    if log_cb: log_cb(f"Não foi possível ler os metadados de {video_url}: {e}")
+                    continue
+            upload_date = _entry_date(data)
+            if date_after and upload_date and upload_date < date_after:
+                if stop_at_older:
+                    if log_cb: log_cb(f"Vídeos anteriores a {date_after} alcançados; listagem do canal encerrada.")
+                    break
+                continue
+            if date_before and upload_date and upload_date > date_before:
+                continue
+            if min_views and (data.get("view_count") or 0) < min_views:
+                continue
+            yield _to_video(data, video_url)
@@ -0,0 +1,87 @@
+import datetime
+import os
+import sqlite3
+import threading
+
+from metrics import metrics
+
+# Cost, in quota units, of each YouTube Data API call used by the app.
+COSTS = {"search": 100, "videos": 1}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quota (
+    day TEXT PRIMARY KEY,
+    units INTEGER NOT NULL
+);
+"""
+
+
+class QuotaExceeded(Exception):
+    """A chamada à API ultrapassaria a cota diária configurada."""
+
+
+def _quota_day():
+    """Dia da cota (AAAA-MM-DD): a YouTube Data API zera a cota à meia-noite do horário do Pacífico."""
+    try:
+        from zoneinfo import ZoneInfo
+        tz = ZoneInfo("America/Los_Angeles")
+    except Exception:
+        tz = datetime.timezone(datetime.timedelta(hours=-8))
+    return datetime.datetime.now(tz).strftime("%Y-%m-%d")
+
+
+class QuotaTracker:
+    """Contabiliza as unidades de cota gastas na YouTube Data API, por dia.
+
+    Antes de cada chamada, ``reserve`` desconta o custo dela (search = 100,
+    videos.list = 1) e levanta ``QuotaExceeded`` se o total do dia passaria
+    de ``daily_budget``. O total fica gravado em SQLite, então vale entre
+    execuções e entre processos que usam o mesmo arquivo.
+    """
+
+    def __init__(self, path, daily_budget):
+        self.daily_budget = daily_budget
+        self._lock = threading.Lock()
+        quota_dir = os.path.dirname(path)
+        if quota_dir:
+            os.makedirs(quota_dir, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _spent(self, day):
+        row = self._conn.execute("SELECT units FROM quota WHERE day = ?", (day,)).fetchone()
+        return row[0] if row else 0
+
+    def spent(self):
+        """Unidades gastas hoje."""
+        with self._lock:
+            return self._spent(_quota_day())
+
+    def remaining(self):
+        """Unidades ainda disponíveis hoje (None se não houver limite)."""
+        if not self.daily_budget:
+            return None
+        return max(0, self.daily_budget - self.spent())
+
+    def reserve(self, endpoint, calls=1):
+        """Desconta o custo de ``calls`` chamadas a ``endpoint`` ou levanta ``QuotaExceeded``."""
+        units = COSTS[endpoint] * calls
+        day = _quota_day()
+        with self._lock, self._conn:
+            spent = self._spent(day)
+            if self.daily_budget and spent + units > self.daily_budget:
+                metrics.inc("api_quota_refused_total", endpoint=endpoint)
+                raise QuotaExceeded(f"cota diária da API esgotada ({spent}/{self.daily_budget} unidades usadas)")
+            self._conn.execute("INSERT INTO quota (day, units) VALUES (?, ?) "
+                               "ON CONFLICT(day) DO UPDATE SET units = units + excluded.units", (day, units))
+        metrics.inc("api_quota_units_total", units, endpoint=endpoint)
+
+    def exhaust(self):
+        """Marca a cota do dia como esgotada (a API respondeu quotaExceeded)."""
+        if not self.daily_budget:
+            return
+        day = _quota_day()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO quota (day, units) VALUES (?, ?) "
+                               "ON CONFLICT(day) DO UPDATE SET units = MAX(units, excluded.units)", (day, self.daily_budget))
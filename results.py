@@ -0,0 +1,290 @@
+import re
+
+from dedup import DuplicateIndex, duration_seconds
+
+_DIGITS_RE = re.compile(r"\d+")
+
+# Legacy dict keys of a search result -> VideoResult attribute.
+_FIELDS = {
+    "videoId": "video_id",
+    "url": "url",
+    "title": "title",
+    "channelTitle": "channel",
+    "duration": "duration",
+    "views": "views",
+    "uploadDate": "upload_date",
+    "artist": "artist",
+}
+
+SORT_COLUMNS = ("title", "channel", "duration", "views")
+
+
+def _to_int(value):
+    """Visualizações como int: aceita int, "1,234", "1234" ou "N/A" (None)."""
+    if isinstance(value, int) or value is None:
+        return value
+    digits = "".join(_DIGITS_RE.findall(str(value)))
+    return int(digits) if digits else None
+
+
+class VideoResult:
+    """Um resultado de busca com campos tipados, em ``__slots__``.
+
+    ``views`` e ``duration`` (em segundos) são números, ou None quando
+    desconhecidos; o texto exibido é gerado só na hora de desenhar a linha
+    (``utils.format_views``/``utils.format_duration``). As chaves dos
+    dicionários de resultado ("videoId", "channelTitle"...) continuam
+    valendo com ``video["..."]`` e ``video.get(...)``.
+    """
+
+    __slots__ = ("video_id", "url", "title", "channel", "duration", "views", "upload_date", "artist")
+
+    def __init__(self, video_id, url, title, channel, duration=None, views=None, upload_date=None, artist=None):
+        self.video_id = video_id
+        self.url = url
+        self.title = title
+        self.channel = channel
+        self.duration = duration
+        self.views = views
+        self.upload_date = upload_date
+        self.artist = artist
+
+    @classmethod
+    def from_dict(cls, video, artist=None):
+        """Converte um resultado de busca (dicionário) normalizando visualizações e duração."""
+        return cls(video.get("videoId"), video["url"], video.get("title") or "N/A", video.get("channelTitle") or "N/A",
+                   duration_seconds(video.get("duration")), _to_int(video.get("views")), video.get("uploadDate"),
+                   video.get("artist") or artist)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, _FIELDS[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        attr = _FIELDS.get(key)
+        return getattr(self, attr) if attr else default
+
+
+class ResultsModel:
+    """Resultados da busca mantidos em Python, independentes da árvore da interface.
+
+    Cada vídeo recebe um ID de linha; a seleção é um conjunto desses IDs,
+    então marcar ou desmarcar tudo é uma operação de conjunto e a interface
+    só precisa redesenhar as linhas que mudaram.
+
+    Com ``dedupe=True``, vídeos que são a mesma música (ver
+    ``DuplicateIndex``) viram linhas filhas da linha do vídeo principal do
+    grupo, e "selecionar todos" marca só as linhas principais.
+
+    Os vídeos são guardados como ``VideoResult``. ``set_filter`` (views
+    mínimas, faixa de duração, canal) e ``set_sort`` mudam só a visão
+    (``view``): a ordem de cada coluna é calculada uma vez e reaproveitada
+    até chegarem novos resultados, então refiltrar milhares de linhas não
+    faz nenhuma consulta à rede.
+    """
+
+    def __init__(self, dedupe=False):
+        self.dedupe = dedupe
+        self.min_views = 0
+        self.min_duration = None
+        self.max_duration = None
+        self.channel = ""
+        self.sort_column = None
+        self.descending = False
+        self.clear()
+
+    def clear(self, artist=None):
+        """Descarta todos os resultados e a seleção (``artist`` ajuda a agrupar duplicatas)."""
+        self.videos = {}  # row id -> video, in display order
+        self.url_to_item = {}
+        self.selected = set()
+        self.marked = {}  # row id -> sequence number of when it was selected (download priority)
+        self._mark_seq = 0
+        self.progress = {}
+        self.parent = {}  # child row id -> row id of the cluster's main video
+        self.children = {}  # row id -> child row ids
+        self._index = DuplicateIndex(artist)
+        self._cluster_rows = {}  # id(cluster) -> row id of its main video
+        self._orders = {}  # (column, descending) -> main row ids in that order
+        self._view = None
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self.videos)
+
+    def _changed(self):
+        self._orders.clear()
+        self._view = None
+
+    def _new_row(self, video):
+        item_id = str(self._next_id)
+        self._next_id += 1
+        self.videos[item_id] = video
+        self.url_to_item[video["url"]] = item_id
+        return item_id
+
+    def add(self, video, artist=None):
+        """Acrescenta um vídeo e retorna os IDs das linhas a desenhar ou redesenhar.
+
+        Uma duplicata entra como linha filha da linha principal do grupo. Se
+        ela for melhor que o vídeo principal, as duas trocam de lugar: a
+        linha principal passa a mostrar o vídeo novo e o antigo vai para a
+        linha filha.
+        """
+        if not isinstance(video, VideoResult):
+            video = VideoResult.from_dict(video, artist)
+        self._changed()
+        if not self.dedupe:
+            return [self._new_row(video)]
+        cluster, previous = self._index.add(video, artist)
+        main_id = self._cluster_rows.get(id(cluster))
+        if main_id is None:
+            main_id = self._cluster_rows[id(cluster)] = self._new_row(video)
+            self.children[main_id] = []
+            return [main_id]
+        if previous is not None:
+            # The new video takes over the main row; the old one becomes the child.
+            self.videos[main_id] = video
+            self.url_to_item[video["url"]] = main_id
+            video = previous
+        child_id = self._new_row(video)
+        if previous is not None:
+            # Selection, priority and progress belong to the video, not the row: they follow it to the child row.
+            if main_id in self.selected:
+                self.selected.discard(main_id)
+                self.selected.add(child_id)
+            if main_id in self.marked:
+                self.marked[child_id] = self.marked.pop(main_id)
+            if main_id in self.progress:
+                self.progress[child_id] = self.progress.pop(main_id)
+        self.parent[child_id] = main_id
+        self.children[main_id].append(child_id)
+        return [main_id, child_id]
+
+    def parent_of(self, item_id):
+        """ID da linha principal de uma duplicata ("" para linhas principais)."""
+        return self.parent.get(item_id, "")
+
+    def duplicate_count(self, item_id):
+        return len(self.children.get(item_id, ()))
+
+    def is_selected(self, item_id):
+        return item_id in self.selected
+
+    def toggle(self, item_id):
+        """Inverte a seleção de uma linha e retorna o novo estado."""
+        if item_id in self.selected:
+            self.selected.discard(item_id)
+            self.marked.pop(item_id, None)
+            return False
+        if item_id in self.videos:
+            self.selected.add(item_id)
+            self._mark([item_id])
+            return True
+        return False
+
+    def select_all(self):
+        """Seleciona as linhas principais visíveis (não as duplicatas) e retorna as que mudaram de estado."""
+        changed = [item_id for item_id in self.view() if item_id not in self.selected]
+        self.selected.update(changed)
+        self._mark(changed)
+        return changed
+
+    def select_none(self):
+        """Limpa a seleção e retorna as linhas que estavam selecionadas, na ordem de exibição."""
+        changed = [item_id for item_id in self.videos if item_id in self.selected]
+        self.selected.clear()
+        self.marked.clear()
+        return changed
+
+    def _mark(self, item_ids):
+        for item_id in item_ids:
+            self._mark_seq += 1
+            self.marked[item_id] = self._mark_seq
+
+    def priorities(self):
+        """Prioridade de download de cada URL selecionada: quem foi marcado antes vem primeiro."""
+        return {self.videos[item_id]["url"]: -seq for item_id, seq in self.marked.items()}
+
+    def selected_videos(self):
+        """Vídeos selecionados entre os visíveis com os filtros atuais, na ordem de exibição."""
+        videos = []
+        for item_id in self.view():
+            for row in (item_id, *self.children.get(item_id, ())):
+                if row in self.selected:
+                    videos.append(self.videos[row])
+        return videos
+
+    def set_filter(self, min_views=0, min_duration=None, max_duration=None, channel=""):
+        """Define os filtros locais: views mínimas, faixa de duração (segundos) e trecho do nome do canal."""
+        self.min_views = min_views or 0
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.channel = (channel or "").strip().casefold()
+        self._view = None
+
+    def set_sort(self, column=None, descending=False):
+        """Ordena a visão por uma coluna de ``SORT_COLUMNS`` (None volta à ordem de chegada)."""
+        if column is not None and column not in SORT_COLUMNS:
+            raise ValueError(f"coluna de ordenação inválida: {column!r}")
+        self.sort_column = column
+        self.descending = descending
+        self._view = None
+
+    @property
+    def filtered(self):
+        return bool(self.min_views or self.min_duration is not None or self.max_duration is not None or self.channel)
+
+    def matches(self, item_id):
+        """Indica se o vídeo da linha passa pelos filtros atuais (valores desconhecidos não passam)."""
+        video = self.videos[item_id]
+        if self.min_views and (video.views is None or video.views < self.min_views):
+            return False
+        if self.min_duration is not None or self.max_duration is not None:
+            if video.duration is None:
+                return False
+            if self.min_duration is not None and video.duration < self.min_duration:
+                return False
+            if self.max_duration is not None and video.duration > self.max_duration:
+                return False
+        return not self.channel or self.channel in video.channel.casefold()
+
+    def is_visible(self, item_id):
+        """Linhas principais seguem os filtros; duplicatas aparecem junto com a linha principal."""
+        return self.matches(self.parent.get(item_id, item_id))
+
+    def _order(self):
+        key = (self.sort_column, self.descending)
+        rows = self._orders.get(key)
+        if rows is None:
+            rows = [item_id for item_id in self.videos if item_id not in self.parent]
+            if self.sort_column is not None:
+                attr = self.sort_column
+                fold = attr in ("title", "channel")
+                values = {item_id: getattr(self.videos[item_id], attr) for item_id in rows}
+                known = [item_id for item_id in rows if values[item_id] is not None]
+                # Unknown values (None) always go last, whatever the direction.
+                known.sort(key=(lambda item_id: values[item_id].casefold()) if fold else values.__getitem__,
+                           reverse=self.descending)
+                rows = known + [item_id for item_id in rows if values[item_id] is None]
+            self._orders[key] = rows
+        return rows
+
+    def view(self):
+        """IDs das linhas principais visíveis, filtradas e na ordem atual (calculado só quando algo muda)."""
+        if self._view is None:
+            rows = self._order()
+            self._view = [item_id for item_id in rows if self.matches(item_id)] if self.filtered else rows
+        return self._view
+
+    def main_count(self):
+        return len(self.videos) - len(self.parent)
+
+    def set_progress(self, url, text):
+        """Guarda o texto de progresso de uma URL e retorna o ID da linha (ou None)."""
+        item_id = self.url_to_item.get(url)
+        if item_id is not None:
+            self.progress[item_id] = text
+        return item_id
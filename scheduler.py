@@ -0,0 +1,120 @@
+import heapq
+
+from dedup import duration_seconds
+from utils import format_duration
+
+FIFO = "fifo"
+LONGEST_FIRST = "longest"
+SHORTEST_FIRST = "shortest"
+PRIORITY = "priority"
+POLICIES = (FIFO, LONGEST_FIRST, SHORTEST_FIRST, PRIORITY)
+
+POLICY_LABELS = {
+    FIFO: "ordem da lista",
+    LONGEST_FIRST: "mais longos primeiro",
+    SHORTEST_FIRST: "mais curtos primeiro",
+    PRIORITY: "prioridade",
+}
+
+# Typical bitrates (bits/s) of the streams YouTube serves; video bitrates include the audio track.
+AUDIO_BITRATE = 160_000
+VIDEO_BITRATES = {"360": 700_000, "720": 2_500_000, "1080": 4_500_000}
+BEST_VIDEO_BITRATE = 8_000_000  # No quality cap: often 1440p/4K
+# Per item overhead before the transfer starts (extraction, connection), in seconds.
+STARTUP_SECONDS = 2.0
+# ffmpeg encodes MP3 at roughly this many times real time; it runs after the transfer, off the download slot.
+MP3_ENCODE_SPEED = 100
+
+
+def estimate_bytes(duration, format, quality=None):
+    """Tamanho estimado do download (bytes) a partir da duração (segundos), do formato e da qualidade."""
+    if duration is None:
+        return None
+    if format in ("mp3", "audio"):
+        bitrate = AUDIO_BITRATE
+    else:
+        bitrate = VIDEO_BITRATES.get(str(quality), BEST_VIDEO_BITRATE) + AUDIO_BITRATE
+    return int(duration * bitrate / 8)
+
+
+def _durations(videos):
+    """Duração de cada vídeo; as desconhecidas valem a mediana das conhecidas."""
+    durations = [duration_seconds(video.get("duration")) for video in videos]
+    known = sorted(d for d in durations if d is not None)
+    fallback = known[len(known) // 2] if known else None
+    return [fallback if d is None else d for d in durations]
+
+
+def order_videos(videos, policy=FIFO, priorities=None):
+    """Ordena os vídeos (com "url" e "duration") para o download conforme a política.
+
+    ``longest`` põe os mais longos primeiro, o que encurta o tempo total do
+    lote (um vídeo de 2 h não fica para o fim, sozinho); ``shortest`` entrega
+    as primeiras faixas mais cedo. ``priority`` segue ``priorities`` (URL ->
+    número, maior primeiro) e, no empate, os mais longos primeiro. A ordem
+    original desempata tudo.
+    """
+    videos = list(videos)
+    if policy == FIFO or not videos:
+        return videos
+    if policy not in POLICIES:
+        raise ValueError(f"política de agendamento inválida: {policy!r} (use {', '.join(POLICIES)})")
+    durations = _durations(videos)
+    if durations[0] is None:
+        durations = [0] * len(videos)  # No duration known at all: only the priorities count
+    indexes = range(len(videos))
+    if policy == SHORTEST_FIRST:
+        order = sorted(indexes, key=lambda i: durations[i])
+    elif policy == LONGEST_FIRST:
+        order = sorted(indexes, key=lambda i: -durations[i])
+    else:
+        priorities = priorities or {}
+        order = sorted(indexes, key=lambda i: (-priorities.get(videos[i]["url"], 0), -durations[i]))
+    return [videos[i] for i in order]
+
+
+def project(videos, concurrency, format, quality=None, throughput=5_000_000):
+    """Projeta quando cada download deve terminar, na ordem dada.
+
+    Simula ``concurrency`` vagas dividindo ``throughput`` (bytes/s, a banda
+    total) igualmente: cada item ocupa uma vaga pelo tempo da transferência
+    e, em MP3, termina depois da conversão, já com a vaga livre (como no
+    pipeline). Retorna um dicionário com ``items`` (url, bytes, start e
+    finish em segundos desde o início do lote), ``bytes``, ``first`` e
+    ``makespan``.
+    """
+    concurrency = max(1, concurrency)
+    per_slot = max(1.0, throughput / concurrency)
+    durations = _durations(videos)
+    slots = [0.0] * concurrency
+    items = []
+    for video, duration in zip(videos, durations):
+        size = estimate_bytes(duration, format, quality)
+        start = heapq.heappop(slots)
+        transferred = start + STARTUP_SECONDS + (size or 0) / per_slot
+        heapq.heappush(slots, transferred)
+        finish = transferred + ((duration or 0) / MP3_ENCODE_SPEED if format == "mp3" else 0)
+        items.append({"url": video["url"], "bytes": size, "start": start, "finish": finish})
+    finishes = [item["finish"] for item in items]
+    return {
+        "items": items,
+        "bytes": sum(item["bytes"] or 0 for item in items),
+        "first": min(finishes) if finishes else 0.0,
+        "makespan": max(finishes) if finishes else 0.0,
+    }
+
+
+def plan_downloads(videos, concurrency, format, quality=None, policy=FIFO, throughput=5_000_000, priorities=None):
+    """Ordena os vídeos conforme ``policy`` e projeta os tempos de término (ver ``project``).
+
+    Retorna ``(vídeos_ordenados, projeção)``.
+    """
+    ordered = order_videos(videos, policy, priorities)
+    return ordered, project(ordered, concurrency, format, quality, throughput)
+
+
+def describe_plan(projection, policy, throughput):
+    """Resumo de uma linha da projeção, para o log."""
+    return (f"Plano ({POLICY_LABELS.get(policy, policy)}): {len(projection['items'])} item(ns), "
+            f"~{projection['bytes'] / 1_000_000:.0f} MB; primeiro pronto em ~{format_duration(projection['first'])}, "
+            f"lote completo em ~{format_duration(projection['makespan'])} (estimativa a {throughput / 1_000_000:.1f} MB/s).")
@@ -0,0 +1,140 @@
+import os
+import threading
+
+from chunked import ChunkedYoutubeDL
+from utils import get_chunk_connections
+
+
+def audio_options(outdir):
+    """Opções do yt-dlp para baixar o áudio e convertê-lo para MP3."""
+    return {
+        'format': 'bestaudio/best',
+        'postprocessors': [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'mp3',
+            'preferredquality': '192',
+        }],
+        'outtmpl': os.path.join(outdir, '%(title)s.%(ext)s'),
+        'noplaylist': True,
+        'logtostderr': False,
+        'quiet': True,
+        'no_warnings': True,
+    }
+
+
+def native_audio_options(outdir):
+    """Opções do yt-dlp para baixar o melhor áudio e mantê-lo no codec original (sem recodificar)."""
+    return {
+        'format': 'bestaudio/best',
+        'postprocessors': [{
+            # "best" keeps the source codec: the stream is only copied into an m4a/opus/ogg container.
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'best',
+        }],
+        'outtmpl': os.path.join(outdir, '%(title)s.%(ext)s'),
+        'noplaylist': True,
+        'logtostderr': False,
+        'quiet': True,
+        'no_warnings': True,
+    }
+
+
+def video_options(outdir, quality):
+    """Opções do yt-dlp para baixar o vídeo em MP4 na qualidade indicada."""
+    format_string = f"bestvideo[height<={quality}]+bestaudio/best[height<={quality}]" if quality else "bestvideo+bestaudio/best"
+    return {
+        'format': format_string,
+        'outtmpl': os.path.join(outdir, '%(title)s.%(ext)s'),
+        'noplaylist': True,
+        'logtostderr': False,
+        'quiet': True,
+        'no_warnings': True,
+        'merge_output_format': 'mp4',
+    }
+
+
+def raw_options(format, outdir, quality=None):
+    """Opções do yt-dlp para a etapa de rede do pipeline: baixa os fluxos originais, sem ffmpeg.
+
+    Vídeo e áudio separados são gravados como arquivos distintos
+    (``<título>.f<format_id>.<ext>``) para serem juntados depois na etapa de CPU.
+    """
+    if format in ('mp3', 'audio'):
+        format_string = 'bestaudio/best'
+    elif quality:
+        format_string = f"(bestvideo[height<=?{quality}],bestaudio)/best[height<=?{quality}]"
+    else:
+        format_string = "(bestvideo,bestaudio)/best"
+    return {
+        'format': format_string,
+        'outtmpl': os.path.join(outdir, '%(title)s.f%(format_id)s.%(ext)s'),
+        'noplaylist': True,
+        'logtostderr': False,
+        'quiet': True,
+        'noprogress': True,
+        'no_warnings': True,
+    }
+
+
+def profile_options(format, outdir, quality=None, raw=False):
+    """Retorna as opções do yt-dlp para um perfil de download (formato + qualidade)."""
+    if raw:
+        opts = raw_options(format, outdir, quality)
+    elif format == 'mp3':
+        opts = audio_options(outdir)
+    elif format == 'audio':
+        opts = native_audio_options(outdir)
+    else:
+        opts = video_options(outdir, quality)
+    # DASH/HLS streams are fetched several fragments at a time (direct files: see chunked.py).
+    opts['concurrent_fragment_downloads'] = get_chunk_connections()
+    return opts
+
+
+class SessionPool:
+    """Mantém um YoutubeDL de longa duração por thread e por perfil de download.
+
+    Reutilizar a instância preserva o pool de conexões HTTP, os cookies e o
+    estado dos extratores entre os itens de um lote. O progress hook de cada
+    download é definido por thread com ``set_progress_hook``. Com
+    ``connection_budget`` (um ``ConcurrencyLimiter``), os arquivos grandes
+    abrem conexões extras só quando há vagas livres nele.
+    """
+
+    def __init__(self, connection_budget=None):
+        self.connection_budget = connection_budget
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _dispatch_progress(self, d):
+        hook = getattr(self._local, "progress_hook", None)
+        if hook:
+            hook(d)
+
+    def set_progress_hook(self, hook):
+        """Define o progress hook dos próximos downloads da thread atual."""
+        self._local.progress_hook = hook
+
+    def get(self, format, outdir, quality=None, raw=False):
+        """Retorna o YoutubeDL da thread atual para o perfil, criando-o no primeiro uso."""
+        sessions = getattr(self._local, "sessions", None)
+        if sessions is None:
+            sessions = self._local.sessions = {}
+        key = (format, quality if format not in ('mp3', 'audio') else None, outdir, raw)
+        ydl = sessions.get(key)
+        if ydl is None:
+            opts = profile_options(format, outdir, quality, raw)
+            opts['progress_hooks'] = [self._dispatch_progress]
+            opts['connection_budget'] = self.connection_budget
+            ydl = sessions[key] = ChunkedYoutubeDL(opts)
+            with self._lock:
+                self._all.append(ydl)
+        return ydl
+
+    def close(self):
+        """Fecha todas as instâncias criadas pelo pool."""
+        with self._lock:
+            sessions, self._all = self._all, []
+        for ydl in sessions:
+            ydl.close()
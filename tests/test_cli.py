@@ -0,0 +1,47 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cli
+
+
+def _fake_search_many(artists, limit, min_views=0, use_cache=True, workers=None):
+    # Same contract as youtube_api.iter_search_many: names come back stripped.
+    for artist in dict.fromkeys(artist.strip() for artist in artists if artist.strip()):
+        yield artist, [{"videoId": f"{artist}-1", "title": f"{artist} song", "channelTitle": artist,
+                        "url": f"https://www.youtube.com/watch?v={artist}-1", "duration": 200, "views": 10}]
+
+
+class PaddedArtistTest(unittest.TestCase):
+    def run_cli(self, argv):
+        stdout = io.StringIO()
+        result = {"total": 1, "skipped": 0, "submitted": 1, "failed": 0, "bytes": 0, "stages": {}}
+        with tempfile.TemporaryDirectory() as outdir, \
+                mock.patch.object(cli, "iter_search_many", _fake_search_many), \
+                mock.patch.object(cli, "download_many", return_value=result) as download_many, \
+                mock.patch.object(sys, "stdout", stdout):
+            code = cli.main(argv + ["--outdir", outdir])
+        events = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        return code, events, download_many
+
+    def test_whitespace_padded_artist_is_downloaded(self):
+        code, events, download_many = self.run_cli([" Queen ", "Abba"])
+        self.assertEqual(code, 0)
+        self.assertEqual({event["artist"] for event in events if event["event"] == "search"}, {"Queen", "Abba"})
+        urls = list(download_many.call_args.args[0])
+        self.assertEqual(sorted(urls), ["https://www.youtube.com/watch?v=Abba-1", "https://www.youtube.com/watch?v=Queen-1"])
+
+    def test_priority_order_uses_entry_position_of_padded_artist(self):
+        _, _, download_many = self.run_cli(["  Queen", "Abba", "--order", "priority"])
+        urls = list(download_many.call_args.args[0])
+        self.assertEqual(urls[0], "https://www.youtube.com/watch?v=Queen-1")
+
+
+if __name__ == "__main__":
+    unittest.main()
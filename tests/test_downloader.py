@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import downloader
+from history import HistoryStore
+from jobqueue import DONE, DOWNLOADING, JobQueue
+
+
+class ResumeSkippedTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.outdir = os.path.join(self.tmp.name, "out")
+        os.makedirs(self.outdir)
+        self.history = HistoryStore(os.path.join(self.tmp.name, "history.db"),
+                                    legacy_path=os.path.join(self.tmp.name, "history.json"))
+        self.addCleanup(self.history.close)
+        patcher = mock.patch("archive.get_history_store", return_value=self.history)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.jobs = JobQueue(os.path.join(self.tmp.name, "jobs.db"))
+        self.addCleanup(self.jobs.close)
+
+    def test_resumed_job_already_downloaded_is_settled(self):
+        url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+        # The file is already in the output folder, but the run that queued it died mid-download.
+        open(os.path.join(self.outdir, "Song [dQw4w9WgXcQ].mp3"), "w").close()
+        job_id = self.jobs.enqueue([url], "mp3", None, self.outdir)[url]
+        self.jobs.mark(job_id, DOWNLOADING)
+        with self.jobs._conn:
+            self.jobs._conn.execute("UPDATE jobs SET lease_owner = NULL WHERE id = ?", (job_id,))
+        self.assertEqual(len(downloader.pending_jobs(self.jobs)), 1)
+
+        results = downloader.resume_pending(1, job_queue=self.jobs)
+
+        self.assertEqual((results[0]["skipped"], results[0]["submitted"]), (1, 0))
+        self.assertEqual(self.jobs.get(job_id)["state"], DONE)
+        self.assertEqual(downloader.pending_jobs(self.jobs), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
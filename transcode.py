@@ -0,0 +1,108 @@
+import os
+import re
+import shutil
+import subprocess
+
+
+class TranscodeError(Exception):
+    """Falha ao converter ou juntar arquivos com o ffmpeg."""
+
+
+# Audio codec (as reported by yt-dlp) -> container that holds it without re-encoding.
+_AUDIO_CONTAINERS = (("mp4a", "m4a"), ("aac", "m4a"), ("opus", "opus"), ("vorbis", "ogg"), ("mp3", "mp3"), ("flac", "flac"))
+_STREAM_RE = re.compile(r"Stream #\d+:\d+.*?: (Audio|Video): (\w+)")
+
+
+def _ffmpeg():
+    return shutil.which("ffmpeg") or "ffmpeg"
+
+
+def _temp_path(output):
+    base, ext = os.path.splitext(output)
+    return f"{base}.temp{ext}"
+
+
+def _run_ffmpeg(args, output):
+    """Executa o ffmpeg gravando em um arquivo temporário e o move para ``output`` ao final."""
+    temp = _temp_path(output)
+    command = [_ffmpeg(), "-y", "-hide_banner", "-loglevel", "error", *args, temp]
+    try:
+        process = subprocess.run(command, capture_output=True, text=True)
+    except FileNotFoundError:
+        raise TranscodeError("ffmpeg não encontrado. Certifique-se de que está instalado e no PATH.")
+    if process.returncode != 0:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise TranscodeError(process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"ffmpeg saiu com código {process.returncode}")
+    os.replace(temp, output)
+
+
+def extract_mp3(source, output, quality="192"):
+    """Converte o áudio de ``source`` para MP3."""
+    _run_ffmpeg(["-i", source, "-vn", "-codec:a", "libmp3lame", "-b:a", f"{quality}k"], output)
+
+
+def merge_streams(video, audio, output):
+    """Junta um fluxo de vídeo e um de áudio em um único arquivo, sem recodificar."""
+    _run_ffmpeg(["-i", video, "-i", audio, "-map", "0:v:0", "-map", "1:a:0", "-c", "copy", "-movflags", "+faststart"], output)
+
+
+def audio_container(codec, ext):
+    """Extensão do contêiner que guarda o codec de áudio sem recodificar (ex.: "mp4a.40.2" -> "m4a")."""
+    codec = (codec or "").lower()
+    for prefix, container in _AUDIO_CONTAINERS:
+        if codec.startswith(prefix):
+            return container
+    return ext
+
+
+def probe_streams(path):
+    """Retorna {"audio": codec, "video": codec} do primeiro fluxo de cada tipo, lidos do cabeçalho pelo ffmpeg."""
+    try:
+        process = subprocess.run([_ffmpeg(), "-hide_banner", "-i", path], capture_output=True, text=True)
+    except FileNotFoundError:
+        raise TranscodeError("ffmpeg não encontrado. Certifique-se de que está instalado e no PATH.")
+    streams = {}
+    for kind, codec in _STREAM_RE.findall(process.stderr):
+        streams.setdefault(kind.lower(), codec)
+    return streams
+
+
+def copy_audio(source, output):
+    """Copia o fluxo de áudio de ``source`` para o contêiner de ``output``, sem recodificar."""
+    args = ["-i", source, "-vn", "-c:a", "copy"]
+    if output.endswith(".m4a"):
+        args += ["-movflags", "+faststart"]
+    _run_ffmpeg(args, output)
+
+
+def remux(source, output):
+    """Troca o contêiner de ``source`` sem recodificar."""
+    _run_ffmpeg(["-i", source, "-c", "copy", "-movflags", "+faststart"], output)
+
+
+def run_job(job):
+    """Executa um trabalho de conversão (executado nos processos da etapa de CPU).
+
+    ``job`` é um dicionário com ``kind`` ("mp3", "audio", "merge", "remux" ou "move"),
+    ``inputs`` (arquivos baixados) e ``output`` (arquivo final). Os arquivos de
+    entrada são apagados após o sucesso. Retorna o caminho do arquivo final.
+    """
+    kind, inputs, output = job["kind"], job["inputs"], job["output"]
+    if kind == "mp3":
+        extract_mp3(inputs[0], output, job.get("quality", "192"))
+    elif kind == "audio":
+        copy_audio(inputs[0], output)
+    elif kind == "merge":
+        merge_streams(inputs[0], inputs[1], output)
+    elif kind == "remux":
+        remux(inputs[0], output)
+    elif kind == "move":
+        os.replace(inputs[0], output)
+        return output
+    else:
+        raise TranscodeError(f"Tipo de conversão desconhecido: {kind}")
+    for path in inputs:
+        if os.path.exists(path) and os.path.abspath(path) != os.path.abspath(output):
+            os.remove(path)
+    return output
@@ -1,6 +1,8 @@
 import os
 from dotenv import load_dotenv
+import datetime
 import json
+import re
 
 CONFIG_FILE = "config.json"
 
@@ -13,9 +15,90 @@ def get_download_dir():
 def get_max_concurrency():
     return int(os.getenv("MAX_CONCURRENCY", 3))
 
+def get_adaptive_concurrency():
+    return os.getenv("ADAPTIVE_CONCURRENCY", "0").lower() in ("1", "true", "yes", "sim")
+
+def get_concurrency_bounds():
+    return int(os.getenv("MIN_CONCURRENCY", 1)), int(os.getenv("MAX_ADAPTIVE_CONCURRENCY", 16))
+
+def get_chunked_min_size():
+    return int(float(os.getenv("CHUNKED_MIN_SIZE_MB", 20)) * 1024 * 1024)
+
+def get_chunk_connections():
+    return int(os.getenv("CHUNK_CONNECTIONS", 4))
+
+def get_worker_processes():
+    return int(os.getenv("WORKER_PROCESSES", os.cpu_count() or 1))
+
+def get_worker_concurrency():
+    return int(os.getenv("WORKER_CONCURRENCY", 2))
+
+def get_lease_timeout():
+    return float(os.getenv("WORKER_LEASE_TIMEOUT", 300))
+
+def get_info_cache_ttl():
+    return int(os.getenv("INFO_CACHE_TTL", 3600))
+
+def get_info_prefetch():
+    return int(os.getenv("INFO_PREFETCH", 2))
+
+def get_download_order():
+    return os.getenv("DOWNLOAD_ORDER", "fifo").lower()
+
+def get_expected_throughput():
+    return os.getenv("EXPECTED_THROUGHPUT", "5M")
+
+def get_transcode_workers():
+    return int(os.getenv("TRANSCODE_WORKERS", os.cpu_count() or 1))
+
+def get_cache_dir():
+    return os.getenv("CACHE_DIR", ".cache")
+
+def get_search_cache_ttl():
+    return int(os.getenv("SEARCH_CACHE_TTL", 6 * 3600))
+
+def get_search_concurrency():
+    return int(os.getenv("SEARCH_CONCURRENCY", 4))
+
+def get_daily_quota():
+    return int(os.getenv("YOUTUBE_DAILY_QUOTA", 10000))
+
+def get_quota_fallback():
+    return os.getenv("QUOTA_FALLBACK", "1").lower() in ("1", "true", "yes", "sim")
+
+def get_dedup_tolerance():
+    return int(os.getenv("DEDUP_DURATION_TOLERANCE", 5))
+
+def get_metrics_port():
+    return int(os.getenv("METRICS_PORT", 0))
+
+def get_metrics_file():
+    return os.getenv("METRICS_FILE") or None
+
+def get_bandwidth_limit():
+    return os.getenv("BANDWIDTH_LIMIT", "0")
+
+def get_bandwidth_burst():
+    return os.getenv("BANDWIDTH_BURST", "")
+
+def get_bandwidth_schedule():
+    return os.getenv("BANDWIDTH_SCHEDULE", "")
+
 def truncate_title(title, length=50):
     return title if len(title) <= length else title[:length] + "..."
 
+def format_duration(seconds):
+    """Formata uma duração em segundos como M:SS ou H:MM:SS ("N/A" se desconhecida)."""
+    if seconds is None:
+        return "N/A"
+    hours, rest = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+def format_views(views):
+    """Formata o número de visualizações com separador de milhar ("N/A" se desconhecido)."""
+    return f"{views:,}" if isinstance(views, int) else "N/A"
+
 def load_config():
     if os.path.exists(CONFIG_FILE):
         with open(CONFIG_FILE, "r", encoding="utf-8") as f:
@@ -30,3 +113,30 @@ def save_config(config):
         json.dump(config, f, indent=4, ensure_ascii=False)
 
 
+
+_VIDEO_ID_RE = re.compile(r"(?:v=|youtu\.be/|shorts/|embed/)([0-9A-Za-z_-]{11})")
+
+def extract_video_id(url):
+    """Extrai o ID do vídeo de uma URL do YouTube, sem acessar a rede."""
+    if not url:
+        return None
+    match = _VIDEO_ID_RE.search(url)
+    return match.group(1) if match else None
+
+_COLLECTION_RE = re.compile(r"[?&]list=|/playlist\b|/channel/|/c/|/user/|youtube\.com/@|/(videos|shorts|streams|releases)/?$")
+_CHANNEL_RE = re.compile(r"/channel/|/c/|/user/|youtube\.com/@")
+
+def is_collection_url(url):
+    """Indica se a URL aponta para uma playlist ou canal (e não para um único vídeo)."""
+    return bool(_COLLECTION_RE.search(url or ""))
+
+def is_channel_url(url):
+    return bool(_CHANNEL_RE.search(url or ""))
+
+def parse_date(text):
+    """Converte AAAA-MM-DD ou AAAAMMDD para o formato AAAAMMDD usado pelo yt-dlp (None se vazio)."""
+    if not text or not text.strip():
+        return None
+    digits = text.strip().replace("-", "").replace("/", "")
+    datetime.datetime.strptime(digits, "%Y%m%d") # Raises ValueError for invalid dates
+    return digits
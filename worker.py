@@ -0,0 +1,291 @@
+"""Modo worker: processos que consomem a fila de downloads compartilhada (jobs.db).
+
+Exemplos:
+    python cli.py --enqueue --file artistas.txt --format mp4   # coordenador: só enfileira
+    python worker.py --processes 4
+    python worker.py --jobs-db /mnt/nas/jobs.db --processes 8 --exit-when-idle
+    python worker.py --status
+
+Cada processo reserva trabalhos da fila (``JobQueue.lease``), baixa-os com o
+pipeline de sempre e grava o resultado de volta na fila. As reservas são
+renovadas periodicamente; se um processo ou máquina cai, os trabalhos dele
+voltam a ficar disponíveis quando a reserva expira. Trabalhos de busca e de
+playlist são expandidos em trabalhos de download pelo próprio worker.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+from utils import load_environment, extract_video_id, get_lease_timeout, get_worker_concurrency, get_worker_processes
+
+load_environment()
+
+from archive import DownloadArchive, format_key
+from history import HISTORY_DB, HistoryStore, get_history_store
+from jobqueue import DEFAULT_POOL, DOWNLOAD_JOB, JOBS_DB, SEARCH_JOB, TRANSCODING, JobQueue
+from metrics import metrics
+
+
+class Worker:
+    """Consome os trabalhos de ``pool`` até ser parado (ou até a fila esvaziar, com ``exit_when_idle``).
+
+    Os downloads reservados de um mesmo perfil (formato, qualidade e pasta)
+    passam por um ``DownloadPipeline``; um trabalho só é reservado quando há
+    vaga para ele, então os demais continuam disponíveis para outros workers.
+    Quando aparecem trabalhos de outro perfil, o pipeline atual termina os
+    que já reservou e o worker passa para o próximo.
+
+    O histórico de cada pasta de saída fica nela mesma (``history.db``),
+    e não no ``DOWNLOAD_DIR`` do processo worker.
+    """
+
+    def __init__(self, jobs, pool=DEFAULT_POOL, concurrency=2, cpu_workers=1, visibility=None, poll_interval=2.0,
+                 exit_when_idle=False, log_cb=None):
+        self.jobs = jobs
+        self.pool = pool
+        self.concurrency = max(1, concurrency)
+        self.cpu_workers = max(1, cpu_workers)
+        self.visibility = visibility or get_lease_timeout()
+        self.poll_interval = poll_interval
+        self.exit_when_idle = exit_when_idle
+        self.log_cb = log_cb
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        # Downloads in flight, counting both stages so the network stage keeps working while ffmpeg runs.
+        self._slots = threading.Semaphore(self.concurrency + self.cpu_workers)
+        self._in_flight = 0
+        self._job_ids = {}
+        self._results = {}
+        self._lock = threading.Lock()
+        self._archive = None
+        self._histories = {}
+        self._profile = None
+        self._stop = threading.Event()
+
+    def _log(self, message):
+        if self.log_cb: self.log_cb(f"[{self.owner}] {message}")
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.visibility / 3):
+            try:
+                self.jobs.heartbeat(self.owner, self.visibility)
+            except Exception as e:
+                self._log(f"Erro ao renovar as reservas: {e}")
+
+    def _expand(self, job):
+        """Executa um trabalho de busca ou de playlist, enfileirando os vídeos encontrados."""
+        options = json.loads(job["options"] or "{}")
+        try:
+            if job["kind"] == SEARCH_JOB:
+                from youtube_api import search_videos
+                from dedup import collapse_duplicates
+                videos = search_videos(job["url"], options.get("limit", 20), options.get("min_views", 0))
+                if options.get("dedupe", True):
+                    videos = collapse_duplicates(videos, job["url"])
+            else:
+                from playlist import iter_playlist_videos
+                videos = list(iter_playlist_videos(job["url"], limit=options.get("max_items"),
+                                                   min_views=options.get("min_views", 0),
+                                                   date_after=options.get("date_after"),
+                                                   date_before=options.get("date_before"),
+                                                   start=options.get("start", 1), log_cb=self._log))
+            ids = self.jobs.enqueue([video["url"] for video in videos], job["format"], job["quality"], job["outdir"],
+                                    pool=self.pool)
+            self.jobs.complete(job["id"], {"videos": len(ids), "worker": self.owner})
+            self._log(f"{job['kind'].capitalize()} \"{job['url']}\": {len(ids)} vídeo(s) enfileirado(s).")
+        except Exception as e:
+            self.jobs.fail(job["id"], e)
+            self._log(f"Erro ao processar {job['kind']} \"{job['url']}\": {e}")
+
+    def _skip_downloaded(self, job):
+        """Conclui sem baixar um trabalho cujo vídeo já está na pasta de saída."""
+        key = format_key(job["format"], job["quality"])
+        if self._archive is None or not self._archive.contains(extract_video_id(job["url"]), key):
+            return False
+        metrics.inc("skipped_total", format=key)
+        self.jobs.complete(job["id"], {"skipped": True, "worker": self.owner})
+        return True
+
+    def _next(self, profile=None):
+        """Espera uma vaga e reserva o próximo download; None quando o pipeline atual deve terminar."""
+        self._slots.acquire()
+        while not self._stop.is_set():
+            job = self.jobs.lease(self.owner, self.pool, self.visibility, profile)
+            if job is None:
+                with self._lock:
+                    idle = self._in_flight == 0
+                if profile is not None and self.jobs.ready(self.pool):
+                    break  # Only other profiles are waiting: drain this pipeline and switch
+                if self.exit_when_idle and idle and not self.jobs.unfinished(self.pool):
+                    break
+                self._stop.wait(self.poll_interval)
+                continue
+            if job["kind"] != DOWNLOAD_JOB:
+                self._expand(job)
+                continue
+            if profile is not None and self._skip_downloaded(job):
+                continue
+            with self._lock:
+                self._in_flight += 1
+                self._job_ids[job["url"]] = job["id"]
+            return job
+        self._slots.release()
+        return None
+
+    def _feed(self, job, profile):
+        """Gera as URLs do perfil para o pipeline, reservando cada trabalho só quando há vaga."""
+        while job is not None:
+            yield job["url"]
+            job = self._next(profile)
+
+    def _item_done(self, url, ok, error=None):
+        with self._lock:
+            job_id = self._job_ids.pop(url)
+            result = self._results.pop(url, None)
+        if ok:
+            self.jobs.complete(job_id, {**(result or {}), "worker": self.owner})
+        elif self.jobs.fail(job_id, error):
+            metrics.inc("retries_total", format=format_key(*self._profile[:2]))
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _result(self, url, entry):
+        with self._lock:
+            self._results[url] = entry
+
+    def _state(self, url, state):
+        # The lease already moved the job to "downloading" and counted the attempt.
+        if state == TRANSCODING:
+            self.jobs.mark(self._job_ids[url], state)
+
+    def _history(self, outdir):
+        """Histórico da pasta de saída; o global quando ela é o próprio ``DOWNLOAD_DIR``."""
+        path = os.path.join(outdir, "history.db")
+        if os.path.abspath(path) == os.path.abspath(HISTORY_DB):
+            return get_history_store()
+        if path not in self._histories:
+            self._histories[path] = HistoryStore(path, legacy_path=os.path.join(outdir, "history.json"))
+        return self._histories[path]
+
+    def _run_profile(self, job):
+        from pipeline import DownloadPipeline
+        self._profile = (job["format"], job["quality"], job["outdir"])
+        history = self._history(job["outdir"])
+        self._archive = DownloadArchive(job["outdir"], history)
+        if self._skip_downloaded(job):
+            with self._lock:
+                self._in_flight -= 1
+                self._job_ids.pop(job["url"], None)
+            self._slots.release()
+            return
+        self._log(f"Baixando em {format_key(job['format'], job['quality'])} para {job['outdir']}...")
+        pipeline = DownloadPipeline(job["format"], job["outdir"], job["quality"], io_workers=self.concurrency,
+                                    cpu_workers=self.cpu_workers, log_cb=self._log, item_cb=self._item_done,
+                                    state_cb=self._state, result_cb=self._result, history_store=history)
+        pipeline.run(self._feed(job, self._profile))
+
+    def run(self):
+        """Processa trabalhos até ``stop`` (ou até não haver mais nada pendente, com ``exit_when_idle``)."""
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="worker-heartbeat", daemon=True)
+        heartbeat.start()
+        self._log(f"Worker iniciado (pool {self.pool}, {self.concurrency} download(s) simultâneo(s)).")
+        try:
+            while True:
+                job = self._next()
+                if job is None:
+                    break
+                self._run_profile(job)
+        finally:
+            self._stop.set()
+            released = self.jobs.release(self.owner)
+            if released:
+                self._log(f"{released} trabalho(s) devolvido(s) à fila.")
+            for history in self._histories.values():
+                history.close()
+        self._log("Worker encerrado.")
+
+    def stop(self):
+        self._stop.set()
+
+
+def _log_stderr(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def _worker_main(db_path, journal_mode, options):
+    """Ponto de entrada de cada processo worker."""
+    load_environment()
+    jobs = JobQueue(db_path, max_attempts=int(os.getenv("MAX_ATTEMPTS", 3)), journal_mode=journal_mode)
+    worker = Worker(jobs, log_cb=_log_stderr, **options)
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        jobs.close()
+
+
+def run_workers(processes, db_path=JOBS_DB, journal_mode="WAL", **options):
+    """Inicia ``processes`` workers nesta máquina e espera todos terminarem."""
+    if processes <= 1:
+        _worker_main(db_path, journal_mode, options)
+        return
+    context = multiprocessing.get_context("spawn")
+    children = [context.Process(target=_worker_main, args=(db_path, journal_mode, options), name=f"worker-{i}")
+                for i in range(processes)]
+    for child in children:
+        child.start()
+    try:
+        for child in children:
+            child.join()
+    except KeyboardInterrupt:
+        # The children got the same Ctrl+C and hand their leases back before exiting.
+        for child in children:
+            child.join()
+
+
+def print_status(jobs, pool):
+    """Mostra, em JSON, os trabalhos de ``pool`` por estado e os workers com reservas ativas."""
+    now = time.time()
+    workers = {owner: {"jobs": count, "lease_seconds_left": round(expires - now, 1)}
+               for owner, (count, expires) in jobs.leases(pool).items()}
+    print(json.dumps({"pool": pool, "states": jobs.counts(pool), "workers": workers}, ensure_ascii=False, indent=2))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Processa a fila de downloads compartilhada (modo worker).")
+    parser.add_argument("--processes", type=int, default=None, help="processos worker nesta máquina (padrão: WORKER_PROCESSES)")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="downloads simultâneos por processo (padrão: WORKER_CONCURRENCY)")
+    parser.add_argument("--cpu-workers", type=int, default=1, help="conversões simultâneas por processo (padrão: 1)")
+    parser.add_argument("--pool", default=DEFAULT_POOL, help=f"fila de trabalhos a consumir (padrão: {DEFAULT_POOL})")
+    parser.add_argument("--jobs-db", default=None, help="arquivo da fila compartilhada (padrão: JOBS_DB)")
+    parser.add_argument("--lease-timeout", type=float, default=None,
+                        help="segundos sem renovação até um trabalho voltar para a fila (padrão: WORKER_LEASE_TIMEOUT)")
+    parser.add_argument("--exit-when-idle", action="store_true", help="encerra quando não houver mais trabalhos pendentes")
+    parser.add_argument("--status", action="store_true", help="mostra o estado da fila e dos workers e sai")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    journal_mode = os.getenv("JOBS_JOURNAL_MODE", "WAL")
+    db_path = args.jobs_db or JOBS_DB
+    if args.status:
+        jobs = JobQueue(db_path, journal_mode=journal_mode)
+        print_status(jobs, args.pool)
+        jobs.close()
+        return 0
+    run_workers(args.processes or get_worker_processes(), db_path, journal_mode,
+                pool=args.pool, concurrency=args.concurrency or get_worker_concurrency(), cpu_workers=args.cpu_workers,
+                visibility=args.lease_timeout, exit_when_idle=args.exit_when_idle)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,86 @@
 import os
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from utils import load_environment
+from utils import load_environment, get_cache_dir, get_search_cache_ttl, get_daily_quota, get_quota_fallback, get_search_concurrency
+from cache import TTLCache, make_key
+from metrics import metrics
+from quota import QuotaExceeded, QuotaTracker
 import re
-import subprocess
-import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import httplib2
+import yt_dlp
 
 load_environment()
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
-def get_video_details(youtube, video_ids):
-    """Obtém detalhes (duração e visualizações) para uma lista de IDs de vídeo."""
+# The Data API returns at most 50 items per search page or videos().list call.
+MAX_PAGE_SIZE = 50
+API_WORKERS = 4
+
+_local = threading.local()
+_client = None
+_client_lock = threading.Lock()
+
+_CACHE_FILE = os.path.join(get_cache_dir(), "youtube_api.sqlite")
+search_cache = TTLCache(_CACHE_FILE, "search", ttl=get_search_cache_ttl(), max_entries=256)
+details_cache = TTLCache(_CACHE_FILE, "details", ttl=get_search_cache_ttl(), max_entries=4096)
+quota = QuotaTracker(_CACHE_FILE, get_daily_quota())
+
+def cache_stats():
+    """Retorna os contadores de acertos/falhas dos caches de busca e de detalhes."""
+    return {"search": search_cache.stats(), "details": details_cache.stats()}
+
+def invalidate_cache():
+    """Descarta todas as buscas e detalhes de vídeo em cache."""
+    search_cache.invalidate()
+    details_cache.invalidate()
+
+def get_youtube_client():
+    """Retorna o cliente da YouTube Data API, construído uma única vez por processo.
+
+    O cliente é montado a partir do documento de descoberta embutido na
+    biblioteca (``static_discovery``), sem buscá-lo na rede. As requisições
+    são executadas com ``_execute``, então o mesmo cliente pode ser usado por
+    várias threads.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            # The discovery module is slow to import and unused when only yt-dlp searches run.
+            from googleapiclient.discovery import build
+            _client = build("youtube", "v3", developerKey=YOUTUBE_API_KEY, static_discovery=True, cache_discovery=False)
+        return _client
+
+def _thread_http():
+    """Retorna um cliente HTTP exclusivo da thread atual (httplib2 não é thread-safe)."""
+    http = getattr(_local, "http", None)
+    if http is None:
+        http = _local.http = httplib2.Http(timeout=30)
+    return http
+
+def _execute(request):
+    """Executa uma requisição da API com o cliente HTTP da thread atual."""
+    try:
+        return request.execute(http=_thread_http())
+    except HttpError as e:
+        if e.resp.status == 403 and b"quotaExceeded" in (e.content or b""):
+            # The project's real quota ran out before our budget did; stop calling the API today.
+            quota.exhaust()
+            raise QuotaExceeded("a API informou que a cota diária do projeto acabou") from e
+        raise
+
+def _fetch_details_batch(youtube, video_ids):
+    """Consulta videos().list para um lote de até 50 IDs."""
     details = {}
-    if not video_ids:
-        return details
     try:
-        response = youtube.videos().list(
-            part="contentDetails,statistics",
-            id=",".join(video_ids)
-        ).execute()
+        metrics.inc("api_requests_total", endpoint="videos")
+        with metrics.span("api_video_details", item=f"{len(video_ids)} ids"):
+            response = _execute(youtube.videos().list(
+                part="contentDetails,statistics",
+                id=",".join(video_ids),
+                maxResults=len(video_ids)
+            ))
         for item in response.get("items", []):
             video_id = item["id"]
             duration = item["contentDetails"]["duration"]
@@ -27,14 +89,46 @@ def get_video_details(youtube, video_ids):
                 "duration": duration,
                 "views": views
             }
+            details_cache.set(video_id, details[video_id])
+    except QuotaExceeded:
+        raise
     except HttpError as e:
         print(f"Erro HTTP ao obter detalhes do vídeo: {e.resp.status} - {e.content}")
     except Exception as e:
         print(f"Erro inesperado ao obter detalhes do vídeo: {e}")
     return details
 
-def parse_duration(duration_str):
-    """Converte a duração do formato ISO 8601 para um formato legível (H:MM:SS ou MM:SS)."""
+def get_video_details(youtube, video_ids, use_cache=True):
+    """Obtém detalhes (duração e visualizações) para uma lista de IDs de vídeo.
+
+    Os detalhes ficam em cache por ID, então IDs repetidos entre buscas
+    diferentes não são consultados de novo na API. IDs não encontrados no
+    cache são consultados em lotes de 50 (o máximo da API), em paralelo.
+    """
+    details = {}
+    if not video_ids:
+        return details
+    missing = []
+    for video_id in dict.fromkeys(video_ids):
+        cached = details_cache.get(video_id) if use_cache else None
+        if cached is not None:
+            details[video_id] = cached
+        else:
+            missing.append(video_id)
+    if not missing:
+        return details
+    batches = [missing[i:i + MAX_PAGE_SIZE] for i in range(0, len(missing), MAX_PAGE_SIZE)]
+    quota.reserve("videos", len(batches))
+    if len(batches) == 1:
+        details.update(_fetch_details_batch(youtube, batches[0]))
+        return details
+    with ThreadPoolExecutor(max_workers=min(API_WORKERS, len(batches))) as executor:
+        for batch_details in executor.map(lambda batch: _fetch_details_batch(youtube, batch), batches):
+            details.update(batch_details)
+    return details
+
+def iso_duration_seconds(duration_str):
+    """Converte a duração do formato ISO 8601 (ex.: "PT4M13S") em segundos."""
     hours = 0
     minutes = 0
     seconds = 0
@@ -46,145 +140,242 @@ def parse_duration(duration_str):
     if 'S' in duration_str:
         seconds = int(re.search(r'(\d+)S', duration_str).group(1))
         
-    total_seconds = hours * 3600 + minutes * 60 + seconds
-    
-    if total_seconds < 60:
-        return f"0:{seconds:02d}"
-    elif total_seconds < 3600:
-        return f"{minutes}:{seconds:02d}"
-    else:
-        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return hours * 3600 + minutes * 60 + seconds
 
-def search_videos_yt_dlp(query, limit):
-    """Realiza a busca de vídeos usando yt-dlp como fallback."""
+def iter_search_videos_yt_dlp(query, limit):
+    """Busca vídeos com a biblioteca yt-dlp no próprio processo, entregando cada resultado assim que é lido."""
+    ydl_opts = {
+        'extract_flat': 'in_playlist',
+        'skip_download': True,
+        'logtostderr': False,
+        'quiet': True,
+        'no_warnings': True,
+    }
+    # Only the time spent producing results counts, not the time the caller holds each one.
+    busy = 0.0
+    resumed = time.perf_counter()
+    error = None
     try:
-        command = ["yt-dlp", "--flat-playlist", "--dump-json", f"ytsearch{limit}:{query}"]
-        process = subprocess.run(command, capture_output=True, text=True, check=True)
-        
-        results = []
-        for line in process.stdout.splitlines():
-            try:
-                data = json.loads(line)
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            # process=False keeps "entries" as the extractor's lazy generator, so each
+            # result page is parsed and yielded before the next one is requested.
+            result = ydl.extract_info(f"ytsearch{limit}:{query}", download=False, process=False)
+            for data in result.get("entries") or []:
                 # Filter out non-video items if any, and ensure basic info is present
-                if data.get("_type") == "video" and data.get("id"):
-                    results.append({
-                        "title": data.get("title", "N/A"),
-                        "url": data.get("webpage_url", f"https://www.youtube.com/watch?v={data["id"]}"),
-                        "channelTitle": data.get("channel", "N/A"),
-                        "videoId": data["id"],
-                        "duration": str(data.get("duration", "N/A")), # Duration in seconds
-                        "views": str(data.get("view_count", "N/A")) # Views as string
-                    })
-            except json.JSONDecodeError as e:
-                print(f"Erro ao decodificar JSON do yt-dlp: {e}")
-                continue
-        return results
-    except subprocess.CalledProcessError as e:
-        print(f"A busca com yt-dlp falhou: {e.stderr}")
-        return []
-    except FileNotFoundError:
-        print("yt-dlp não encontrado. Certifique-se de que está instalado e no PATH.")
-        return []
+                if data.get("_type") not in ("url", "video") or not data.get("id"):
+                    continue
+                busy += time.perf_counter() - resumed
+                yield {
+                    "title": data.get("title") or "N/A",
+                    "url": data.get("webpage_url") or f"https://www.youtube.com/watch?v={data["id"]}",
+                    "channelTitle": data.get("channel") or data.get("uploader") or "N/A",
+                    "videoId": data["id"],
+                    "duration": int(data["duration"]) if data.get("duration") else None, # Seconds
+                    "views": data.get("view_count") # int, or None if unknown
+                }
+                resumed = time.perf_counter()
+        busy += time.perf_counter() - resumed
+    except (yt_dlp.utils.DownloadError, yt_dlp.utils.ExtractorError) as e:
+        error = e
+        print(f"A busca com yt-dlp falhou: {e}")
     except Exception as e:
+        error = e
         print(f"Ocorreu um erro inesperado durante a busca com yt-dlp: {e}")
-        return []
+    finally:
+        # Also runs when the caller stops iterating early.
+        metrics.record_span("ytdlp_search", busy, item=query, ok=error is None, error=error)
 
-def search_videos(artist: str, limit: int, min_views: int = 0) -> list[dict]:
-    """Busca vídeos do YouTube com base no artista e filtros."""
+def search_videos_yt_dlp(query, limit):
+    """Realiza a busca de vídeos usando yt-dlp como fallback."""
+    return list(iter_search_videos_yt_dlp(query, limit))
+
+def _iter_yt_dlp_filtered(artist, limit, min_views):
+    """Busca com yt-dlp e aplica o filtro de views mínimas, item a item."""
+    for video in iter_search_videos_yt_dlp(artist, limit):
+        if video["views"] is None:
+            continue
+        if video["views"] >= min_views:
+            yield video
+
+def _search_page(youtube, query, page_size, category, page_token=None, use_cache=True):
+    """Executa um search().list, reaproveitando a página em cache quando possível.
+
+    Retorna os itens da página e o token da próxima página (ou None).
+    """
+    key = make_key(query, page_size, category, page_token)
+    if use_cache:
+        page = search_cache.get(key)
+        if page is not None:
+            metrics.inc("api_cache_total", cache="search", result="hit")
+            return page["items"], page.get("nextPageToken")
+        metrics.inc("api_cache_total", cache="search", result="miss")
+    request_args = dict(
+        q=query,
+        part="id,snippet",
+        maxResults=page_size,
+        type="video",
+        videoCategoryId=category
+    )
+    if page_token:
+        request_args["pageToken"] = page_token
+    quota.reserve("search")
+    metrics.inc("api_requests_total", endpoint="search")
+    with metrics.span("api_search", item=query):
+        search_response = _execute(youtube.search().list(**request_args))
+    page = {"items": search_response.get("items", []), "nextPageToken": search_response.get("nextPageToken")}
+    search_cache.set(key, page)
+    return page["items"], page["nextPageToken"]
+
+def _search_all_pages(youtube, query, limit, category, use_cache=True):
+    """Segue o nextPageToken até reunir ``limit`` vídeos ou acabarem os resultados."""
+    items = []
+    page_token = None
+    while len(items) < limit:
+        page_size = min(MAX_PAGE_SIZE, limit - len(items))
+        page_items, page_token = _search_page(youtube, query, page_size, category, page_token, use_cache)
+        items.extend(item for item in page_items if "videoId" in item["id"])
+        if not page_token or not page_items:
+            break
+    return items[:limit]
+
+def iter_search_videos(artist: str, limit: int, min_views: int = 0, use_cache: bool = True):
+    """Busca vídeos do YouTube com base no artista e filtros, entregando os resultados à medida que ficam prontos.
+
+    Com ``use_cache=False`` a API é sempre consultada (o resultado ainda
+    atualiza o cache).
+    """
     if not YOUTUBE_API_KEY:
         print("Chave da API do YouTube não configurada. Usando yt-dlp como fallback.")
-        yt_dlp_results = search_videos_yt_dlp(artist, limit)
-        for video in yt_dlp_results:
-            if video["views"] != "N/A":
-                video["views"] = int(video["views"])
-        filtered_yt_dlp_results = [v for v in yt_dlp_results if v["views"] != "N/A" and v["views"] >= min_views]
-        return filtered_yt_dlp_results
+        yield from _iter_yt_dlp_filtered(artist, limit, min_views)
+        return
 
-    youtube = build("youtube", "v3", developerKey=YOUTUBE_API_KEY)
-    all_results = []
+    try:
+        results = _search_videos_api(artist, limit, min_views, use_cache)
+    except QuotaExceeded as e:
+        if not get_quota_fallback():
+            print(f"Busca por '{artist}' interrompida: {e}.")
+            return
+        print(f"{e}. Usando yt-dlp como fallback.")
+        yield from _iter_yt_dlp_filtered(artist, limit, min_views)
+        return
+    if results is None:
+        print("YouTube API search failed. Tentando fallback com yt-dlp.")
+        yield from _iter_yt_dlp_filtered(artist, limit, min_views)
+        return
+    yield from results
 
-    # Try searching with \'music\' appended first
+def search_videos(artist: str, limit: int, min_views: int = 0, use_cache: bool = True) -> list[dict]:
+    """Busca vídeos do YouTube com base no artista e filtros."""
+    return list(iter_search_videos(artist, limit, min_views, use_cache))
+
+def search_many(artists, limit, min_views=0, use_cache=True, workers=None):
+    """Busca vários artistas em paralelo e retorna {artista: vídeos}, na ordem em que foram informados."""
+    found = dict(iter_search_many(artists, limit, min_views, use_cache, workers))
+    return {artist: found[artist] for artist in dict.fromkeys(artists) if artist in found}
+
+def iter_search_many(artists, limit, min_views=0, use_cache=True, workers=None):
+    """Busca vários artistas com no máximo ``workers`` buscas simultâneas (padrão: SEARCH_CONCURRENCY).
+
+    Entrega ``(artista, vídeos)`` assim que a busca de cada artista termina,
+    sem repetir vídeos já entregues para outro artista. Cada chamada à API
+    passa pelo controle de cota (``quota``); quando o orçamento diário acaba,
+    as buscas seguintes usam o yt-dlp (ou param, com QUOTA_FALLBACK=0).
+    """
+    artists = list(dict.fromkeys(artist.strip() for artist in artists if artist.strip()))
+    if not artists:
+        return
+    seen = set()
+    executor = ThreadPoolExecutor(max_workers=max(1, min(workers or get_search_concurrency(), len(artists))))
+    try:
+        futures = {executor.submit(search_videos, artist, limit, min_views, use_cache): artist for artist in artists}
+        for future in as_completed(futures):
+            artist = futures[future]
+            try:
+                videos = future.result()
+            except Exception as e:
+                print(f"Ocorreu um erro inesperado ao buscar '{artist}': {e}")
+                videos = []
+            unique = [video for video in videos if video["videoId"] not in seen]
+            seen.update(video["videoId"] for video in unique)
+            yield artist, unique
+    finally:
+        # Searches not started yet are dropped if the caller stops early.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _search_videos_api(artist, limit, min_views, use_cache):
+    """Busca pela YouTube Data API. Retorna None se a API falhar e o fallback for necessário.
+
+    Levanta ``QuotaExceeded`` quando a cota diária não permite completar a busca.
+
+    As variações da consulta ("artista music" e "artista") rodam em paralelo
+    e os resultados são combinados, sem repetir vídeos, na ordem das variações.
+    """
+    youtube = get_youtube_client()
     queries = [f"{artist} music", artist]
 
+    items_by_query = {}
+    failed = 0
+    quota_error = None
+    with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+        futures = {query: executor.submit(_search_all_pages, youtube, query, limit, "10", use_cache) for query in queries} # Music category
+        for query, future in futures.items():
+            try:
+                items_by_query[query] = future.result()
+            except QuotaExceeded as e:
+                quota_error = e
+                failed += 1
+            except HttpError as e:
+                print(f"Erro HTTP ao buscar vídeos: {e.resp.status} - {e.content}")
+                failed += 1
+            except Exception as e:
+                print(f"Ocorreu um erro inesperado: {e}")
+                return []
+    if failed == len(queries):
+        if quota_error:
+            raise quota_error
+        return None
+
+    # Merge the variants in order, keeping the first occurrence of each video.
+    candidates = {}
     for query in queries:
-        try:
-            search_response = youtube.search().list(
-                q=query,
-                part="id,snippet",
-                maxResults=limit,
-                type="video",
-                videoCategoryId="10" # Music category
-            ).execute()
-
-            current_query_results = []
-            video_ids_for_details = []
-
-            for item in search_response.get("items", []):
-                if "videoId" in item["id"]:
-                    video_ids_for_details.append(item["id"]["videoId"])
-                    current_query_results.append({
-                        "title": item["snippet"]["title"],
-                        "url": f"https://www.youtube.com/watch?v={item["id"]["videoId"]}",
-                        "channelTitle": item["snippet"]["channelTitle"],
-                        "videoId": item["id"]["videoId"],
-                        "duration": "N/A", # Placeholder
-                        "views": "N/A", # Placeholder
-                        "channelId": item["snippet"]["channelId"]
-                    })
-            
-            # Get video details (duration and views)
-            if video_ids_for_details:
-                video_details = get_video_details(youtube, video_ids_for_details)
-                for video in current_query_results:
-                    detail = video_details.get(video["videoId"])
-                    if detail:
-                        video["duration"] = parse_duration(detail["duration"])
-                        video["views"] = int(detail["views"]) # Store as int for filtering
-
-            # Filter by min_views and prioritize verified channels
-            filtered_results = []
-            verified_channels = []
-            other_channels = []
-
-            for video in current_query_results:
-                if video["views"] != "N/A" and video["views"] >= min_views:
-                    # This is a simplified check for verified channels. A more robust solution
-                    # would involve checking the channel\\\"s badges via the YouTube API if available,
-                    # or maintaining a list of known official channels.
-                    if "VEVO" in video["channelTitle"].upper() or "OFFICIAL" in video["channelTitle"].upper():
-                        verified_channels.append(video)
-                    else:
-                        other_channels.append(video)
-            
-            # Combine results, prioritizing verified channels
-            all_results.extend(verified_channels)
-            all_results.extend(other_channels)
-
-            if all_results: # If we found results with \'music\', break and use them
+        for item in items_by_query.get(query, []):
+            video_id = item["id"]["videoId"]
+            if video_id in candidates:
+                continue
+            candidates[video_id] = {
+                "title": item["snippet"]["title"],
+                "url": f"https://www.youtube.com/watch?v={video_id}",
+                "channelTitle": item["snippet"]["channelTitle"],
+                "videoId": video_id,
+                "duration": None, # Seconds, filled in from the video details
+                "views": None,
+                "channelId": item["snippet"]["channelId"]
+            }
+            if len(candidates) >= limit:
                 break
+        if len(candidates) >= limit:
+            break
 
-        except HttpError as e:
-            print(f"Erro HTTP ao buscar vídeos: {e.resp.status} - {e.content}")
-            # Fallback to yt-dlp if API fails for the second query as well
-            if query == artist: # Only fallback if the generic artist search also failed
-                print("YouTube API search failed. Tentando fallback com yt-dlp.")
-                yt_dlp_results = search_videos_yt_dlp(artist, limit)
-                # Convert views to int for filtering
-                for video in yt_dlp_results:
-                    if video["views"] != "N/A":
-                        video["views"] = int(video["views"])
-                # Filter yt-dlp results by min_views
-                filtered_yt_dlp_results = [v for v in yt_dlp_results if v["views"] != "N/A" and v["views"] >= min_views]
-                return filtered_yt_dlp_results
-        except Exception as e:
-            print(f"Ocorreu um erro inesperado: {e}")
-            return []
-
-    # Format views back to string with commas for display
-    for video in all_results:
-        if isinstance(video["views"], int):
-            video["views"] = f"{video["views"]:,}"
-
-    return all_results
+    # Get video details (duration and views)
+    video_details = get_video_details(youtube, list(candidates), use_cache)
+    for video in candidates.values():
+        detail = video_details.get(video["videoId"])
+        if detail:
+            video["duration"] = iso_duration_seconds(detail["duration"])
+            video["views"] = int(detail["views"])
 
+    # Filter by min_views and prioritize verified channels
+    verified_channels = []
+    other_channels = []
+    for video in candidates.values():
+        if video["views"] is not None and video["views"] >= min_views:
+            # This is a simplified check for verified channels. A more robust solution
+            # would involve checking the channel's badges via the YouTube API if available,
+            # or maintaining a list of known official channels.
+            if "VEVO" in video["channelTitle"].upper() or "OFFICIAL" in video["channelTitle"].upper():
+                verified_channels.append(video)
+            else:
+                other_channels.append(video)
 
+    # Combine results, prioritizing verified channels. Views and duration stay numeric; the UI formats them.
+    return verified_channels + other_channels